@@ -0,0 +1,160 @@
+# analysis_pipeline.py
+"""
+Pipeline d'analyse "dernière frame gagnante"
+
+Chaque client dispose d'une boîte aux lettres à une seule place : une nouvelle
+frame remplace celle qui n'a pas encore été traitée. Un pool de workers vide
+les boîtes aux lettres ; un même client n'est jamais traité par deux workers
+en même temps, ce qui préserve l'état de lissage des analyseurs.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict
+
+
+class LatestFramePipeline:
+    def __init__(self, handler: Callable, workers: int = 2, name: str = 'pipeline'):
+        """
+        handler: fonction appelée par les workers avec (client_id, item)
+        workers: nombre de threads de traitement
+        """
+        self.handler = handler
+        self.num_workers = max(1, workers)
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._slots = {}        # client_id -> (item, enqueued_at)
+        self._ready = deque()   # clients avec une frame en attente, non traités
+        self._busy = set()      # clients en cours de traitement
+        self._threads = []
+        self._running = False
+
+        self.stats = {
+            'submitted': 0,
+            'processed': 0,
+            'dropped': 0,
+            'errors': 0,
+            'queue_wait_total': 0.0,
+            'queue_wait_max': 0.0,
+            'processing_total': 0.0,
+            'processing_max': 0.0,
+        }
+
+    def start(self):
+        """Démarrer les workers (sans effet s'ils tournent déjà)"""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"{self.name}-worker-{i}", daemon=True)
+                for i in range(self.num_workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Arrêter les workers après la frame en cours"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, client_id, item) -> bool:
+        """
+        Déposer une frame dans la boîte aux lettres du client
+        Returns: True si une frame non traitée a été remplacée (donc perdue)
+        """
+        if not self._running:
+            self.start()
+
+        with self._cond:
+            self.stats['submitted'] += 1
+            replaced = client_id in self._slots
+            if replaced:
+                self.stats['dropped'] += 1
+            self._slots[client_id] = (item, time.perf_counter())
+
+            # Un client en cours de traitement sera remis en file par son worker
+            if not replaced and client_id not in self._busy:
+                self._ready.append(client_id)
+                self._cond.notify()
+        return replaced
+
+    def discard(self, client_id):
+        """Oublier la frame en attente d'un client (déconnexion)"""
+        with self._cond:
+            if self._slots.pop(client_id, None) is not None:
+                try:
+                    self._ready.remove(client_id)
+                except ValueError:
+                    pass
+
+    def pending(self) -> int:
+        """Nombre de clients avec une frame en attente"""
+        with self._cond:
+            return len(self._slots)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._running and not self._ready:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                client_id = self._ready.popleft()
+                item, enqueued_at = self._slots.pop(client_id)
+                self._busy.add(client_id)
+
+            started_at = time.perf_counter()
+            failed = False
+            try:
+                self.handler(client_id, item)
+            except Exception as e:
+                failed = True
+                print(f"❌ Erreur pipeline {self.name}: {e}")
+            finished_at = time.perf_counter()
+
+            with self._cond:
+                self._busy.discard(client_id)
+                # Une frame plus récente est arrivée pendant le traitement
+                if client_id in self._slots:
+                    self._ready.append(client_id)
+                    self._cond.notify()
+
+                wait = started_at - enqueued_at
+                processing = finished_at - started_at
+                self.stats['processed'] += 1
+                if failed:
+                    self.stats['errors'] += 1
+                self.stats['queue_wait_total'] += wait
+                self.stats['queue_wait_max'] = max(self.stats['queue_wait_max'], wait)
+                self.stats['processing_total'] += processing
+                self.stats['processing_max'] = max(self.stats['processing_max'], processing)
+
+    def get_stats(self) -> Dict:
+        """Compteurs (temps en millisecondes)"""
+        with self._cond:
+            stats = dict(self.stats)
+            pending = len(self._slots)
+            busy = len(self._busy)
+
+        processed = stats['processed']
+        submitted = stats['submitted']
+        return {
+            'workers': self.num_workers,
+            'submitted': submitted,
+            'processed': processed,
+            'dropped': stats['dropped'],
+            'errors': stats['errors'],
+            'pending': pending,
+            'busy': busy,
+            'drop_rate': round(stats['dropped'] / submitted, 3) if submitted else 0.0,
+            'queue_wait_avg_ms': round(stats['queue_wait_total'] / processed * 1000, 2) if processed else 0.0,
+            'queue_wait_max_ms': round(stats['queue_wait_max'] * 1000, 2),
+            'processing_avg_ms': round(stats['processing_total'] / processed * 1000, 2) if processed else 0.0,
+            'processing_max_ms': round(stats['processing_max'] * 1000, 2),
+        }
@@ -0,0 +1,323 @@
+# analytics_db.py
+"""
+Stockage SQLite des analytics (alternative au journal JSONL, ANALYTICS_BACKEND = 'sqlite')
+
+Base en mode WAL (lectures concurrentes pendant les écritures) :
+    songs     statistiques par chanson, index sur play_count, rating et last_played
+    plays     une ligne par lecture (début, durée écoutée, complétée)
+    skips     une ligne par skip
+    sessions  une ligne par session d'écoute
+    meta      sections de taille fixe de user_analytics (listening_patterns,
+              preferences, adaptive_settings, totals) en JSON
+
+Les requêtes sont des constantes : sqlite3 les garde compilées dans son cache
+de requêtes préparées. "Plus jouées" et "mieux notées" parcourent l'index et
+s'arrêtent après k lignes au lieu de trier toutes les chansons.
+
+Migration ponctuelle depuis user_analytics.json (automatique si la base est vide) :
+    python analytics_db.py migrate user_analytics.json user_analytics.db
+"""
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS songs (
+    song_id TEXT PRIMARY KEY,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    skip_count INTEGER NOT NULL DEFAULT 0,
+    total_listening_time REAL NOT NULL DEFAULT 0,
+    completion_count INTEGER NOT NULL DEFAULT 0,
+    last_played TEXT,
+    average_completion REAL NOT NULL DEFAULT 0,
+    rating REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_songs_play_count ON songs(play_count DESC);
+-- (rating, song_id) : ordre total, parcouru à rebours par iter_by_rating (pagination par clé)
+DROP INDEX IF EXISTS idx_songs_rating;
+CREATE INDEX IF NOT EXISTS idx_songs_rating_id ON songs(rating, song_id);
+CREATE INDEX IF NOT EXISTS idx_songs_last_played ON songs(last_played DESC);
+
+CREATE TABLE IF NOT EXISTS plays (
+    id INTEGER PRIMARY KEY,
+    song_id TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    listened_duration REAL,
+    completed INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_plays_song ON plays(song_id, id);
+
+CREATE TABLE IF NOT EXISTS skips (
+    id INTEGER PRIMARY KEY,
+    song_id TEXT NOT NULL,
+    skipped_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+SONG_COLUMNS = ('play_count', 'skip_count', 'total_listening_time', 'completion_count',
+                'last_played', 'average_completion', 'rating')
+SECTIONS = ('listening_patterns', 'preferences', 'adaptive_settings', 'totals')
+
+_SELECT_SONG = f"SELECT song_id, {', '.join(SONG_COLUMNS)} FROM songs"
+_INIT_SONG = "INSERT OR IGNORE INTO songs (song_id) VALUES (?)"
+_SONG_START = "UPDATE songs SET play_count = play_count + 1, last_played = ? WHERE song_id = ?"
+_INSERT_PLAY = "INSERT INTO plays (song_id, started_at) VALUES (?, ?)"
+_SONG_END = """UPDATE songs SET total_listening_time = total_listening_time + ?,
+    completion_count = completion_count + ?,
+    average_completion = COALESCE(?, average_completion)
+    WHERE song_id = ?"""
+_END_PLAY = """UPDATE plays SET listened_duration = ?, completed = ?
+    WHERE id = (SELECT MAX(id) FROM plays WHERE song_id = ?)"""
+_SONG_SKIP = "UPDATE songs SET skip_count = skip_count + 1 WHERE song_id = ?"
+_INSERT_SKIP = "INSERT INTO skips (song_id, skipped_at) VALUES (?, ?)"
+_SET_RATING = "UPDATE songs SET rating = ? WHERE song_id = ?"
+_INSERT_SESSION = "INSERT INTO sessions (started_at) VALUES (?)"
+_TOTALS = """SELECT COALESCE(SUM(play_count), 0), COALESCE(SUM(skip_count), 0),
+    COALESCE(SUM(completion_count), 0), COALESCE(SUM(total_listening_time), 0) FROM songs"""
+_SAVE_SECTION = "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)"
+
+
+class AnalyticsDatabase:
+    def __init__(self, path: str, statement_cache: int = 64):
+        """
+        path: fichier SQLite (créé au besoin)
+        statement_cache: nombre de requêtes préparées gardées par sqlite3
+        """
+        self.path = path
+        # Une connexion partagée entre les threads Flask, sérialisée par le verrou
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     cached_statements=statement_cache)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        self._depth = 0
+        self.journal_mode = self._conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.stats = {'transactions': 0, 'rollbacks': 0}
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Transaction d'écriture (réentrante : seule la plus externe valide)"""
+        with self._lock:
+            if self._depth:
+                self._depth += 1
+                try:
+                    yield self
+                finally:
+                    self._depth -= 1
+                return
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._depth = 1
+            try:
+                yield self
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                self.stats['rollbacks'] += 1
+                raise
+            else:
+                self._conn.execute("COMMIT")
+                self.stats['transactions'] += 1
+            finally:
+                self._depth = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ----- Chansons -----
+
+    def init_song(self, song_id: str):
+        with self._lock:
+            self._conn.execute(_INIT_SONG, (song_id,))
+
+    def get_song(self, song_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(f"{_SELECT_SONG} WHERE song_id = ?", (song_id,)).fetchone()
+        return _song_stats(row) if row else None
+
+    def song_start(self, song_id: str, at: str):
+        with self.transaction():
+            self._conn.execute(_INIT_SONG, (song_id,))
+            self._conn.execute(_SONG_START, (at, song_id))
+            self._conn.execute(_INSERT_PLAY, (song_id, at))
+
+    def song_end(self, song_id: str, duration: float, listened_duration: float, completed: bool):
+        average_completion = (listened_duration / duration) * 100 if duration > 0 else None
+        with self.transaction():
+            self._conn.execute(_SONG_END, (listened_duration, int(bool(completed)), average_completion, song_id))
+            self._conn.execute(_END_PLAY, (listened_duration, int(bool(completed)), song_id))
+
+    def song_skip(self, song_id: str, at: str):
+        with self.transaction():
+            self._conn.execute(_INIT_SONG, (song_id,))
+            self._conn.execute(_SONG_SKIP, (song_id,))
+            self._conn.execute(_INSERT_SKIP, (song_id, at))
+
+    def set_rating(self, song_id: str, rating: float):
+        with self._lock:
+            self._conn.execute(_SET_RATING, (rating, song_id))
+
+    def start_session(self, at: str):
+        with self._lock:
+            self._conn.execute(_INSERT_SESSION, (at,))
+
+    # ----- Requêtes -----
+
+    def totals(self) -> Dict:
+        """Sommes globales (lectures, skips, complétions, temps d'écoute), recalculées par parcours"""
+        with self._lock:
+            plays, skips, completions, listening = self._conn.execute(_TOTALS).fetchone()
+        return {'plays': plays, 'skips': skips, 'completions': completions, 'listening_time': listening}
+
+    def top_played(self, k: int = 5) -> List[Dict]:
+        """Chansons les plus jouées (parcours de idx_songs_play_count, k lignes)"""
+        with self._lock:
+            rows = self._conn.execute(f"{_SELECT_SONG} ORDER BY play_count DESC LIMIT ?", (k,)).fetchall()
+        return [{'song_id': row['song_id'], **_song_stats(row)} for row in rows]
+
+    def iter_by_rating(self, batch: int = 32) -> Iterator[Dict]:
+        """
+        Chansons par rating décroissant (égalités : song_id décroissant), lues par lots
+        le long de idx_songs_rating_id. Chaque lot reprend après la dernière clé
+        (rating, song_id) lue : coût O(batch) par lot, sans OFFSET
+        """
+        rows = self._rating_page(None, batch)
+        seen = set()
+        while rows:
+            for row in rows:
+                # Une chanson dont le rating baisse entre deux lots réapparaîtrait plus loin
+                if row['song_id'] not in seen:
+                    seen.add(row['song_id'])
+                    yield {'song_id': row['song_id'], **_song_stats(row)}
+            if len(rows) < batch:
+                return
+            last = rows[-1]
+            rows = self._rating_page((last['rating'], last['song_id']), batch)
+
+    def top_rated(self, k: int, song_ids) -> List[Dict]:
+        """k meilleures chansons par rating parmi song_ids (recherches par clé primaire)"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"{_SELECT_SONG} WHERE song_id IN (SELECT value FROM json_each(?)) "
+                "ORDER BY rating DESC, song_id DESC LIMIT ?",
+                (json.dumps(list(song_ids), ensure_ascii=False), k)
+            ).fetchall()
+        return [{'song_id': row['song_id'], **_song_stats(row)} for row in rows]
+
+    def _rating_page(self, after, batch: int):
+        with self._lock:
+            if after is None:
+                return self._conn.execute(f"{_SELECT_SONG} ORDER BY rating DESC, song_id DESC LIMIT ?",
+                                          (batch,)).fetchall()
+            return self._conn.execute(
+                f"{_SELECT_SONG} WHERE (rating, song_id) < (?, ?) ORDER BY rating DESC, song_id DESC LIMIT ?",
+                (*after, batch)
+            ).fetchall()
+
+    def all_songs(self) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._conn.execute(_SELECT_SONG).fetchall()
+        return {row['song_id']: _song_stats(row) for row in rows}
+
+    # ----- Sections de taille fixe -----
+
+    def load_sections(self) -> Dict:
+        with self._lock:
+            rows = self._conn.execute("SELECT key, value FROM meta").fetchall()
+        stored = {row['key']: json.loads(row['value']) for row in rows}
+        return {name: stored[name] for name in SECTIONS if name in stored}
+
+    def save_sections(self, analytics: Dict):
+        with self.transaction():
+            for name in SECTIONS:
+                self._conn.execute(_SAVE_SECTION, (name, json.dumps(analytics[name], ensure_ascii=False)))
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            has_song = self._conn.execute("SELECT 1 FROM songs LIMIT 1").fetchone()
+            has_meta = self._conn.execute("SELECT 1 FROM meta LIMIT 1").fetchone()
+        return not has_song and not has_meta
+
+    def reset(self):
+        with self.transaction():
+            for table in ('songs', 'plays', 'skips', 'sessions', 'meta'):
+                self._conn.execute(f"DELETE FROM {table}")
+
+    # ----- Migration -----
+
+    def migrate_json(self, path: str) -> int:
+        """
+        Importer un user_analytics.json (statistiques agrégées et sections)
+        L'historique détaillé n'existe pas dans le JSON : plays / skips démarrent vides.
+        Returns: nombre de chansons importées
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        songs = data.get('songs', {})
+        columns = ', '.join(('song_id',) + SONG_COLUMNS)
+        placeholders = ', '.join('?' * (len(SONG_COLUMNS) + 1))
+        defaults = {'last_played': None}
+        with self.transaction():
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO songs ({columns}) VALUES ({placeholders})",
+                [(song_id, *(stats.get(column, defaults.get(column, 0)) for column in SONG_COLUMNS))
+                 for song_id, stats in songs.items()]
+            )
+            for name in SECTIONS:
+                if name in data:
+                    self._conn.execute(_SAVE_SECTION, (name, json.dumps(data[name], ensure_ascii=False)))
+            self._conn.execute(_SAVE_SECTION, ('migrated_from', json.dumps(os.path.abspath(path))))
+        return len(songs)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            counts = {table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ('songs', 'plays', 'skips', 'sessions')}
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        wal = f"{self.path}-wal"
+        return {**self.stats, 'backend': 'sqlite', 'journal_mode': self.journal_mode, 'rows': counts,
+                'db_bytes': size, 'wal_bytes': os.path.getsize(wal) if os.path.exists(wal) else 0}
+
+
+def _song_stats(row) -> Dict:
+    return {column: row[column] for column in SONG_COLUMNS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = commands.add_parser('migrate', help='importer un user_analytics.json')
+    migrate_parser.add_argument('json_file')
+    migrate_parser.add_argument('db_file')
+    migrate_parser.add_argument('--force', action='store_true', help='importer même si la base contient des données')
+    args = parser.parse_args()
+
+    db = AnalyticsDatabase(args.db_file)
+    try:
+        if not db.is_empty() and not args.force:
+            print(f"❌ {args.db_file} contient déjà des analytics (utiliser --force)")
+            return
+        count = db.migrate_json(args.json_file)
+        print(f"✅ {count} chansons importées dans {args.db_file}")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
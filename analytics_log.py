@@ -0,0 +1,277 @@
+# analytics_log.py
+"""
+Persistance des analytics : journal d'événements JSONL en ajout seul + instantanés
+
+Chaque mutation (début / fin / skip de chanson, session, reset) est appliquée au
+dictionnaire en mémoire puis mise en tampon sous forme d'une ligne JSON
+numérotée : la requête HTTP ne touche jamais le disque.
+
+Un thread d'écriture en arrière-plan :
+- vide le tampon dans le journal en une seule écriture, au plus une fois par
+  `flush_interval` secondes (plus tôt si `flush_events` lignes attendent)
+- écrit périodiquement un instantané complet (fichier temporaire + os.replace,
+  donc atomique) :
+    1. sous verrou : sérialisation du dictionnaire, vidage du tampon et rotation
+       du journal (journal courant -> <journal>.<seq>, nouveau journal vide)
+    2. hors verrou : écriture de l'instantané, puis suppression des journaux
+       tournés qu'il couvre
+
+Un arrêt brutal peut perdre au plus `flush_interval` secondes d'événements ;
+close() (arrêt normal, SIGTERM) vide le tampon et écrit un dernier instantané.
+
+Au démarrage : dernier instantané, puis rejeu des événements de numéro
+supérieur (journaux tournés puis journal courant). Une ligne tronquée par un
+arrêt brutal termine le rejeu sans invalider le reste.
+"""
+import copy
+import glob
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator
+
+# Clé de l'instantané portant le numéro du dernier événement inclus
+# (retirée du dictionnaire en mémoire au chargement)
+SEQ_KEY = '_log_seq'
+
+
+class AnalyticsLog:
+    def __init__(self, snapshot_path: str, log_path: str, analytics: Dict, apply: Callable[[Dict], None],
+                 compact_events: int = 500, compact_interval: float = 60.0,
+                 flush_interval: float = 1.0, flush_events: int = 100):
+        """
+        snapshot_path: instantané JSON (format historique de user_analytics.json + SEQ_KEY)
+        log_path: journal JSONL des événements postérieurs à l'instantané
+        analytics: dictionnaire en mémoire, mis à jour sur place
+        apply: fonction (événement) qui applique un événement à `analytics`
+        compact_events / compact_interval: instantané après N événements ou N secondes
+        flush_interval / flush_events: écriture du tampon au plus toutes les N secondes,
+            ou dès que N événements attendent
+        """
+        self.snapshot_path = snapshot_path
+        self.log_path = log_path
+        self.analytics = analytics
+        self.apply = apply
+        self.compact_events = compact_events
+        self.compact_interval = compact_interval
+        self.flush_interval = flush_interval
+        self.flush_events = flush_events
+
+        self._lock = threading.RLock()      # Dictionnaire, tampon, numéros
+        self._io_lock = threading.Lock()    # Fichiers : un seul vidage / instantané à la fois
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._log = None
+        self._buffer = []   # Lignes pas encore écrites
+        self._seq = 0
+        self._pending = 0   # Événements depuis le dernier instantané
+        self._snapshot_at = time.monotonic()
+        self.stats = {
+            'events': 0, 'replayed': 0,
+            'flushes': 0, 'flushed_events': 0, 'flush_avg_ms': 0.0, 'flush_max_ms': 0.0,
+            'snapshots': 0, 'snapshot_ms': 0.0,
+        }
+
+    def load(self) -> Dict:
+        """Charger l'instantané puis rejouer la fin du journal"""
+        with self._lock:
+            snapshot_seq = 0
+            if os.path.exists(self.snapshot_path):
+                try:
+                    with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    snapshot_seq = data.pop(SEQ_KEY, 0)
+                    self.analytics.clear()
+                    self.analytics.update(data)
+                except Exception as e:
+                    print(f"❌ Erreur chargement instantané analytics: {e}")
+
+            self._seq = snapshot_seq
+            for event in self._read_logs():
+                if event['seq'] <= snapshot_seq:
+                    continue
+                self.apply(event)
+                self._seq = event['seq']
+                self._pending += 1
+                self.stats['replayed'] += 1
+            replayed_logs = bool(self._rotated_logs()) or os.path.exists(self.log_path)
+
+        # Repartir d'un instantané à jour et d'un journal vide (élimine une éventuelle ligne tronquée)
+        if replayed_logs:
+            self.compact(force=True)
+        return self.analytics
+
+    def record(self, event: Dict) -> Dict:
+        """Appliquer un événement et le mettre en tampon (aucune E/S)"""
+        with self._lock:
+            self._seq += 1
+            event = {'seq': self._seq, 'ts': time.time(), **event}
+            self.apply(event)
+            self._buffer.append(json.dumps(event, ensure_ascii=False) + '\n')
+            self.stats['events'] += 1
+            self._pending += 1
+            if len(self._buffer) >= self.flush_events or self._pending >= self.compact_events:
+                self._wake.set()
+        return event
+
+    def snapshot(self, update: Callable[[Dict], None] = None) -> Dict:
+        """
+        Copie profonde du dictionnaire, cohérente avec les événements appliqués
+        update: fonction (analytics) appliquée sous le même verrou juste avant la copie
+        """
+        with self._lock:
+            if update:
+                update(self.analytics)
+            return copy.deepcopy(self.analytics)
+
+    def start(self):
+        """Démarrer le thread d'écriture (sans effet s'il tourne déjà)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='analytics-writer', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Arrêter le thread d'écriture, vider le tampon et écrire un dernier instantané"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        self.compact()
+        with self._io_lock:
+            if self._log:
+                self._log.close()
+                self._log = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                with self._lock:
+                    due = self._pending and (self._pending >= self.compact_events or
+                                             time.monotonic() - self._snapshot_at >= self.compact_interval)
+                # L'instantané vide aussi le tampon
+                if due:
+                    self.compact()
+                else:
+                    self.flush()
+            except Exception as e:
+                print(f"❌ Erreur écriture analytics: {e}")
+
+    def flush(self) -> int:
+        """Écrire les lignes en attente en une seule écriture ; retourne leur nombre"""
+        with self._io_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+            if not lines:
+                return 0
+            t0 = time.perf_counter()
+            self._write(lines)
+            self._record_flush(len(lines), (time.perf_counter() - t0) * 1000)
+            return len(lines)
+
+    def compact(self, force: bool = False) -> bool:
+        """Écrire un instantané atomique et purger les journaux qu'il couvre"""
+        with self._io_lock:
+            t0 = time.perf_counter()
+            with self._lock:
+                if not self._pending and not force:
+                    return False
+                seq = self._seq
+                data = json.dumps({**self.analytics, SEQ_KEY: seq}, ensure_ascii=False)
+                # Les lignes en attente vont dans le journal tourné : rien n'est perdu si l'instantané échoue
+                lines, self._buffer = self._buffer, []
+                if lines:
+                    self._write(lines)
+                    self._record_flush(len(lines), (time.perf_counter() - t0) * 1000)
+                self._rotate(seq)
+                self._pending = 0
+                self._snapshot_at = time.monotonic()
+
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+
+            for path, rotated_seq in self._rotated_logs():
+                if rotated_seq <= seq:
+                    os.remove(path)
+
+            self.stats['snapshots'] += 1
+            self.stats['snapshot_ms'] = round((time.perf_counter() - t0) * 1000, 2)
+            return True
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            flushes = self.stats['flushes']
+            return {
+                **self.stats,
+                'flush_avg_ms': round(self.stats['flush_avg_ms'], 3),
+                'flush_max_ms': round(self.stats['flush_max_ms'], 3),
+                # Événements regroupés par écriture disque
+                'coalescing_ratio': round(self.stats['flushed_events'] / flushes, 2) if flushes else None,
+                'buffered': len(self._buffer),
+                'seq': self._seq,
+                'pending': self._pending,
+                'flush_interval': self.flush_interval,
+                'flush_events': self.flush_events,
+            }
+
+    def _write(self, lines):
+        """Ajouter des lignes au journal courant (appelé sous _io_lock)"""
+        if self._log is None:
+            self._open_log()
+        self._log.write(''.join(lines))
+        self._log.flush()
+
+    def _record_flush(self, count: int, elapsed_ms: float):
+        self.stats['flushes'] += 1
+        self.stats['flushed_events'] += count
+        self.stats['flush_avg_ms'] += (elapsed_ms - self.stats['flush_avg_ms']) / self.stats['flushes']
+        self.stats['flush_max_ms'] = max(self.stats['flush_max_ms'], elapsed_ms)
+
+    def _open_log(self):
+        self._log = open(self.log_path, 'a', encoding='utf-8')
+
+    def _rotate(self, seq: int):
+        """Journal courant -> <journal>.<seq> (appelé sous verrou)"""
+        if self._log:
+            self._log.close()
+            self._log = None
+        # Un journal vide n'a rien à conserver (et écraserait un journal tourné de même numéro)
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path):
+            os.replace(self.log_path, f"{self.log_path}.{seq}")
+        self._open_log()
+
+    def _rotated_logs(self):
+        rotated = []
+        for path in glob.glob(glob.escape(self.log_path) + '.*'):
+            suffix = path[len(self.log_path) + 1:]
+            if suffix.isdigit():
+                rotated.append((path, int(suffix)))
+        return sorted(rotated, key=lambda item: item[1])
+
+    def _read_logs(self) -> Iterator[Dict]:
+        paths = [path for path, _ in self._rotated_logs()]
+        if os.path.exists(self.log_path):
+            paths.append(self.log_path)
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Dernière ligne tronquée par un arrêt brutal
+                        print(f"⚠️ Journal analytics tronqué ignoré: {path}")
+                        break
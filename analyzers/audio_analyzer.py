@@ -1,13 +1,34 @@
 # analyzers/audio_analyzer.py
 import numpy as np
-from typing import Dict
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, Optional
+import time
 import warnings
 
+from analyzers import kernels
+from analyzers.pitch import YinPitchEstimator, zcr_pitch
+from analyzers.vad import VoiceActivityDetector, spectral_flatness
+
 # Supprimer les warnings de librosa
 warnings.filterwarnings('ignore')
 
 class AudioAnalyzer:
-    def __init__(self, sample_rate=16000):
+    # Estimateurs de pitch disponibles
+    PITCH_BACKENDS = ('zcr', 'yin')
+
+    def __init__(self, sample_rate=16000, streaming=False, frame_ms=25.0, hop_ms=10.0,
+                 min_speech_frames=3, pitch_backend='zcr', vad_hangover_ms=200.0):
+        """
+        streaming: découper le flux en trames courtes qui se chevauchent (frame_ms,
+            pas de hop_ms), avec report des échantillons restants d'un chunk au
+            suivant ; sinon une seule mesure RMS / ZCR par chunk
+        min_speech_frames: trames vocales consécutives pour entrer en parole (attaque VAD)
+        vad_hangover_ms: durée de silence tolérée avant de quitter l'état parole
+        pitch_backend: 'zcr' (passages par zéro) ou 'yin' (autocorrélation par FFT)
+        """
+        if pitch_backend not in self.PITCH_BACKENDS:
+            raise ValueError(f"pitch_backend inconnu: {pitch_backend}")
+        
         self.sample_rate = sample_rate
         self.state = {
             'speech_detected': False,
@@ -15,6 +36,29 @@ class AudioAnalyzer:
             'pitch': 0,
             'emotion_hint': 'neutral'
         }
+        self.speech_threshold = 0.06
+        
+        self.pitch_backend = pitch_backend
+        self._pitch_estimator = YinPitchEstimator(sample_rate) if pitch_backend == 'yin' else None
+        
+        # Mode streaming : tampon préalloué réutilisé d'un chunk à l'autre
+        self.streaming = streaming
+        self.frame_ms = frame_ms
+        self.hop_ms = hop_ms
+        self.min_speech_frames = max(1, min_speech_frames)
+        if streaming:
+            self._configure_stream(sample_rate)
+        
+        # VAD : seuil adaptatif au bruit, attaque de min_speech_frames trames et
+        # hangover de vad_hangover_ms (en mode chunk, une trame = un chunk entier)
+        if streaming:
+            attack, hangover = self.min_speech_frames, int(np.ceil(vad_hangover_ms / hop_ms))
+        else:
+            attack, hangover = 1, 1
+        self.vad = VoiceActivityDetector(min_threshold=self.speech_threshold,
+                                         attack_frames=attack, hangover_frames=hangover)
+        self._skipped = False
+        
         self._librosa_available = False
         
         # Essayer d'importer librosa
@@ -25,29 +69,74 @@ class AudioAnalyzer:
         except ImportError:
             print("⚠️ librosa non disponible, mode simplifié")
     
-    def analyze_audio(self, audio_chunk: np.ndarray) -> Dict:
+    def _configure_stream(self, sample_rate: int, chunk_size: int = 4096):
+        """(Ré)allouer les tampons du mode streaming pour une fréquence donnée"""
+        self.sample_rate = sample_rate
+        self.frame_length = max(2, int(round(sample_rate * self.frame_ms / 1000)))
+        self.hop_length = max(1, int(round(sample_rate * self.hop_ms / 1000)))
+        self._window = np.hanning(self.frame_length).astype(np.float32)
+        self._freqs = np.fft.rfftfreq(self.frame_length, 1.0 / sample_rate).astype(np.float32)
+        self._allocate_stream(chunk_size)
+        self._fill = 0
+    
+    def _allocate_stream(self, chunk_size: int):
+        # Le tampon garde au plus une trame incomplète en plus du chunk courant
+        capacity = chunk_size + self.frame_length + self.hop_length
+        max_frames = 1 + (capacity - self.frame_length) // self.hop_length
+        old = getattr(self, '_buffer', None)
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        if old is not None and self._fill:
+            self._buffer[:self._fill] = old[:self._fill]
+        self._rms = np.empty(max_frames, dtype=np.float32)
+        self._zcr = np.empty(max_frames, dtype=np.float32)
+        self._windowed = np.empty((max_frames, self.frame_length), dtype=np.float32)
+    
+    def analyze_audio(self, audio_chunk: np.ndarray, sample_rate: Optional[int] = None) -> Dict:
         """
         Analyse un chunk audio
+        sample_rate: fréquence d'échantillonnage annoncée par le client (si connue)
         Returns: dict avec speech_detected, energy_level, pitch, emotion_hint
+            (+ 'features' et 'frames' en mode streaming)
         """
         try:
             # Vérifier que le chunk n'est pas vide
             if len(audio_chunk) == 0:
                 return self.state
             
+            start = time.perf_counter()
+            self._skipped = False
+            if self.streaming:
+                if sample_rate and sample_rate != self.sample_rate:
+                    self._configure_stream(int(sample_rate), len(audio_chunk))
+                state = self._analyze_stream(audio_chunk)
+                self.vad.record_chunk(self._skipped, time.perf_counter() - start)
+                return state
+            if sample_rate:
+                self.sample_rate = sample_rate
+            
             # Calcul RMS simple (sans librosa si nécessaire)
             rms = np.sqrt(np.mean(audio_chunk ** 2))
             energy = float(rms)
             
             # Normaliser l'énergie (typiquement entre 0 et 1)
             self.state['energy_level'] = min(100, int(energy * 1000))
-            self.state['speech_detected'] = energy > 0.06 # Seuil augmenté sur demande (était 0.03)
+            
+            # VAD : le chunk entier est une trame ; spectre calculé seulement au-dessus du seuil
+            level = np.array([energy])
+            if self.vad.idle(level):
+                self.vad.skip(level)
+                self._skipped = True
+                self.state['speech_detected'] = False
+            else:
+                flatness = np.atleast_1d(spectral_flatness(np.abs(np.fft.rfft(audio_chunk))))
+                self.state['speech_detected'] = bool(self.vad.process(level, flatness)[0])
             
             if self.state['speech_detected']:
-                # Estimation pitch simple via zero-crossing rate
-                zero_crossings = np.sum(np.abs(np.diff(np.sign(audio_chunk)))) / 2
-                estimated_pitch = (zero_crossings * self.sample_rate) / (2 * len(audio_chunk))
-                self.state['pitch'] = float(estimated_pitch)
+                if self._pitch_estimator:
+                    self.state['pitch'] = self._estimate_pitch(audio_chunk)
+                else:
+                    # Estimation pitch simple via zero-crossing rate
+                    self.state['pitch'] = zcr_pitch(audio_chunk, self.sample_rate)
                 
                 # Émotion basique basée sur énergie
                 if energy > 0.05:
@@ -60,6 +149,7 @@ class AudioAnalyzer:
                 self.state['emotion_hint'] = 'neutral'
                 self.state['pitch'] = 0
             
+            self.vad.record_chunk(self._skipped, time.perf_counter() - start)
             return self.state
             
         except Exception as e:
@@ -68,4 +158,114 @@ class AudioAnalyzer:
             
         except Exception as e:
             print(f"❌ Erreur AudioAnalyzer: {e}")
-            return self.state
\ No newline at end of file
+            return self.state
+    
+    def _estimate_pitch(self, audio_chunk: np.ndarray) -> float:
+        """Pitch YIN du chunk (0 si aucune période nette) ; confiance dans l'état"""
+        pitch, confidence = self._pitch_estimator.estimate(audio_chunk, self.sample_rate)
+        self.state['pitch_confidence'] = round(confidence, 3)
+        return pitch
+    
+    def _analyze_stream(self, audio_chunk: np.ndarray) -> Dict:
+        """Caractéristiques par trame (RMS, ZCR, centroïde, rolloff) sur le flux continu"""
+        n = len(audio_chunk)
+        if self._fill + n > len(self._buffer):
+            self._allocate_stream(n)
+        
+        end = self._fill + n
+        self._buffer[self._fill:end] = audio_chunk
+        self._fill = end
+        
+        L, hop = self.frame_length, self.hop_length
+        if end < L:
+            return self.state  # Pas encore une trame complète
+        
+        count = 1 + (end - L) // hop
+        signal = self._buffer[:end]
+        
+        # RMS par trame (noyau numba ou NumPy) : seul calcul fait sur un chunk silencieux
+        rms = kernels.frame_rms(signal, L, hop, self._rms[:count])
+        energy = float(np.sqrt(np.mean(rms * rms)))
+        self.state['energy_level'] = min(100, int(energy * 1000))
+        
+        if self.vad.idle(rms):
+            # Silence : plancher de bruit seulement, ni ZCR, ni spectre, ni pitch
+            self.vad.skip(rms)
+            self._skipped = True
+            self._consume(count * hop, end)
+            self.state['speech_detected'] = False
+            self.state['emotion_hint'] = 'neutral'
+            self.state['pitch'] = 0
+            self.state['features'] = {
+                'frames': count,
+                'speech_frames': 0,
+                'rms_mean': round(float(rms.mean()), 4),
+                'rms_max': round(float(rms.max()), 4),
+                'skipped': True,
+            }
+            self.state['frames'] = {'hop_ms': self.hop_ms, 'rms': np.round(rms, 4).tolist()}
+            return self.state
+        
+        # Vue (trames, L) sans copie sur le tampon
+        frames = sliding_window_view(signal, L)[::hop][:count]
+        zcr = kernels.frame_zcr(signal, L, hop, self._zcr[:count])
+        
+        # Spectre des trames fenêtrées : centroïde, rolloff (85 %) et platitude (VAD)
+        windowed = np.multiply(frames, self._window, out=self._windowed[:count])
+        spectrum = np.abs(np.fft.rfft(windowed, axis=1))
+        power = spectrum.sum(axis=1) + 1e-10
+        centroid = (spectrum @ self._freqs) / power
+        cumulative = np.cumsum(spectrum, axis=1)
+        rolloff = self._freqs[np.argmax(cumulative >= 0.85 * cumulative[:, -1:], axis=1)]
+        flatness = spectral_flatness(spectrum)
+        
+        self._consume(count * hop, end)
+        
+        # Machine à états VAD (attaque / hangover) sur les trames du chunk
+        voiced = self.vad.process(rms, flatness)
+        speech_frames = int(voiced.sum())
+        self.state['speech_detected'] = speech_frames > 0
+        
+        if self.state['speech_detected']:
+            if self._pitch_estimator:
+                self.state['pitch'] = self._estimate_pitch(audio_chunk)
+            else:
+                # Pitch approximé par le ZCR des trames voisées
+                self.state['pitch'] = float(zcr[voiced].mean() * self.sample_rate / 2)
+            if energy > 0.05:
+                self.state['emotion_hint'] = 'excited'
+            elif energy > 0.02:
+                self.state['emotion_hint'] = 'neutral'
+            else:
+                self.state['emotion_hint'] = 'calm'
+        else:
+            self.state['emotion_hint'] = 'neutral'
+            self.state['pitch'] = 0
+        
+        self.state['features'] = {
+            'frames': count,
+            'speech_frames': speech_frames,
+            'rms_mean': round(float(rms.mean()), 4),
+            'rms_max': round(float(rms.max()), 4),
+            'zcr_mean': round(float(zcr.mean()), 4),
+            'centroid_mean': round(float(centroid.mean()), 1),
+            'rolloff_mean': round(float(rolloff.mean()), 1),
+        }
+        # Série compacte (une valeur par trame, pas de hop_ms)
+        self.state['frames'] = {
+            'hop_ms': self.hop_ms,
+            'rms': np.round(rms, 4).tolist(),
+            'zcr': np.round(zcr, 4).tolist(),
+            'centroid': np.round(centroid, 1).tolist(),
+        }
+        return self.state
+    
+    def _consume(self, consumed: int, end: int):
+        """Reporter les échantillons non consommés (trame partielle) au début du tampon"""
+        remaining = end - consumed
+        self._buffer[:remaining] = self._buffer[consumed:end]
+        self._fill = remaining
+    
+    def get_vad_stats(self) -> Dict:
+        """Ratio de parole, chunks sautés et temps CPU économisé par la VAD"""
+        return self.vad.get_stats()
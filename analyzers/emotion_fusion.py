@@ -1,20 +1,24 @@
 # analyzers/emotion_fusion.py
-from typing import Dict
+from typing import Callable, Dict
 import time
 
+from analyzers.movement_history import HeadMovementHistory
+
 class EmotionFusion:
-    def __init__(self):
+    def __init__(self, clock: Callable[[], float] = None):
+        """clock: source du temps en secondes (time.time par défaut, horloge virtuelle en simulation)"""
+        self.clock = clock or time.time
         self.history = []
         self.max_history = 10
         
-        # Historique des mouvements de tête
-        self.head_movement_history = []
+        # Historique des mouvements de tête (tampon circulaire, fenêtres incrémentales)
         self.movement_window = 4.0  # 4 secondes
+        self.head_movement_history = HeadMovementHistory(self.movement_window, std_window=60, delta_window=15)
         
         # NOUVEAU: Persistance des détections
         self.movement_detected_once = False
         self.speech_detected_once = False
-        self.start_time = time.time() # Pour ignorer les faux positifs au démarrage
+        self.start_time = self.clock() # Pour ignorer les faux positifs au démarrage
         
     def fuse_signals(self, video_state: Dict, audio_state: Dict) -> Dict:
         """
@@ -39,7 +43,7 @@ class EmotionFusion:
         speech_detected = audio_state.get('speech_detected', False)
         
         # Période de chauffe (3 secondes) pour éviter les faux positifs au lancement
-        if time.time() - self.start_time > 3.0:
+        if self.clock() - self.start_time > 3.0:
             if movement_detected:
                 self.movement_detected_once = True
             if speech_detected:
@@ -67,24 +71,17 @@ class EmotionFusion:
     
     def _record_head_movement(self, video: Dict):
         """Enregistrer les mouvements de tête avec timestamp"""
-        current_time = time.time()
+        current_time = self.clock()
         
         if video.get('face_detected'):
             head_pose = video.get('head_pose', {})
             yaw = head_pose.get('yaw', 0)
             pitch = head_pose.get('pitch', 0)
             
-            self.head_movement_history.append({
-                'timestamp': current_time,
-                'yaw': yaw,
-                'pitch': pitch
-            })
-        
-        # Nettoyer l'historique > 4 secondes
-        self.head_movement_history = [
-            movement for movement in self.head_movement_history 
-            if current_time - movement['timestamp'] <= self.movement_window
-        ]
+            self.head_movement_history.append(current_time, float(yaw), float(pitch))
+        
+        # Nettoyer l'historique > 4 secondes (avance de l'indice de début, sans copie)
+        self.head_movement_history.trim(current_time)
     
     def _detect_significant_head_movement(self) -> bool:
         """Détection basée sur la variance des positions sur ~60 frames (3 secondes)"""
@@ -92,25 +89,10 @@ class EmotionFusion:
         if len(self.head_movement_history) < 20:
             return False
             
-        # Analyser les 60 dernières frames (fenêtre glissante)
-        # Avec le framerate de 20fps, cela représente 3 secondes d'historique
-        # Cela permet de lisser les mouvements lents et capturer le rythme sur la durée
-        recent_history = self.head_movement_history[-60:]
-        
-        # Extraction des séries de données
-        yaws = [m['yaw'] for m in recent_history]
-        pitches = [m['pitch'] for m in recent_history]
-        
-        def calculate_std_dev(data):
-            """Calcul écart-type manuel"""
-            if len(data) < 2: return 0.0
-            avg = sum(data) / len(data)
-            variance = sum([(x - avg) ** 2 for x in data]) / len(data)
-            return variance ** 0.5
-            
-        # Calculer la dispersion autour de la moyenne
-        yaw_std = calculate_std_dev(yaws)
-        pitch_std = calculate_std_dev(pitches)
+        # Écart-type sur les 60 dernières frames (fenêtre glissante), tenu à jour à
+        # chaque ajout / retrait. Avec le framerate de 20fps, cela représente 3 secondes
+        # d'historique : cela permet de lisser les mouvements lents et capturer le rythme
+        yaw_std, pitch_std = self.head_movement_history.std()
         
         # SEUILS (Baromètre):
         # L'utilisateur mentionne des variations de "1.2 à 1.3".
@@ -130,13 +112,8 @@ class EmotionFusion:
         if len(self.head_movement_history) < 3:
             return 0.0
             
-        recent_history = self.head_movement_history[-15:] # 1.5 secondes
-        total_delta = 0
-        
-        for i in range(1, len(recent_history)):
-            curr = recent_history[i]
-            prev = recent_history[i-1]
-            total_delta += abs(curr['yaw'] - prev['yaw']) + abs(curr['pitch'] - prev['pitch'])
+        # Variations cumulées sur les 15 dernières frames (1.5 secondes), tenues à jour
+        total_delta = self.head_movement_history.movement_intensity()
             
         # Normalisation : 30 degrés cumulés sur 1.5s = intensité 1.0
         intensity = min(1.0, total_delta / 30.0)
@@ -0,0 +1,257 @@
+# analyzers/kernels.py
+"""
+Noyaux de calcul des analyseurs (audio, pitch, fusion)
+
+Deux implémentations de chaque noyau :
+- 'numba' : boucles compilées (njit, cache disque : pas de recompilation au démarrage)
+- 'numpy' : repli vectorisé, utilisé si numba est absent ou refuse de compiler
+
+Les appelants passent par le module (kernels.window_std(...)) pour que
+set_backend() s'applique partout.
+"""
+import math
+from typing import Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    numba = None
+    NUMBA_AVAILABLE = False
+
+KERNEL_BACKENDS = ('numpy', 'numba')
+
+
+# ===== Repli NumPy =====
+
+def _window_std_numpy(values: np.ndarray) -> float:
+    """Écart-type (population) d'une fenêtre de valeurs"""
+    if values.shape[0] < 2:
+        return 0.0
+    return float(np.std(values))
+
+
+def _movement_intensity_numpy(yaws: np.ndarray, pitches: np.ndarray) -> float:
+    """Somme des variations absolues de yaw et pitch entre frames successives"""
+    return float(np.abs(np.diff(yaws)).sum() + np.abs(np.diff(pitches)).sum())
+
+
+def _frame_rms_numpy(signal: np.ndarray, frame_length: int, hop: int, out: np.ndarray) -> np.ndarray:
+    """RMS de chaque trame [f*hop, f*hop + frame_length) ; len(out) trames"""
+    frames = sliding_window_view(signal, frame_length)[::hop][:out.shape[0]]
+    np.einsum('ij,ij->i', frames, frames, out=out)
+    np.sqrt(out / frame_length, out=out)
+    return out
+
+
+def _frame_zcr_numpy(signal: np.ndarray, frame_length: int, hop: int, out: np.ndarray) -> np.ndarray:
+    """Taux de changements de signe de chaque trame"""
+    signs = np.signbit(signal)
+    crossings = np.zeros(signal.shape[0], dtype=np.int32)
+    np.cumsum(signs[1:] != signs[:-1], out=crossings[1:])
+    starts = np.arange(out.shape[0]) * hop
+    np.subtract(crossings[starts + frame_length - 1], crossings[starts], out=out)
+    out /= (frame_length - 1)
+    return out
+
+
+def _yin_pick_numpy(diff: np.ndarray, tau_min: int, tau_max: int, threshold: float,
+                    cmnd: np.ndarray) -> Tuple[float, float]:
+    """
+    Différence normalisée cumulée puis choix du retard (YIN)
+    Returns: (retard interpolé, valeur CMNDF au minimum) ; retard 0 si pas de période
+    """
+    cmnd[0] = 1.0
+    np.cumsum(diff[1:tau_max + 1], out=cmnd[1:tau_max + 1])
+    np.maximum(cmnd[1:tau_max + 1], 1e-12, out=cmnd[1:tau_max + 1])
+    np.divide(diff[1:tau_max + 1] * np.arange(1, tau_max + 1), cmnd[1:tau_max + 1],
+              out=cmnd[1:tau_max + 1])
+
+    # Premier minimum sous le seuil dans la plage de recherche
+    search = cmnd[tau_min:tau_max + 1]
+    below = np.flatnonzero(search < threshold)
+    if below.size:
+        tau = tau_min + int(below[0])
+        while tau + 1 <= tau_max and cmnd[tau + 1] < cmnd[tau]:
+            tau += 1
+    else:
+        tau = tau_min + int(np.argmin(search))
+        if cmnd[tau] > 0.5:
+            return 0.0, 1.0
+
+    return _parabolic(cmnd, tau, tau_min, tau_max), float(cmnd[tau])
+
+
+def _parabolic(cmnd, tau, tau_min, tau_max):
+    """Interpolation parabolique autour du minimum"""
+    refined = float(tau)
+    if tau_min < tau < tau_max:
+        a, b, c = cmnd[tau - 1], cmnd[tau], cmnd[tau + 1]
+        denominator = a - 2 * b + c
+        if denominator > 0:
+            refined += 0.5 * (a - c) / denominator
+    return refined
+
+
+# ===== Boucles compilées (numba) =====
+
+def _window_std_loop(values):
+    n = values.shape[0]
+    if n < 2:
+        return 0.0
+    mean = 0.0
+    for i in range(n):
+        mean += values[i]
+    mean /= n
+    acc = 0.0
+    for i in range(n):
+        d = values[i] - mean
+        acc += d * d
+    return math.sqrt(acc / n)
+
+
+def _movement_intensity_loop(yaws, pitches):
+    total = 0.0
+    for i in range(1, yaws.shape[0]):
+        total += abs(yaws[i] - yaws[i - 1]) + abs(pitches[i] - pitches[i - 1])
+    return total
+
+
+def _frame_rms_loop(signal, frame_length, hop, out):
+    for f in range(out.shape[0]):
+        start = f * hop
+        acc = 0.0
+        for j in range(start, start + frame_length):
+            acc += signal[j] * signal[j]
+        out[f] = math.sqrt(acc / frame_length)
+    return out
+
+
+def _frame_zcr_loop(signal, frame_length, hop, out):
+    for f in range(out.shape[0]):
+        start = f * hop
+        changes = 0
+        previous = math.copysign(1.0, signal[start]) < 0
+        for j in range(start + 1, start + frame_length):
+            current = math.copysign(1.0, signal[j]) < 0
+            if current != previous:
+                changes += 1
+            previous = current
+        out[f] = changes / (frame_length - 1)
+    return out
+
+
+def _yin_pick_loop(diff, tau_min, tau_max, threshold, cmnd):
+    cmnd[0] = 1.0
+    running = 0.0
+    for tau in range(1, tau_max + 1):
+        running += diff[tau]
+        cmnd[tau] = diff[tau] * tau / max(running, 1e-12)
+
+    best = -1
+    for tau in range(tau_min, tau_max + 1):
+        if cmnd[tau] < threshold:
+            best = tau
+            while best + 1 <= tau_max and cmnd[best + 1] < cmnd[best]:
+                best += 1
+            break
+    if best < 0:
+        best = tau_min
+        for tau in range(tau_min + 1, tau_max + 1):
+            if cmnd[tau] < cmnd[best]:
+                best = tau
+        if cmnd[best] > 0.5:
+            return 0.0, 1.0
+
+    refined = float(best)
+    if tau_min < best < tau_max:
+        a, b, c = cmnd[best - 1], cmnd[best], cmnd[best + 1]
+        denominator = a - 2 * b + c
+        if denominator > 0:
+            refined += 0.5 * (a - c) / denominator
+    return refined, cmnd[best]
+
+
+_NUMPY_KERNELS = {
+    'window_std': _window_std_numpy,
+    'movement_intensity': _movement_intensity_numpy,
+    'frame_rms': _frame_rms_numpy,
+    'frame_zcr': _frame_zcr_numpy,
+    'yin_pick': _yin_pick_numpy,
+}
+_LOOP_KERNELS = {
+    'window_std': _window_std_loop,
+    'movement_intensity': _movement_intensity_loop,
+    'frame_rms': _frame_rms_loop,
+    'frame_zcr': _frame_zcr_loop,
+    'yin_pick': _yin_pick_loop,
+}
+_numba_kernels = None
+
+
+def _compile_numba():
+    """Dispatchers numba (compilation paresseuse, résultat mis en cache sur disque)"""
+    global _numba_kernels
+    if _numba_kernels is None:
+        _numba_kernels = {name: numba.njit(cache=True, nogil=True)(fn)
+                          for name, fn in _LOOP_KERNELS.items()}
+    return _numba_kernels
+
+
+def _warm_up(kernels):
+    """Compiler (ou charger depuis le cache) chaque noyau pour les types utilisés"""
+    values = np.zeros(8, dtype=np.float64)
+    signal = np.zeros(64, dtype=np.float32)
+    kernels['window_std'](values)
+    kernels['movement_intensity'](values, values)
+    kernels['frame_rms'](signal, 16, 8, np.empty(7, dtype=np.float32))
+    kernels['frame_zcr'](signal, 16, 8, np.empty(7, dtype=np.float32))
+    kernels['yin_pick'](np.zeros(16), 2, 15, 0.15, np.empty(16))
+
+
+def set_backend(name: str = 'auto', warm_up: bool = True) -> str:
+    """
+    Choisir l'implémentation des noyaux ('auto', 'numba' ou 'numpy')
+    Returns: le backend effectivement actif
+    """
+    global backend, window_std, movement_intensity, frame_rms, frame_zcr, yin_pick
+
+    if name not in KERNEL_BACKENDS + ('auto',):
+        raise ValueError(f"Backend de noyaux inconnu: {name}")
+
+    kernels, selected = _NUMPY_KERNELS, 'numpy'
+    if name in ('auto', 'numba') and NUMBA_AVAILABLE:
+        try:
+            compiled = _compile_numba()
+            if warm_up:
+                _warm_up(compiled)
+            kernels, selected = compiled, 'numba'
+        except Exception as e:
+            print(f"⚠️ Noyaux numba indisponibles, repli NumPy: {e}")
+    elif name == 'numba':
+        print("⚠️ numba non installé, repli NumPy")
+
+    backend = selected
+    window_std = kernels['window_std']
+    movement_intensity = kernels['movement_intensity']
+    frame_rms = kernels['frame_rms']
+    frame_zcr = kernels['frame_zcr']
+    yin_pick = kernels['yin_pick']
+    return backend
+
+
+def get_backend() -> str:
+    return backend
+
+
+# Par défaut : numba si disponible, compilé au premier appel (ou lu depuis le cache)
+backend = 'numpy'
+window_std = _window_std_numpy
+movement_intensity = _movement_intensity_numpy
+frame_rms = _frame_rms_numpy
+frame_zcr = _frame_zcr_numpy
+yin_pick = _yin_pick_numpy
+set_backend('auto', warm_up=False)
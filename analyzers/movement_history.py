@@ -0,0 +1,185 @@
+# analyzers/movement_history.py
+"""
+Historique des mouvements de tête dans un tampon circulaire NumPy
+
+Tableau structuré préalloué (timestamp, yaw, pitch, delta) indexé par deux
+compteurs monotones (début / fin) : ajout et purge par l'âge en O(1) amorti,
+sans recréer de liste à chaque frame.
+
+Deux fenêtres glissantes sont tenues à jour incrémentalement :
+- écart-type de yaw et pitch sur les `std_window` dernières entrées (Welford,
+  avec retrait de l'entrée qui sort de la fenêtre)
+- somme des variations |Δyaw| + |Δpitch| sur les `delta_window` dernières entrées
+"""
+from typing import Dict
+
+import numpy as np
+
+from analyzers import kernels
+
+MOVEMENT_DTYPE = np.dtype([
+    ('timestamp', np.float64),
+    ('yaw', np.float64),
+    ('pitch', np.float64),
+    ('delta', np.float64),  # |Δyaw| + |Δpitch| par rapport à l'entrée précédente
+])
+
+
+class _WindowMoments:
+    """Moyenne et somme des carrés des écarts (Welford) avec ajout et retrait"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float):
+        self.count += 1
+        d = x - self.mean
+        self.mean += d / self.count
+        self.m2 += d * (x - self.mean)
+
+    def remove(self, x: float):
+        if self.count <= 1:
+            self.reset()
+            return
+        old_mean = self.mean
+        self.count -= 1
+        self.mean = (old_mean * (self.count + 1) - x) / self.count
+        self.m2 = max(0.0, self.m2 - (x - old_mean) * (x - self.mean))
+
+    def std(self) -> float:
+        """Écart-type (population), 0 en dessous de deux valeurs"""
+        if self.count < 2:
+            return 0.0
+        return (self.m2 / self.count) ** 0.5
+
+
+class HeadMovementHistory:
+    def __init__(self, window_seconds: float = 4.0, std_window: int = 60, delta_window: int = 15,
+                 capacity: int = 256, resync_interval: int = 1024):
+        """
+        window_seconds: âge maximal des entrées conservées
+        std_window: entrées récentes prises pour l'écart-type (~3 s à 20 fps)
+        delta_window: entrées récentes prises pour l'intensité du mouvement (~1.5 s)
+        capacity: taille du tampon ; au-delà, les plus anciennes entrées sont écrasées
+        resync_interval: recalcul exact des fenêtres toutes les N mises à jour
+            (borne la dérive numérique des ajouts / retraits successifs)
+        """
+        self.window_seconds = window_seconds
+        self.std_window = std_window
+        self.delta_window = delta_window
+        self.capacity = max(capacity, std_window, delta_window)
+        self.resync_interval = resync_interval
+        self._data = np.zeros(self.capacity, dtype=MOVEMENT_DTYPE)
+        self.clear()
+
+    def clear(self):
+        self._start = 0  # Indice absolu de la plus ancienne entrée
+        self._end = 0    # Indice absolu après la plus récente
+        self._std_start = 0
+        self._delta_start = 0
+        self._yaw = _WindowMoments()
+        self._pitch = _WindowMoments()
+        self._delta_sum = 0.0
+        self._updates = 0
+        self._last = (0.0, 0.0)  # Dernière entrée (yaw, pitch) en flottants Python
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def append(self, timestamp: float, yaw: float, pitch: float):
+        """Ajouter une entrée en O(1)"""
+        if len(self) == self.capacity:
+            self._drop_oldest()
+
+        delta = 0.0
+        if len(self):
+            delta = abs(yaw - self._last[0]) + abs(pitch - self._last[1])
+        self._last = (yaw, pitch)
+
+        self._data[self._end % self.capacity] = (timestamp, yaw, pitch, delta)
+        self._end += 1
+        self._yaw.add(yaw)
+        self._pitch.add(pitch)
+        # La première entrée de la fenêtre ne compte pas de variation
+        if self._end - 1 > self._delta_start:
+            self._delta_sum += delta
+
+        if self._end - self._std_start > self.std_window:
+            self._leave_std_window()
+        if self._end - self._delta_start > self.delta_window:
+            self._leave_delta_window()
+        self._tick()
+
+    def trim(self, now: float):
+        """Retirer les entrées plus vieilles que window_seconds (par indice, O(1) amorti)"""
+        while self._start < self._end and now - self._data[self._start % self.capacity]['timestamp'] > self.window_seconds:
+            self._drop_oldest()
+
+    def std(self):
+        """(écart-type yaw, écart-type pitch) sur les std_window dernières entrées"""
+        return self._yaw.std(), self._pitch.std()
+
+    def movement_intensity(self) -> float:
+        """Somme des |Δyaw| + |Δpitch| sur les delta_window dernières entrées"""
+        return max(0.0, self._delta_sum)
+
+    def to_array(self) -> np.ndarray:
+        """Copie ordonnée (plus ancienne d'abord) des entrées conservées"""
+        return self._slice(self._start, self._end)
+
+    def get_stats(self) -> Dict:
+        yaw_std, pitch_std = self.std()
+        return {
+            'entries': len(self),
+            'yaw_std': round(yaw_std, 3),
+            'pitch_std': round(pitch_std, 3),
+            'movement_intensity': round(self.movement_intensity(), 3),
+        }
+
+    def _drop_oldest(self):
+        self._start += 1
+        if self._std_start < self._start:
+            self._leave_std_window()
+        if self._delta_start < self._start:
+            self._leave_delta_window()
+
+    def _leave_std_window(self):
+        leaving = self._data[self._std_start % self.capacity]
+        self._yaw.remove(float(leaving['yaw']))
+        self._pitch.remove(float(leaving['pitch']))
+        self._std_start += 1
+
+    def _leave_delta_window(self):
+        # La variation de la nouvelle première entrée sort de la somme
+        self._delta_start += 1
+        if self._delta_start < self._end:
+            self._delta_sum -= float(self._data[self._delta_start % self.capacity]['delta'])
+
+    def _slice(self, start: int, end: int) -> np.ndarray:
+        if start >= end:
+            return self._data[:0].copy()
+        i, j = start % self.capacity, end % self.capacity
+        if i < j:
+            return self._data[i:j].copy()
+        return np.concatenate((self._data[i:], self._data[:j]))
+
+    def _tick(self):
+        self._updates += 1
+        if self._updates >= self.resync_interval:
+            self._resync()
+
+    def _resync(self):
+        """Recalcul exact des deux fenêtres (coût O(fenêtre), amorti sur resync_interval)"""
+        self._updates = 0
+        window = self._slice(self._std_start, self._end)
+        for moments, values in ((self._yaw, window['yaw']), (self._pitch, window['pitch'])):
+            moments.count = len(values)
+            moments.mean = float(values.mean()) if len(values) else 0.0
+            moments.m2 = kernels.window_std(values) ** 2 * len(values)
+        recent = self._slice(self._delta_start, self._end)
+        self._delta_sum = kernels.movement_intensity(recent['yaw'], recent['pitch'])
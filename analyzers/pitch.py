@@ -0,0 +1,95 @@
+# analyzers/pitch.py
+"""
+Estimation de la fréquence fondamentale (pitch)
+
+- zcr_pitch : taux de passages par zéro (historique, très sensible au bruit)
+- YinPitchEstimator : fonction de différence YIN calculée par FFT
+  (autocorrélation via rfft / irfft), tampons et fenêtre préalloués
+"""
+import numpy as np
+from typing import Tuple
+
+from analyzers import kernels
+
+
+def zcr_pitch(audio_chunk: np.ndarray, sample_rate: int) -> float:
+    """Pitch approximé par le nombre de passages par zéro du chunk"""
+    zero_crossings = np.sum(np.abs(np.diff(np.sign(audio_chunk)))) / 2
+    return float((zero_crossings * sample_rate) / (2 * len(audio_chunk)))
+
+
+class YinPitchEstimator:
+    def __init__(self, sample_rate: int = 16000, frame_size: int = 2048,
+                 fmin: float = 60.0, fmax: float = 500.0, threshold: float = 0.15):
+        """
+        frame_size: nombre d'échantillons analysés (les plus récents du chunk)
+        fmin / fmax: plage de recherche du pitch (voix parlée)
+        threshold: seuil YIN sur la différence normalisée (plus bas = plus strict)
+        """
+        self.fmin = fmin
+        self.fmax = fmax
+        self.threshold = threshold
+        self.configure(sample_rate, frame_size)
+
+    def configure(self, sample_rate: int, frame_size: int):
+        """Préparer taille FFT, bornes de retard et tampons pour ces paramètres"""
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        # Fenêtre d'intégration W : la moitié de la trame, le reste sert aux retards
+        self.window = frame_size // 2
+        self.tau_min = max(2, int(sample_rate / self.fmax))
+        self.tau_max = min(self.window - 1, int(np.ceil(sample_rate / self.fmin)))
+        # FFT sans repliement circulaire, taille puissance de 2
+        self.n_fft = 1 << int(np.ceil(np.log2(frame_size + self.window)))
+
+        self._frame = np.zeros(frame_size, dtype=np.float64)
+        self._kernel = np.zeros(self.n_fft, dtype=np.float64)
+        self._energy = np.empty(frame_size + 1, dtype=np.float64)
+        self._diff = np.empty(self.tau_max + 1, dtype=np.float64)
+        self._cmnd = np.empty(self.tau_max + 1, dtype=np.float64)
+
+    def estimate(self, audio_chunk: np.ndarray, sample_rate: int = None) -> Tuple[float, float]:
+        """
+        Returns: (pitch en Hz, confiance 0-1) ; (0.0, 0.0) si aucune période nette
+        """
+        if sample_rate and sample_rate != self.sample_rate:
+            self.configure(sample_rate, self.frame_size)
+
+        W, N = self.window, self.frame_size
+        n = min(len(audio_chunk), N)
+        if n < W + self.tau_max:
+            return 0.0, 0.0
+
+        # Trame courante (centrée) copiée dans le tampon préalloué
+        frame = self._frame
+        frame[:n] = audio_chunk[-n:]
+        frame[n:] = 0.0
+        frame[:n] -= frame[:n].mean()
+
+        # r(τ) = Σ_{j<W} x_j x_{j+τ} : corrélation croisée de la fenêtre avec la trame
+        self._kernel[:W] = frame[:W]
+        spectrum = np.fft.rfft(frame, self.n_fft)
+        spectrum *= np.conj(np.fft.rfft(self._kernel, self.n_fft))
+        correlation = np.fft.irfft(spectrum, self.n_fft)[:self.tau_max + 1]
+
+        # Énergies glissantes Σ x_j² sur [τ, τ+W) via somme cumulée
+        energy = self._energy
+        energy[0] = 0.0
+        np.cumsum(frame * frame, out=energy[1:])
+        window_energy = energy[W:W + self.tau_max + 1] - energy[:self.tau_max + 1]
+
+        # Fonction de différence d(τ) = e(0) + e(τ) - 2 r(τ)
+        diff = self._diff
+        np.subtract(window_energy[0] + window_energy, 2 * correlation, out=diff)
+        diff[0] = 0.0
+        if window_energy[0] <= 1e-9:
+            return 0.0, 0.0
+
+        # Différence normalisée cumulée (CMNDF), premier minimum sous le seuil
+        # et interpolation parabolique : une seule passe dans le noyau
+        refined, minimum = kernels.yin_pick(diff, self.tau_min, self.tau_max, self.threshold, self._cmnd)
+        if refined <= 0:
+            return 0.0, 0.0
+
+        confidence = float(max(0.0, min(1.0, 1.0 - minimum)))
+        return float(self.sample_rate / refined), confidence
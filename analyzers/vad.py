@@ -0,0 +1,139 @@
+# analyzers/vad.py
+"""
+Détection d'activité vocale (VAD) par énergie, avec plancher de bruit adaptatif
+
+- seuil = max(seuil minimal, plancher de bruit × facteur SNR)
+- une trame est candidate si son RMS dépasse le seuil et que son spectre
+  n'est pas plat (la voix est harmonique, le bruit large bande est plat)
+- attaque : trames candidates consécutives pour entrer en parole
+- hangover : trames non candidates tolérées avant de repasser en silence
+
+Tant que le détecteur est en silence et qu'aucune trame n'atteint le seuil,
+l'appelant peut sauter toute l'analyse (ZCR, spectre, pitch) et se contenter
+de mettre à jour le plancher de bruit (idle() puis skip()).
+"""
+from typing import Dict
+
+import numpy as np
+
+
+def spectral_flatness(magnitude: np.ndarray) -> np.ndarray:
+    """Platitude spectrale par ligne : moyenne géométrique / arithmétique de la puissance"""
+    power = magnitude * magnitude + 1e-12
+    return np.exp(np.mean(np.log(power), axis=-1)) / np.mean(power, axis=-1)
+
+
+class VoiceActivityDetector:
+    def __init__(self, min_threshold: float = 0.06, snr_factor: float = 2.0,
+                 max_flatness: float = 0.45, attack_frames: int = 3, hangover_frames: int = 20,
+                 noise_rise: float = 0.05, noise_fall: float = 0.5):
+        """
+        min_threshold: seuil RMS absolu (sensibilité historique de l'analyseur)
+        snr_factor: marge au-dessus du plancher de bruit pour qu'une trame soit candidate
+        max_flatness: platitude spectrale au-delà de laquelle la trame est du bruit
+        attack_frames / hangover_frames: hystérésis en nombre de trames
+        noise_rise / noise_fall: lissage du plancher (monte lentement, descend vite)
+        """
+        self.min_threshold = min_threshold
+        self.snr_factor = snr_factor
+        self.max_flatness = max_flatness
+        self.attack_frames = max(1, attack_frames)
+        self.hangover_frames = max(1, hangover_frames)
+        self.noise_rise = noise_rise
+        self.noise_fall = noise_fall
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self.noise_floor = None
+        self._run = 0
+        self._hang = 0
+        self.stats = {
+            'chunks': 0,
+            'skipped_chunks': 0,
+            'frames': 0,
+            'speech_frames': 0,
+            'time_saved_ms': 0.0,
+        }
+        self._full_cost = None  # Coût moyen (EWMA) d'un chunk analysé, secondes
+
+    @property
+    def threshold(self) -> float:
+        if self.noise_floor is None:
+            return self.min_threshold
+        return max(self.min_threshold, self.noise_floor * self.snr_factor)
+
+    def idle(self, rms: np.ndarray) -> bool:
+        """En silence et aucune trame au-dessus du seuil : analyse lourde inutile"""
+        return not self.in_speech and float(rms.max()) <= self.threshold
+
+    def update_noise(self, rms: np.ndarray):
+        """Suivre le plancher de bruit avec les trames non vocales du chunk"""
+        if rms.size == 0:
+            return
+        level = float(rms.mean())
+        if self.noise_floor is None:
+            self.noise_floor = level
+            return
+        alpha = self.noise_rise if level > self.noise_floor else self.noise_fall
+        self.noise_floor += alpha * (level - self.noise_floor)
+
+    def process(self, rms: np.ndarray, flatness: np.ndarray) -> np.ndarray:
+        """
+        Faire avancer la machine à états sur les trames du chunk
+        Returns: masque booléen des trames en état parole
+        """
+        candidates = (rms > self.threshold) & (flatness < self.max_flatness)
+        speech = np.empty(len(rms), dtype=bool)
+        for i, candidate in enumerate(candidates):
+            if self.in_speech:
+                if candidate:
+                    self._hang = self.hangover_frames
+                else:
+                    self._hang -= 1
+                    if self._hang <= 0:
+                        self.in_speech = False
+                        self._run = 0
+            elif candidate:
+                self._run += 1
+                if self._run >= self.attack_frames:
+                    self.in_speech = True
+                    self._hang = self.hangover_frames
+            else:
+                self._run = 0
+            speech[i] = self.in_speech
+
+        self.update_noise(rms[~candidates])
+        self.stats['frames'] += len(rms)
+        self.stats['speech_frames'] += int(speech.sum())
+        return speech
+
+    def skip(self, rms: np.ndarray):
+        """Chunk silencieux : seul le plancher de bruit est mis à jour"""
+        self.update_noise(rms)
+        self._run = 0
+        self.stats['frames'] += len(rms)
+
+    def record_chunk(self, skipped: bool, seconds: float):
+        """Comptabiliser le coût d'un chunk et le temps économisé par les sauts"""
+        self.stats['chunks'] += 1
+        if skipped:
+            self.stats['skipped_chunks'] += 1
+            if self._full_cost is not None:
+                self.stats['time_saved_ms'] += max(0.0, self._full_cost - seconds) * 1000
+        elif self._full_cost is None:
+            self._full_cost = seconds
+        else:
+            self._full_cost += 0.1 * (seconds - self._full_cost)
+
+    def get_stats(self) -> Dict:
+        stats = dict(self.stats)
+        frames = stats['frames']
+        chunks = stats['chunks']
+        stats['speech_ratio'] = round(stats['speech_frames'] / frames, 3) if frames else 0.0
+        stats['skip_rate'] = round(stats['skipped_chunks'] / chunks, 3) if chunks else 0.0
+        stats['time_saved_ms'] = round(stats['time_saved_ms'], 1)
+        stats['in_speech'] = self.in_speech
+        stats['noise_floor'] = round(self.noise_floor, 5) if self.noise_floor is not None else None
+        stats['threshold'] = round(self.threshold, 5)
+        return stats
@@ -3,9 +3,126 @@ import cv2
 import numpy as np
 from typing import Dict, Tuple, Optional
 import math
+import threading
+
+# Facteurs de réduction supportés par le décodeur JPEG d'OpenCV
+_REDUCED_GRAYSCALE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+    (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+    (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+)
+
+# Marqueurs JPEG "Start Of Frame" (contiennent les dimensions de l'image)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                     0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Vignette utilisée par le filtre de mouvement (comparaison de frames)
+_MOTION_THUMB_SIZE = (64, 48)
+
+
+def _jpeg_size(data) -> Optional[Tuple[int, int]]:
+    """Lire (largeur, hauteur) dans l'en-tête JPEG sans décoder l'image"""
+    buf = memoryview(data).cast('B')
+    n = len(buf)
+    if n < 4 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return None
+    
+    i = 2
+    while i + 9 < n:
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:  # Octet de bourrage
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # Marqueurs sans longueur
+            i += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height = (buf[i + 5] << 8) | buf[i + 6]
+            width = (buf[i + 7] << 8) | buf[i + 8]
+            return width, height
+        i += 2 + ((buf[i + 2] << 8) | buf[i + 3])
+    return None
+
+
+def decode_frame(jpeg_bytes, analysis_width: Optional[int] = None) -> Tuple[Optional[np.ndarray], Tuple[int, int]]:
+    """
+    Décoder un JPEG directement en niveaux de gris, à résolution réduite si possible
+    Returns: (image grise, (largeur, hauteur) de l'image d'origine)
+    """
+    nparr = np.frombuffer(jpeg_bytes, np.uint8)
+    source_size = _jpeg_size(nparr)
+    
+    flag = cv2.IMREAD_GRAYSCALE
+    if analysis_width and source_size:
+        # Plus grand facteur qui reste au-dessus de la résolution d'analyse
+        for factor, reduced_flag in _REDUCED_GRAYSCALE_FLAGS:
+            if source_size[0] // factor >= analysis_width:
+                flag = reduced_flag
+                break
+    
+    gray = cv2.imdecode(nparr, flag)
+    if gray is None:
+        return None, (0, 0)
+    if source_size is None:
+        source_size = (gray.shape[1], gray.shape[0])
+    return gray, source_size
+
+
+# Cache des cascades Haar partagé par toutes les sessions du processus.
+# detectMultiScale modifie l'état interne du classifieur : une instance par thread
+# worker (et non par session) évite à la fois les rechargements et les courses.
+_cascade_cache = threading.local()
+_cascade_loads = {'count': 0}
+_cascade_loads_lock = threading.Lock()
+
+
+def get_cascade(filename: str) -> cv2.CascadeClassifier:
+    """Retourner la cascade Haar demandée, chargée une seule fois par thread"""
+    classifiers = getattr(_cascade_cache, 'classifiers', None)
+    if classifiers is None:
+        classifiers = _cascade_cache.classifiers = {}
+    
+    cascade = classifiers.get(filename)
+    if cascade is None:
+        cascade = classifiers[filename] = cv2.CascadeClassifier(cv2.data.haarcascades + filename)
+        with _cascade_loads_lock:
+            _cascade_loads['count'] += 1
+    return cascade
+
+
+def get_cascade_cache_stats() -> Dict:
+    """Nombre de fichiers XML chargés depuis le démarrage du processus"""
+    with _cascade_loads_lock:
+        return {'cascade_loads': _cascade_loads['count']}
+
 
 class VideoAnalyzer:
-    def __init__(self):
+    # Modes de détection disponibles
+    DETECTION_MODES = ('full', 'tracked')
+
+    def __init__(self, detection_mode: str = 'full', redetect_interval: int = 15,
+                 roi_margin: float = 0.5, analysis_width: Optional[int] = None,
+                 expression_interval: int = 1, max_detect_backoff: int = 1,
+                 motion_threshold: float = 0.0, motion_refresh_interval: int = 30):
+        """
+        detection_mode: 'full' (cascade sur toute l'image à chaque frame) ou
+            'tracked' (recherche dans une fenêtre autour du dernier visage)
+        redetect_interval: en mode 'tracked', re-détection complète toutes les N frames
+        roi_margin: marge ajoutée de chaque côté du dernier visage (fraction de sa taille)
+        analysis_width: largeur de travail des cascades (None = résolution d'origine)
+        expression_interval: cascades yeux/sourire toutes les N frames avec visage
+            (l'expression précédente est réutilisée entre deux analyses)
+        max_detect_backoff: sans visage, la détection est retentée après 1, 2, 4...
+            frames, jusqu'à N frames d'écart (1 = détection à chaque frame)
+        motion_threshold: différence moyenne (niveaux de gris, vignette 64x48) sous
+            laquelle la frame est jugée statique et l'état précédent réutilisé (0 = désactivé)
+        motion_refresh_interval: analyse complète forcée après N frames statiques consécutives
+        """
+        if detection_mode not in self.DETECTION_MODES:
+            raise ValueError(f"detection_mode inconnu: {detection_mode}")
+
         self.state = {
             'face_detected': False,
             'head_pose': {'pitch': 0, 'yaw': 0, 'roll': 0},
@@ -14,13 +131,12 @@ class VideoAnalyzer:
             'facial_expression': {
                 'emotion': 'neutral',
                 'confidence': 0.0
-            }
+            },
+            'fresh': self._fresh_flags(False)
         }
         
         self.previous_center = None
         self.emotion_history = []
-        self.frame_skip = 0
-        self.skip_interval = 1 # Analyser chaque frame reçue, le throttling est géré en amont
         
         # Nouveau : tracker l'immobilité
         self.immobility_frames = 0
@@ -31,53 +147,143 @@ class VideoAnalyzer:
         self.smoothing_factor = 0.15  # 0.1 = très lent/stable, 0.9 = très réactif/nerveux
         
         # Utiliser Haar Cascades (toujours disponible, rapide)
-        print("⏳ Chargement Haar Cascades...")
-        cascade_path = cv2.data.haarcascades
-        self.face_cascade = cv2.CascadeClassifier(cascade_path + 'haarcascade_frontalface_default.xml')
-        self.profile_cascade = cv2.CascadeClassifier(cascade_path + 'haarcascade_profileface.xml')
-        self.eye_cascade = cv2.CascadeClassifier(cascade_path + 'haarcascade_eye.xml')
-        self.smile_cascade = cv2.CascadeClassifier(cascade_path + 'haarcascade_smile.xml')
+        # Les classifieurs viennent du cache partagé (cf. get_cascade)
         
         # Historique pour stabilité
         self.face_history = []
         self.blink_counter = 0
         self.last_eye_state = True
         
+        # Suivi du visage (mode 'tracked')
+        self.detection_mode = detection_mode
+        self.redetect_interval = max(1, redetect_interval)
+        self.roi_margin = roi_margin
+        self.last_face_box = None
+        self.frames_since_full_detect = 0
+        self.detection_stats = {'tracked': 0, 'full': 0, 'track_lost': 0}
+        
+        # Résolution d'analyse réduite
+        self.analysis_width = analysis_width
+        
+        # Cadence par étage : pose à chaque frame, expression toutes les N frames,
+        # détection espacée exponentiellement tant qu'aucun visage n'est trouvé
+        self.expression_interval = max(1, expression_interval)
+        self.max_detect_backoff = max(1, max_detect_backoff)
+        self.frames_since_expression = None  # None = pas d'expression en cache
+        self.no_face_streak = 0
+        self.detect_skip = 0
+        self.stage_stats = self._new_stage_stats()
+        
+        # Filtre de mouvement : vignettes de la dernière frame analysée et de la
+        # dernière analyse d'expression, comparées à la frame courante
+        self.motion_threshold = motion_threshold
+        self.motion_refresh_interval = max(1, motion_refresh_interval)
+        self.motion_reference = None
+        self.expression_reference = None
+        self.static_frames = 0
+        
         print("✅ VideoAnalyzer initialisé avec OpenCV Haar Cascades")
     
-    def analyze_frame(self, frame: np.ndarray) -> Dict:
-        """Analyse une frame vidéo avec OpenCV"""
+    @property
+    def face_cascade(self) -> cv2.CascadeClassifier:
+        return get_cascade('haarcascade_frontalface_default.xml')
+    
+    @property
+    def profile_cascade(self) -> cv2.CascadeClassifier:
+        return get_cascade('haarcascade_profileface.xml')
+    
+    @property
+    def eye_cascade(self) -> cv2.CascadeClassifier:
+        return get_cascade('haarcascade_eye.xml')
+    
+    @property
+    def smile_cascade(self) -> cv2.CascadeClassifier:
+        return get_cascade('haarcascade_smile.xml')
+    
+    def analyze_frame(self, frame: np.ndarray, source_size: Optional[Tuple[int, int]] = None) -> Dict:
+        """
+        Analyse une frame vidéo avec OpenCV
+        frame: image BGR ou déjà en niveaux de gris (cf. decode_frame)
+        source_size: (largeur, hauteur) de l'image d'origine si la frame a été réduite
+        """
         try:
-            self.frame_skip += 1
-            if self.frame_skip % self.skip_interval != 0:
+            self.stage_stats['frames'] += 1
+            
+            # Backoff : pas de visage récemment, on attend avant de relancer la cascade
+            if self.detect_skip > 0:
+                self.detect_skip -= 1
+                self.stage_stats['detect_skipped'] += 1
+                self._handle_no_face()
+                self.state['fresh'] = self._fresh_flags(False)
                 return self.state
             
-            height, width = frame.shape[:2]
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            width, height = source_size or (frame.shape[1], frame.shape[0])
+            
+            # Les cascades tournent à la résolution de travail
+            gray = self._to_analysis_size(gray)
+            
+            # Scène statique : réutiliser l'état précédent sans lancer les cascades
+            thumb = self._motion_thumbnail(gray)
+            forced_refresh = False
+            if thumb is not None and self._is_static(thumb, self.motion_reference):
+                if self.static_frames + 1 < self.motion_refresh_interval:
+                    self.static_frames += 1
+                    self.stage_stats['motion_skipped'] += 1
+                    self.state['fresh'] = self._fresh_flags(False)
+                    return self.state
+                forced_refresh = True  # Trop longtemps sans analyse : tout recalculer
+            self.static_frames = 0
+            self.motion_reference = thumb
+            
+            scale_x = width / gray.shape[1]
+            scale_y = height / gray.shape[0]
             
-            # Détecter le visage
+            # Détecter le visage (coordonnées de travail)
             face_box = self._detect_face_cascade(gray)
             
             if face_box is None:
+                self._schedule_detect_backoff()
                 self._handle_no_face()
+                self.state['fresh'] = self._fresh_flags(False, detection=True)
                 return self.state
             
-            x, y, w, h = face_box
+            self.no_face_streak = 0
+            fx, fy, fw, fh = face_box
             self.state['face_detected'] = True
             
+            # Ramener la boîte dans les coordonnées d'origine pour la pose et l'engagement
+            x, y = int(round(fx * scale_x)), int(round(fy * scale_y))
+            w, h = int(round(fw * scale_x)), int(round(fh * scale_y))
+            
             # Calculer la pose de la tête
             self.state['head_pose'] = self._estimate_head_pose(x, y, w, h, width, height)
             
-            # Analyser l'expression faciale
-            face_roi = frame[y:y+h, x:x+w]
-            face_roi_gray = gray[y:y+h, x:x+w]
-            
-            emotion, confidence = self._analyze_expression(face_roi, face_roi_gray)
-            self.state['facial_expression'] = {
-                'emotion': emotion,
-                'confidence': confidence
-            }
-            self.state['emotion_hint'] = emotion
+            # Analyser l'expression faciale (ROI grise uniquement) à sa propre cadence
+            expression_fresh = (self.frames_since_expression is None
+                                or self.frames_since_expression + 1 >= self.expression_interval)
+            if (expression_fresh and thumb is not None and not forced_refresh
+                    and self.frames_since_expression is not None
+                    and self.frames_since_expression + 1 < self.motion_refresh_interval
+                    and self._is_static(thumb, self.expression_reference, face_box, gray.shape)):
+                # Le visage n'a pas bougé depuis la dernière analyse d'expression
+                expression_fresh = False
+                self.stage_stats['expression_static'] += 1
+            if expression_fresh:
+                face_roi_gray = gray[fy:fy+fh, fx:fx+fw]
+                emotion, confidence = self._analyze_expression(face_roi_gray)
+                self.frames_since_expression = 0
+                self.expression_reference = thumb
+                self.state['facial_expression'] = {
+                    'emotion': emotion,
+                    'confidence': confidence
+                }
+                self.state['emotion_hint'] = emotion
+            else:
+                emotion = self.state['facial_expression']['emotion']
+                confidence = self.state['facial_expression']['confidence']
+                self.frames_since_expression += 1
+                self.stage_stats['expression_reused'] += 1
             
             # Calculer l'engagement
             self.state['engagement_score'] = self._calculate_engagement(
@@ -86,25 +292,110 @@ class VideoAnalyzer:
             
             self._update_emotion_history(emotion)
             
+            self.state['fresh'] = self._fresh_flags(True, expression=expression_fresh)
             return self.state
             
         except Exception as e:
             print(f"❌ Erreur analyse frame: {e}")
             self._handle_no_face()
+            self.state['fresh'] = self._fresh_flags(False)
             return self.state
     
+    @staticmethod
+    def _fresh_flags(face: bool, detection: Optional[bool] = None,
+                     expression: Optional[bool] = None) -> Dict:
+        """Indiquer quels étages ont été recalculés sur cette frame (sinon valeurs réutilisées)"""
+        return {
+            'detection': face if detection is None else detection,
+            'pose': face,
+            'expression': face if expression is None else expression,
+            'engagement': face,
+        }
+    
+    @staticmethod
+    def _new_stage_stats() -> Dict:
+        return {'frames': 0, 'detect_skipped': 0, 'expression_reused': 0,
+                'motion_skipped': 0, 'expression_static': 0}
+    
+    def _motion_thumbnail(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        """Vignette très réduite de la frame (None si le filtre est désactivé)"""
+        if self.motion_threshold <= 0:
+            return None
+        return cv2.resize(gray, _MOTION_THUMB_SIZE, interpolation=cv2.INTER_AREA)
+    
+    def _is_static(self, thumb: np.ndarray, reference: Optional[np.ndarray],
+                   box: Optional[Tuple] = None, frame_shape: Optional[Tuple] = None) -> bool:
+        """
+        Comparer la vignette à la référence (toute l'image, ou seulement la zone
+        de la boîte `box` exprimée dans une image de taille `frame_shape`)
+        """
+        if reference is None:
+            return False
+        
+        if box is not None:
+            thumb_w, thumb_h = _MOTION_THUMB_SIZE
+            sx, sy = thumb_w / frame_shape[1], thumb_h / frame_shape[0]
+            x, y, w, h = box
+            x0, y0 = int(x * sx), int(y * sy)
+            x1 = min(thumb_w, max(x0 + 1, int(math.ceil((x + w) * sx))))
+            y1 = min(thumb_h, max(y0 + 1, int(math.ceil((y + h) * sy))))
+            thumb, reference = thumb[y0:y1, x0:x1], reference[y0:y1, x0:x1]
+            if thumb.size == 0:
+                return False
+        
+        return float(cv2.absdiff(thumb, reference).mean()) < self.motion_threshold
+    
+    def _schedule_detect_backoff(self):
+        """Espacer les détections (1, 2, 4... frames) tant que le visage est absent"""
+        self.no_face_streak += 1
+        self.frames_since_expression = None  # Expression à recalculer au retour du visage
+        gap = min(self.max_detect_backoff, 2 ** min(self.no_face_streak - 1, 16))
+        self.detect_skip = gap - 1
+    
+    def _to_analysis_size(self, gray: np.ndarray) -> np.ndarray:
+        """Réduire l'image à la largeur d'analyse si elle est plus large"""
+        if not self.analysis_width or gray.shape[1] <= self.analysis_width:
+            return gray
+        
+        ratio = self.analysis_width / gray.shape[1]
+        size = (self.analysis_width, max(1, int(round(gray.shape[0] * ratio))))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    
     def _detect_face_cascade(self, gray: np.ndarray) -> Optional[Tuple]:
-        """Détection de visage avec Haar Cascades"""
+        """Détection de visage avec Haar Cascades (suivi ROI si activé)"""
+        
+        # Mode suivi : chercher uniquement autour du dernier visage connu,
+        # avec une re-détection complète toutes les N frames
+        if (self.detection_mode == 'tracked' and self.last_face_box is not None
+                and self.frames_since_full_detect < self.redetect_interval):
+            face = self._detect_face_in_roi(gray, self.last_face_box)
+            if face is not None:
+                self.detection_stats['tracked'] += 1
+                self.frames_since_full_detect += 1
+                self.last_face_box = face
+                return face
+            # Piste perdue : retomber sur la détection complète
+            self.detection_stats['track_lost'] += 1
+        
+        face = self._detect_face_full(gray)
+        self.detection_stats['full'] += 1
+        self.frames_since_full_detect = 0
+        self.last_face_box = face
+        return face
+    
+    def _detect_face_full(self, gray: np.ndarray, min_size: Tuple = (30, 30),
+                          max_size: Tuple = (0, 0)) -> Optional[Tuple]:
+        """Cascade frontale puis profil sur l'image fournie"""
         
         # Détecter faces frontales
         faces = self.face_cascade.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
+            gray, scaleFactor=1.1, minNeighbors=5, minSize=min_size, maxSize=max_size
         )
         
         # Si pas de face, essayer profil
         if len(faces) == 0:
             faces = self.profile_cascade.detectMultiScale(
-                gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
+                gray, scaleFactor=1.1, minNeighbors=5, minSize=min_size, maxSize=max_size
             )
         
         if len(faces) == 0:
@@ -112,7 +403,35 @@ class VideoAnalyzer:
         
         # Prendre le plus grand visage
         face = max(faces, key=lambda f: f[2] * f[3])
-        return tuple(face)
+        return tuple(int(v) for v in face)
+    
+    def _detect_face_in_roi(self, gray: np.ndarray, box: Tuple) -> Optional[Tuple]:
+        """Chercher le visage dans une fenêtre élargie autour de la dernière boîte"""
+        x, y, w, h = box
+        frame_h, frame_w = gray.shape[:2]
+        
+        margin_x = int(w * self.roi_margin)
+        margin_y = int(h * self.roi_margin)
+        x0 = max(0, x - margin_x)
+        y0 = max(0, y - margin_y)
+        x1 = min(frame_w, x + w + margin_x)
+        y1 = min(frame_h, y + h + margin_y)
+        
+        roi = gray[y0:y1, x0:x1]
+        if roi.size == 0:
+            return None
+        
+        # Limiter les échelles testées autour de la taille précédente
+        size = min(w, h)
+        min_size = (max(30, int(size * 0.6)),) * 2
+        max_size = (int(size * 1.6),) * 2
+        
+        face = self._detect_face_full(roi, min_size=min_size, max_size=max_size)
+        if face is None:
+            return None
+        
+        fx, fy, fw, fh = face
+        return (fx + x0, fy + y0, fw, fh)
     
     def _estimate_head_pose(self, x: int, y: int, w: int, h: int, 
                            frame_width: int, frame_height: int) -> Dict:
@@ -153,10 +472,10 @@ class VideoAnalyzer:
             'roll': round(self.pose_smoothing['roll'], 1)
         }
     
-    def _analyze_expression(self, face_roi: np.ndarray, face_roi_gray: np.ndarray) -> Tuple[str, float]:
+    def _analyze_expression(self, face_roi_gray: np.ndarray) -> Tuple[str, float]:
         """Analyser l'expression faciale"""
         
-        if face_roi.size == 0 or face_roi_gray.size == 0:
+        if face_roi_gray.size == 0:
             return 'neutral', 0.5
         
         h, w = face_roi_gray.shape[:2]
@@ -265,6 +584,17 @@ class VideoAnalyzer:
         """Retourner l'état actuel"""
         return self.state.copy()
     
+    def get_detection_stats(self) -> Dict:
+        """Nombre de frames passées par le chemin suivi vs détection complète"""
+        stats = dict(self.detection_stats)
+        stats.update(self.stage_stats)
+        stats['mode'] = self.detection_mode
+        total = stats['tracked'] + stats['full']
+        stats['tracked_ratio'] = round(stats['tracked'] / total, 3) if total else 0.0
+        frames = stats['frames']
+        stats['motion_skip_rate'] = round(stats['motion_skipped'] / frames, 3) if frames else 0.0
+        return stats
+    
     def reset(self):
         """Réinitialiser l'analyseur"""
         self.state = {
@@ -275,11 +605,22 @@ class VideoAnalyzer:
             'facial_expression': {
                 'emotion': 'neutral',
                 'confidence': 0.0
-            }
+            },
+            'fresh': self._fresh_flags(False)
         }
         self.previous_center = None
         self.emotion_history = []
         self.blink_counter = 0
         self.immobility_frames = 0
         self.movement_history = []
+        self.last_face_box = None
+        self.frames_since_full_detect = 0
+        self.detection_stats = {'tracked': 0, 'full': 0, 'track_lost': 0}
+        self.frames_since_expression = None
+        self.no_face_streak = 0
+        self.detect_skip = 0
+        self.stage_stats = self._new_stage_stats()
+        self.motion_reference = None
+        self.expression_reference = None
+        self.static_frames = 0
         print("🔄 VideoAnalyzer réinitialisé")
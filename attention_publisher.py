@@ -0,0 +1,132 @@
+# attention_publisher.py
+"""
+Réévaluation périodique de l'attention et envoi au navigateur par Socket.IO
+
+Un seul minuteur côté serveur recalcule l'état d'attention à intervalle fixe
+(au lieu d'un recalcul à chaque requête de chaque onglet), garde le dernier
+état en cache et ne pousse l'événement 'attention_state' que si le niveau
+change ou si le score varie de plus de `score_delta` points.
+
+Calcul, comparaison, mise en cache et envoi se font dans la même section
+critique : les clients reçoivent les états dans l'ordre où ils ont été calculés.
+
+La route REST /api/attention/state reste disponible en lecture seule : elle
+sert le cache sans rien recalculer.
+"""
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class AttentionPublisher:
+    def __init__(self, detector, emit: Callable[[Dict, Optional[str]], None],
+                 interval: float = 2.0, score_delta: int = 5):
+        """
+        detector: AttentionDetector réévalué par le minuteur
+        emit: fonction (état, sid) qui envoie 'attention_state' (sid None = tous les clients)
+        interval: secondes entre deux réévaluations
+        score_delta: variation du score à dépasser pour pousser un nouvel état
+        """
+        self.detector = detector
+        self.emit = emit
+        self.interval = interval
+        self.score_delta = score_delta
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = detector.get_state()
+        self._snapshot_at = time.time()
+        self._pushed = None  # (niveau, score) du dernier état envoyé
+        self.stats = {'evaluations': 0, 'pushes': 0, 'suppressed': 0}
+
+    def start(self):
+        """Démarrer le minuteur (sans effet s'il tourne déjà)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='attention-publisher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"❌ Erreur réévaluation attention: {e}")
+
+    def refresh(self) -> Dict:
+        """Recalculer l'attention (inactivité, skips...) puis pousser si l'état a changé"""
+        with self._lock:
+            state = self.detector.check_and_update_attention()
+            self.stats['evaluations'] += 1
+            return self._publish_locked(state)
+
+    def track(self, interaction_type: str, data: dict = None) -> Dict:
+        """Enregistrer une interaction et pousser le nouvel état s'il a changé"""
+        with self._lock:
+            state = self.detector.track_interaction(interaction_type, data)
+            return self._publish_locked(state)
+
+    def apply_multimodal(self, unified_state: Dict) -> Dict:
+        """Injecter un état fusionné (caméra / micro) et pousser le nouvel état s'il a changé"""
+        with self._lock:
+            self.detector.apply_multimodal(unified_state)
+            return self._publish_locked(self.detector.get_state())
+
+    def reset(self) -> Dict:
+        with self._lock:
+            self.detector.reset()
+            return self._publish_locked(self.detector.get_state(), force=True)
+
+    def publish(self, state: Dict, force: bool = False) -> Dict:
+        """Mettre l'état en cache et l'envoyer à tous les clients s'il a assez changé"""
+        with self._lock:
+            return self._publish_locked(state, force)
+
+    def _publish_locked(self, state: Dict, force: bool = False) -> Dict:
+        # Appelé sous self._lock, dans la même section critique que le calcul de l'état
+        self._snapshot = state
+        self._snapshot_at = time.time()
+        if not force and not self._changed(state):
+            self.stats['suppressed'] += 1
+            return state
+        self._pushed = (state['attention_level'], state['attention_score'])
+        self.stats['pushes'] += 1
+        # Envoi sous verrou : un état plus ancien ne peut pas doubler un plus récent
+        self.emit(state, None)
+        return state
+
+    def send_snapshot(self, sid: str):
+        """Envoyer l'état courant à un client qui vient de se connecter"""
+        with self._lock:
+            self.emit(self._snapshot_locked(), sid)
+
+    def get_snapshot(self) -> Dict:
+        """Dernier état calculé (lecture seule, aucun recalcul)"""
+        with self._lock:
+            return self._snapshot_locked()
+
+    def _snapshot_locked(self) -> Dict:
+        snapshot = dict(self._snapshot)
+        # Seul le temps depuis la dernière interaction avance entre deux évaluations
+        snapshot['time_since_interaction'] = (snapshot.get('time_since_interaction', 0)
+                                              + time.time() - self._snapshot_at)
+        return snapshot
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'interval': self.interval, 'score_delta': self.score_delta,
+                'running': bool(self._thread and self._thread.is_alive())}
+
+    def _changed(self, state: Dict) -> bool:
+        if self._pushed is None:
+            return True
+        level, score = self._pushed
+        return (state['attention_level'] != level
+                or abs(state['attention_score'] - score) > self.score_delta)
@@ -0,0 +1,378 @@
+# attention_simulation.py
+"""
+Simulation accélérée du détecteur d'attention sur une horloge virtuelle
+
+AttentionDetector et EmotionFusion lisent le temps via une horloge injectable :
+ici, une VirtualClock saute directement d'un événement au suivant. Les seuils
+(30 s de 'no_attention', fenêtre de 20 s des skips...) se vérifient donc sans
+attendre. Le détecteur est réévalué toutes les `check_interval` secondes
+virtuelles, comme par AttentionPublisher en direct. Chaque session produit
+une chronologie score / niveau.
+
+Formats d'entrée (JSON ou NDJSON, un événement par objet) :
+    {"t": 12.0, "type": "skip"}
+    {"t": 14.5, "type": "volume", "data": {"volume": 60}}
+    {"t": 20.0, "type": "multimodal", "video": {...}, "audio": {...}}
+    chronologie produite par `session_capture.py replay` (événements video / audio)
+
+Usage:
+    python attention_simulation.py script events.ndjson --output timeline.ndjson
+    python attention_simulation.py population --users 1000 --duration 900
+    python attention_simulation.py population --thresholds '{"no_attention": 45}' --weights '{"skip_rate": 30}'
+"""
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from analyzers.emotion_fusion import EmotionFusion
+from attention_system import AttentionDetector
+
+LEVELS = ('attentif', 'semi-attentif', 'peu-attentif', 'pas-attentif')
+
+# Profils de population synthétique : taux en événements par minute,
+# présence = part du temps devant la caméra, speech = part des chunks avec parole
+PROFILES = {
+    'engaged': {'play': 0.4, 'skip': 0.3, 'volume': 0.5, 'pause': 0.1, 'tab_hidden': 0.1,
+                'presence': 0.95, 'speech': 0.3},
+    'browsing': {'play': 0.8, 'skip': 2.5, 'volume': 0.3, 'pause': 0.3, 'tab_hidden': 0.5,
+                 'presence': 0.8, 'speech': 0.1},
+    'distracted': {'play': 0.2, 'skip': 0.5, 'volume': 0.1, 'pause': 0.8, 'tab_hidden': 1.5,
+                   'presence': 0.4, 'speech': 0.05},
+    'idle': {'play': 0.05, 'skip': 0.05, 'volume': 0.02, 'pause': 0.05, 'tab_hidden': 0.2,
+             'presence': 0.2, 'speech': 0.0},
+}
+DEFAULT_MIX = {'engaged': 0.4, 'browsing': 0.25, 'distracted': 0.25, 'idle': 0.1}
+
+
+class VirtualClock:
+    """Horloge manuelle, appelable comme time.time"""
+
+    def __init__(self, start: float = 0.0):
+        self.start = start
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance_to(self, t: float):
+        # Le temps ne recule jamais, même si les événements sont mal ordonnés
+        self.now = max(self.now, t)
+
+    def advance(self, seconds: float):
+        self.now += max(0.0, seconds)
+
+
+class AttentionSimulation:
+    def __init__(self, check_interval: float = 2.0, thresholds: Dict = None, weights: Dict = None,
+                 history_limit: int = None):
+        """
+        check_interval: secondes virtuelles entre deux réévaluations périodiques
+        thresholds / weights: surcharges de AttentionDetector.THRESHOLDS / WEIGHTS
+        """
+        self.check_interval = check_interval
+        self.clock = VirtualClock()
+        self.detector = AttentionDetector(history_limit, clock=self.clock, thresholds=thresholds,
+                                          weights=weights, verbose=False)
+        self.fusion = EmotionFusion(clock=self.clock)
+        self.video_state = None
+        self.audio_state = None
+        self.timeline = []
+        self._next_check = check_interval
+        self._record('start')
+
+    def run(self, events: Iterable[Dict], duration: float = None) -> List[Dict]:
+        """
+        Rejouer des événements horodatés (secondes depuis le début de la session)
+        duration: prolonger la simulation sans événement jusqu'à cet instant
+        """
+        events = sorted(events, key=lambda e: e['t'])
+        for event in events:
+            self.advance_to(event['t'])
+            self.apply(event)
+        end = max(duration or 0.0, events[-1]['t'] if events else 0.0)
+        self.advance_to(end)
+        return self.timeline
+
+    def advance_to(self, t: float):
+        """Avancer l'horloge en déclenchant les réévaluations périodiques dépassées"""
+        while self._next_check <= t:
+            self.clock.advance_to(self._next_check)
+            self.detector.check_and_update_attention()
+            self._record('check')
+            self._next_check += self.check_interval
+        self.clock.advance_to(t)
+
+    def apply(self, event: Dict):
+        kind = event['type']
+        if kind == 'multimodal':
+            self.video_state = event.get('video', self.video_state)
+            self.audio_state = event.get('audio', self.audio_state)
+            if self.video_state is None or self.audio_state is None:
+                return
+            # Comme en direct : chaque nouveau résultat déclenche une fusion
+            unified = self.fusion.fuse_signals(self.video_state, self.audio_state)
+            self.detector.apply_multimodal(unified)
+        elif kind == 'reset':
+            self.detector.reset()
+        else:
+            self.detector.track_interaction(kind, event.get('data'))
+        self._record(kind)
+
+    def _record(self, source: str):
+        state = self.detector.state
+        self.timeline.append({
+            't': round(self.clock() - self.clock.start, 3),
+            'score': state['attention_score'],
+            'level': state['attention_level'],
+            'source': source,
+        })
+
+    def summary(self) -> Dict:
+        return summarize_timeline(self.timeline, self.clock() - self.clock.start)
+
+
+def summarize_timeline(timeline: List[Dict], duration: float) -> Dict:
+    """Part du temps par niveau, score moyen pondéré par la durée, premier passage par niveau"""
+    share = dict.fromkeys(LEVELS, 0.0)
+    first_reached = dict.fromkeys(LEVELS)
+    weighted_score = 0.0
+    transitions = 0
+    previous = None
+
+    for i, row in enumerate(timeline):
+        end = timeline[i + 1]['t'] if i + 1 < len(timeline) else duration
+        span = max(0.0, end - row['t'])
+        share[row['level']] += span
+        weighted_score += row['score'] * span
+        if first_reached[row['level']] is None:
+            first_reached[row['level']] = row['t']
+        if previous is not None and row['level'] != previous:
+            transitions += 1
+        previous = row['level']
+
+    return {
+        'duration': round(duration, 3),
+        'level_share': {level: round(share[level] / duration, 4) if duration else 0.0 for level in LEVELS},
+        'mean_score': round(weighted_score / duration, 2) if duration else None,
+        'min_score': min((row['score'] for row in timeline), default=None),
+        'first_reached': first_reached,
+        'transitions': transitions,
+    }
+
+
+def simulate(events: Iterable[Dict], duration: float = None, **options) -> Dict:
+    """Simuler une session ; options transmises à AttentionSimulation"""
+    simulation = AttentionSimulation(**options)
+    timeline = simulation.run(events, duration)
+    return {'timeline': timeline, 'summary': simulation.summary()}
+
+
+def load_events(path: str) -> List[Dict]:
+    """Lire un script JSON (liste) ou NDJSON ; les chronologies de rejeu sont converties"""
+    with open(path, encoding='utf-8') as f:
+        content = f.read()
+    stripped = content.lstrip()
+    if stripped.startswith('['):
+        raw = json.loads(stripped)
+    else:
+        raw = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    events = []
+    for event in raw:
+        if 'kind' in event:
+            event = _from_replay(event)
+            if event is None:
+                continue
+        events.append(event)
+    return events
+
+
+def _from_replay(event: Dict):
+    """Événement de `session_capture.py replay` -> état multimodal (les fusions sont recalculées)"""
+    base = {'t': event['t'], 'type': 'multimodal', 'stream': event.get('stream')}
+    if event['kind'] == 'video':
+        return {**base, 'video': {
+            'face_detected': event['face_detected'],
+            'engagement_score': event['engagement_score'],
+            'head_pose': event['head_pose'],
+            'facial_expression': {'emotion': event.get('emotion', 'neutral'), 'confidence': 0.5},
+        }}
+    if event['kind'] == 'audio':
+        return {**base, 'audio': {
+            'speech_detected': bool(event.get('speech_detected')),
+            'energy_level': event.get('energy_level'),
+            'emotion_hint': event.get('emotion') or 'neutral',
+        }}
+    return None
+
+
+def generate_session(rng: np.random.Generator, profile: Dict, duration: float,
+                     multimodal_hz: float = 1.0) -> List[Dict]:
+    """Flux synthétique : processus de Poisson par type d'interaction + présence alternée"""
+    events = []
+    for kind in ('play', 'skip', 'volume', 'pause', 'tab_hidden'):
+        rate = profile[kind] / 60.0
+        if rate <= 0:
+            continue
+        t = rng.exponential(1.0 / rate)
+        while t < duration:
+            if kind == 'volume':
+                events.append({'t': t, 'type': kind, 'data': {'volume': int(rng.integers(10, 101))}})
+            else:
+                events.append({'t': t, 'type': kind})
+            if kind == 'tab_hidden':
+                # Retour sur l'onglet après une absence de quelques secondes à quelques minutes
+                back = t + rng.exponential(20.0)
+                if back < duration:
+                    events.append({'t': back, 'type': 'tab_visible'})
+            t += rng.exponential(1.0 / rate)
+
+    if multimodal_hz > 0:
+        events.extend(_multimodal_stream(rng, profile, duration, multimodal_hz))
+    return events
+
+
+def _multimodal_stream(rng: np.random.Generator, profile: Dict, duration: float, hz: float) -> List[Dict]:
+    presence = min(max(profile['presence'], 0.01), 0.99)
+    present = bool(rng.random() < presence)
+    # Segments présent / absent dont la durée moyenne respecte la part de présence
+    switch_at = rng.exponential(120.0 * (presence if present else 1 - presence))
+    events = []
+    t = 0.0
+    while t < duration:
+        while t >= switch_at:
+            present = not present
+            switch_at += rng.exponential(120.0 * (presence if present else 1 - presence))
+        video = {'face_detected': present}
+        if present:
+            video.update({
+                'engagement_score': float(np.clip(rng.normal(70, 12), 0, 100)),
+                'head_pose': {'yaw': float(rng.normal(0, 8)), 'pitch': float(rng.normal(0, 6)), 'roll': 0.0},
+                'facial_expression': {'emotion': 'neutral', 'confidence': 0.5},
+            })
+        audio = {'speech_detected': bool(rng.random() < profile['speech']), 'emotion_hint': 'neutral'}
+        events.append({'t': t, 'type': 'multimodal', 'video': video, 'audio': audio})
+        t += 1.0 / hz
+    return events
+
+
+def simulate_population(users: int = 100, duration: float = 900.0, seed: int = 0, mix: Dict = None,
+                        multimodal_hz: float = 1.0, on_timeline=None, **options) -> Dict:
+    """
+    Simuler une population synthétique et agréger les résultats par profil
+    mix: {profil: proportion} parmi PROFILES (DEFAULT_MIX par défaut)
+    on_timeline: callback(user, profil, chronologie) pour chaque session
+    """
+    rng = np.random.default_rng(seed)
+    mix = mix or DEFAULT_MIX
+    names = list(mix)
+    probabilities = np.array([mix[name] for name in names], dtype=float)
+    probabilities /= probabilities.sum()
+
+    per_profile = defaultdict(list)
+    started_at = time.perf_counter()
+    for user in range(users):
+        name = names[rng.choice(len(names), p=probabilities)]
+        # Variabilité individuelle autour du profil
+        profile = {key: value * rng.lognormal(0.0, 0.3) for key, value in PROFILES[name].items()}
+        events = generate_session(rng, profile, duration, multimodal_hz)
+        result = simulate(events, duration, **options)
+        if on_timeline:
+            on_timeline(user, name, result['timeline'])
+        per_profile[name].append(result['summary'])
+    elapsed = time.perf_counter() - started_at
+
+    summaries = [s for group in per_profile.values() for s in group]
+    return {
+        'users': users,
+        'virtual_seconds': users * duration,
+        'wall_seconds': round(elapsed, 3),
+        'speedup': round(users * duration / elapsed) if elapsed else None,
+        'overall': _aggregate(summaries),
+        'profiles': {name: _aggregate(group) for name, group in sorted(per_profile.items())},
+    }
+
+
+def _aggregate(summaries: List[Dict]) -> Dict:
+    reached = {level: [s['first_reached'][level] for s in summaries if s['first_reached'][level] is not None]
+               for level in LEVELS}
+    return {
+        'sessions': len(summaries),
+        'mean_score': round(float(np.mean([s['mean_score'] for s in summaries])), 2),
+        'level_share': {level: round(float(np.mean([s['level_share'][level] for s in summaries])), 4)
+                        for level in LEVELS},
+        # Part des sessions atteignant chaque niveau et délai médian du premier passage
+        'reached_ratio': {level: round(len(reached[level]) / len(summaries), 3) for level in LEVELS},
+        'median_first_reached': {level: round(float(np.median(reached[level])), 1) if reached[level] else None
+                                 for level in LEVELS},
+        'transitions_avg': round(float(np.mean([s['transitions'] for s in summaries])), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--check-interval', type=float, default=2.0,
+                        help='secondes virtuelles entre deux réévaluations')
+    parser.add_argument('--thresholds', type=json.loads, default=None, help='surcharge JSON de THRESHOLDS')
+    parser.add_argument('--weights', type=json.loads, default=None, help='surcharge JSON de WEIGHTS')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    script_parser = commands.add_parser('script', help='rejouer un flux scripté ou enregistré')
+    script_parser.add_argument('events')
+    script_parser.add_argument('--duration', type=float, default=None)
+    script_parser.add_argument('--output', '-o', help='chronologie NDJSON (défaut : stdout)')
+
+    population_parser = commands.add_parser('population', help='simuler une population synthétique')
+    population_parser.add_argument('--users', type=int, default=100)
+    population_parser.add_argument('--duration', type=float, default=900.0)
+    population_parser.add_argument('--seed', type=int, default=0)
+    population_parser.add_argument('--mix', type=json.loads, default=None,
+                                   help=f'proportions JSON parmi {", ".join(PROFILES)}')
+    population_parser.add_argument('--multimodal-hz', type=float, default=1.0,
+                                   help='fréquence des états vidéo / audio (0 = interactions seules)')
+    population_parser.add_argument('--timelines', help='écrire toutes les chronologies (NDJSON)')
+    args = parser.parse_args()
+
+    options = {'check_interval': args.check_interval, 'thresholds': args.thresholds, 'weights': args.weights}
+
+    if args.command == 'script':
+        streams = defaultdict(list)
+        for event in load_events(args.events):
+            streams[event.get('stream')].append(event)
+
+        output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        summaries = {}
+        try:
+            for stream, events in streams.items():
+                result = simulate(events, args.duration, **options)
+                summaries[stream or 'default'] = result['summary']
+                for row in result['timeline']:
+                    output.write(json.dumps({**row, 'stream': stream} if stream else row) + '\n')
+        finally:
+            if args.output:
+                output.close()
+        print(json.dumps(summaries, indent=2), file=sys.stderr)
+        return
+
+    timelines = open(args.timelines, 'w', encoding='utf-8') if args.timelines else None
+
+    def write_timeline(user, profile, timeline):
+        for row in timeline:
+            timelines.write(json.dumps({'user': user, 'profile': profile, **row}) + '\n')
+
+    try:
+        result = simulate_population(args.users, args.duration, args.seed, args.mix, args.multimodal_hz,
+                                     on_timeline=write_timeline if timelines else None, **options)
+    finally:
+        if timelines:
+            timelines.close()
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
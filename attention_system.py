@@ -4,10 +4,44 @@ Estime le niveau d'attention sans IA
 """
 
 import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Tuple
 import json
 
+
+class EventWindow:
+    """
+    Événements horodatés : compteur sur fenêtre glissante + historique borné
+    Le comptage retire les événements sortis de la fenêtre par la gauche
+    (O(1) amorti), quel que soit l'âge de la session.
+    """
+    
+    def __init__(self, window: float, history_limit: int = 200, max_recent: int = 1000,
+                 clock: Callable[[], float] = time.time):
+        self.window = window
+        self.clock = clock
+        self._recent = deque(maxlen=max_recent)     # Horodatages encore dans la fenêtre
+        self.history = deque(maxlen=history_limit)  # Derniers événements (débogage)
+    
+    def add(self, timestamp: float, event=None):
+        self._recent.append(timestamp)
+        self.history.append(event if event is not None else timestamp)
+    
+    def count(self, now: float = None) -> int:
+        """Nombre d'événements de moins de `window` secondes"""
+        now = now if now is not None else self.clock()
+        recent = self._recent
+        while recent and now - recent[0] >= self.window:
+            recent.popleft()
+        return len(recent)
+
+
+def _points(weight: float, fraction: float) -> int:
+    """Part `fraction` du poids d'un signal, en points entiers"""
+    return int(round(weight * fraction))
+
+
 class AttentionDetector:
     """
     Détecte le niveau d'attention de l'utilisateur basé sur des signaux comportementaux
@@ -33,19 +67,48 @@ class AttentionDetector:
         'tab_switches': 10,             # Changements d'onglet
     }
     
-    def __init__(self):
+    # Fenêtres de comptage (en secondes) des signaux récents
+    SIGNAL_WINDOWS = {
+        'skips': THRESHOLDS['skip_burst_window'],
+        'volume_changes': 120,
+        'pauses': 300,
+    }
+    
+    # Nombre d'événements conservés par signal pour le débogage
+    HISTORY_LIMIT = 200
+    
+    def __init__(self, history_limit: int = None, clock: Callable[[], float] = None,
+                 thresholds: Dict = None, weights: Dict = None, verbose: bool = True):
+        """
+        history_limit: événements conservés par liste (interactions, skips,
+            actions adaptatives...) ; les compteurs ne dépendent que des fenêtres
+        clock: source du temps en secondes (time.time par défaut) ; une horloge
+            virtuelle permet de rejouer des sessions plus vite que le temps réel
+        thresholds / weights: surcharges de THRESHOLDS / WEIGHTS pour cette instance
+        verbose: afficher le détail des calculs (traces [ATTENTION])
+        """
+        self.history_limit = history_limit or self.HISTORY_LIMIT
+        self.clock = clock or time.time
+        self.verbose = verbose
+        self._overrides = (thresholds, weights)
+        if thresholds:
+            self.THRESHOLDS = {**type(self).THRESHOLDS, **thresholds}
+        if weights:
+            self.WEIGHTS = {**type(self).WEIGHTS, **weights}
+        windows = {**self.SIGNAL_WINDOWS, 'skips': self.THRESHOLDS['skip_burst_window']}
+        
         self.state = {
             'attention_level': 'attentif',
             'attention_score': 100,
-            'last_interaction': time.time(),
-            'interactions': [],
-            'skips': [],
-            'volume_changes': [],
-            'pauses': [],
+            'last_interaction': self.clock(),
+            'interactions': deque(maxlen=self.history_limit),
+            'skips': EventWindow(windows['skips'], self.history_limit, clock=self.clock),
+            'volume_changes': EventWindow(windows['volume_changes'], self.history_limit, clock=self.clock),
+            'pauses': EventWindow(windows['pauses'], self.history_limit, clock=self.clock),
             'tab_switches': 0,
             'tab_switch_time': None,
             'current_song_start': None,
-            'adaptive_actions': [],
+            'adaptive_actions': deque(maxlen=self.history_limit),
         }
         
         self.adaptations = {
@@ -53,13 +116,19 @@ class AttentionDetector:
             'music_style': 'engaging',
             'ui_intensity': 'high',
         }
+        
+        self._absent_tracked_at = float('-inf')
+    
+    def _debug(self, message: str):
+        if self.verbose:
+            print(message)
     
     def track_interaction(self, interaction_type: str, data: dict = None):
         """
         Enregistrer une interaction utilisateur
         Types: play, pause, skip, volume, seek, playlist, tab_visible, tab_hidden
         """
-        now = time.time()
+        now = self.clock()
         
         interaction = {
             'type': interaction_type,
@@ -70,129 +139,116 @@ class AttentionDetector:
         self.state['interactions'].append(interaction)
         self.state['last_interaction'] = now
         
-        print(f"[ATTENTION] Interaction: {interaction_type}")  # DEBUG
+        self._debug(f"[ATTENTION] Interaction: {interaction_type}")  # DEBUG
         
         # Traiter selon le type d'interaction
         if interaction_type == 'skip':
-            self.state['skips'].append(now)
-            self._clean_old_skips()
-            print(f"[ATTENTION] Skips récents: {len(self.state['skips'])}")  # DEBUG
+            self.state['skips'].add(now)
+            self._debug(f"[ATTENTION] Skips récents: {self.state['skips'].count(now)}")  # DEBUG
             
         elif interaction_type == 'volume':
-            self.state['volume_changes'].append({
+            self.state['volume_changes'].add(now, {
                 'timestamp': now,
-                'value': data.get('volume', 0)
+                'value': (data or {}).get('volume', 0)
             })
-            print(f"[ATTENTION] Volume changé: {data.get('volume')}")  # DEBUG
+            self._debug(f"[ATTENTION] Volume changé: {(data or {}).get('volume')}")  # DEBUG
             
         elif interaction_type == 'pause':
-            self.state['pauses'].append(now)
-            print(f"[ATTENTION] Pause enregistrée")  # DEBUG
+            self.state['pauses'].add(now)
+            self._debug(f"[ATTENTION] Pause enregistrée")  # DEBUG
             
         elif interaction_type == 'tab_hidden':
             self.state['tab_switches'] += 1
             self.state['tab_switch_time'] = now
-            print(f"[ATTENTION] Tab caché (total: {self.state['tab_switches']})")  # DEBUG
+            self._debug(f"[ATTENTION] Tab caché (total: {self.state['tab_switches']})")  # DEBUG
             
         elif interaction_type == 'tab_visible':
             if self.state['tab_switch_time']:
                 duration = now - self.state['tab_switch_time']
                 if duration < 30:
                     self.state['attention_score'] = min(100, self.state['attention_score'] + 5)
-                    print(f"[ATTENTION] Retour rapide, bonus +5")  # DEBUG
+                    self._debug(f"[ATTENTION] Retour rapide, bonus +5")  # DEBUG
         
         # Recalculer le niveau d'attention
         self._calculate_attention()
         
         return self._get_current_state()
     
-    def _clean_old_skips(self):
-        """Nettoyer les skips de plus de 20 secondes"""
-        now = time.time()
-        window = self.THRESHOLDS['skip_burst_window']
-        old_count = len(self.state['skips'])
-        self.state['skips'] = [s for s in self.state['skips'] if now - s < window]
-        new_count = len(self.state['skips'])
-        if old_count != new_count:
-            print(f"[ATTENTION] Nettoyage skips: {old_count} -> {new_count}")  # DEBUG
-    
     def _calculate_attention(self):
         """
         Calculer le niveau d'attention basé sur plusieurs signaux
         Retourne un score de 0 (pas attentif) à 100 (très attentif)
         """
-        now = time.time()
+        now = self.clock()
+        weights = self.WEIGHTS
         score = 100
         old_score = self.state['attention_score']
         
-        print(f"\n[ATTENTION] === Calcul du score ===")  # DEBUG
+        self._debug(f"\n[ATTENTION] === Calcul du score ===")  # DEBUG
         
         # 1. Temps depuis la dernière interaction (40 points)
         time_since_interaction = now - self.state['last_interaction']
         interaction_penalty = 0
         
         if time_since_interaction > self.THRESHOLDS['no_attention']:  # 30s
-            interaction_penalty = 40
+            interaction_penalty = _points(weights['time_since_interaction'], 1)  # 40
         elif time_since_interaction > self.THRESHOLDS['low_attention']:  # 15s
-            interaction_penalty = 30
+            interaction_penalty = _points(weights['time_since_interaction'], 0.75)  # 30
         elif time_since_interaction > self.THRESHOLDS['semi_attentive']:  # 8s
-            interaction_penalty = 15
+            interaction_penalty = _points(weights['time_since_interaction'], 0.375)  # 15
         elif time_since_interaction > self.THRESHOLDS['interaction_timeout']:  # 3s
-            interaction_penalty = 5
+            interaction_penalty = _points(weights['time_since_interaction'], 0.125)  # 5
         
         score -= interaction_penalty
-        print(f"[ATTENTION] Temps inactivité: {time_since_interaction:.1f}s -> Pénalité: -{interaction_penalty}")
+        self._debug(f"[ATTENTION] Temps inactivité: {time_since_interaction:.1f}s -> Pénalité: -{interaction_penalty}")
         
-        # 2. Taux de skip (25 points)
-        recent_skips = len(self.state['skips'])
+        # 2. Taux de skip (25 points) : skips des 20 dernières secondes
+        recent_skips = self.state['skips'].count(now)
         skip_penalty = 0
         
         if recent_skips >= 5:
-            skip_penalty = 25
+            skip_penalty = _points(weights['skip_rate'], 1)  # 25
         elif recent_skips >= 3:
-            skip_penalty = 15
+            skip_penalty = _points(weights['skip_rate'], 0.6)  # 15
         elif recent_skips >= 1:
-            skip_penalty = 5
+            skip_penalty = _points(weights['skip_rate'], 0.2)  # 5
         
         score -= skip_penalty
-        print(f"[ATTENTION] Skips: {recent_skips} -> Pénalité: -{skip_penalty}")
+        self._debug(f"[ATTENTION] Skips: {recent_skips} -> Pénalité: -{skip_penalty}")
         
         # 3. Ajustements manuels du volume (15 points) - BONUS
-        recent_volume_changes = [
-            v for v in self.state['volume_changes']
-            if now - v['timestamp'] < 120
-        ]
+        recent_volume_changes = self.state['volume_changes'].count(now)  # 2 dernières minutes
         volume_bonus = 0
         
-        if len(recent_volume_changes) >= 3:
-            volume_bonus = 10
-        elif len(recent_volume_changes) >= 1:
-            volume_bonus = 5
+        if recent_volume_changes >= 3:
+            volume_bonus = _points(weights['manual_adjustments'], 2 / 3)  # 10
+        elif recent_volume_changes >= 1:
+            volume_bonus = _points(weights['manual_adjustments'], 1 / 3)  # 5
         
         score += volume_bonus
-        print(f"[ATTENTION] Volume ajusté: {len(recent_volume_changes)} fois -> Bonus: +{volume_bonus}")
+        self._debug(f"[ATTENTION] Volume ajusté: {recent_volume_changes} fois -> Bonus: +{volume_bonus}")
         
         # 4. Fréquence de pause/reprise (10 points)
-        recent_pauses = [p for p in self.state['pauses'] if now - p < 300]
+        recent_pauses = self.state['pauses'].count(now)  # 5 dernières minutes
         pause_penalty = 0
         
-        if len(recent_pauses) >= 5:
-            pause_penalty = 10
-        elif len(recent_pauses) >= 3:
-            pause_penalty = 5
+        if recent_pauses >= 5:
+            pause_penalty = _points(weights['pause_frequency'], 1)  # 10
+        elif recent_pauses >= 3:
+            pause_penalty = _points(weights['pause_frequency'], 0.5)  # 5
         
         score -= pause_penalty
-        print(f"[ATTENTION] Pauses: {len(recent_pauses)} -> Pénalité: -{pause_penalty}")
+        self._debug(f"[ATTENTION] Pauses: {recent_pauses} -> Pénalité: -{pause_penalty}")
         
         # 5. Changements d'onglet (10 points)
         tab_penalty = 0
         if self.state['tab_switches'] > 10:
-            tab_penalty = 10
+            tab_penalty = _points(weights['tab_switches'], 1)  # 10
         elif self.state['tab_switches'] > 5:
-            tab_penalty = 5
+            tab_penalty = _points(weights['tab_switches'], 0.5)  # 5
         
         score -= tab_penalty
-        print(f"[ATTENTION] Changements tab: {self.state['tab_switches']} -> Pénalité: -{tab_penalty}")
+        self._debug(f"[ATTENTION] Changements tab: {self.state['tab_switches']} -> Pénalité: -{tab_penalty}")
         
         # Limiter entre 0 et 100
         score = max(0, min(100, score))
@@ -210,9 +266,9 @@ class AttentionDetector:
         else:
             self.state['attention_level'] = 'pas-attentif'
         
-        print(f"[ATTENTION] Score: {old_score} -> {score}")
-        print(f"[ATTENTION] Niveau: {old_level} -> {self.state['attention_level']}")
-        print(f"[ATTENTION] === Fin calcul ===\n")
+        self._debug(f"[ATTENTION] Score: {old_score} -> {score}")
+        self._debug(f"[ATTENTION] Niveau: {old_level} -> {self.state['attention_level']}")
+        self._debug(f"[ATTENTION] === Fin calcul ===\n")
         
         # Adapter automatiquement
         self._adapt_player()
@@ -245,7 +301,7 @@ class AttentionDetector:
         
         # Enregistrer l'action adaptative
         self.state['adaptive_actions'].append({
-            'timestamp': time.time(),
+            'timestamp': self.clock(),
             'level': level,
             'adaptations': dict(self.adaptations)
         })
@@ -256,23 +312,39 @@ class AttentionDetector:
             'attention_level': self.state['attention_level'],
             'attention_score': self.state['attention_score'],
             'adaptations': self.adaptations,
-            'time_since_interaction': time.time() - self.state['last_interaction'],
-            'recent_skips': len(self.state['skips']),
+            'time_since_interaction': self.clock() - self.state['last_interaction'],
+            'recent_skips': self.state['skips'].count(),
             'tab_switches': self.state['tab_switches']
         }
     
+    def apply_multimodal(self, unified_state: Dict):
+        """Injecter un état fusionné (EmotionFusion) dans le détecteur"""
+        # Mapper vers track_interaction (au plus une fois par seconde : la fusion suit
+        # le rythme des résultats, pas une horloge à 1 Hz)
+        if unified_state['pattern'] == 'absent':
+            now = self.clock()
+            if now - self._absent_tracked_at >= 1.0:
+                self._absent_tracked_at = now
+                self.track_interaction('multimodal_absent')
+        
+        # Ajuster score directement (optionnel)
+        multimodal_score = unified_state['attention_score']
+        self.state['attention_score'] = int(
+            (self.state['attention_score'] + multimodal_score) / 2
+        )
+    
     def get_state(self):
         """Obtenir l'état complet SANS recalculer (lecture seule)"""
         # Recalculer UNIQUEMENT le temps depuis dernière interaction
         # SANS changer le score ni le niveau
-        now = time.time()
+        now = self.clock()
         
         return {
             'attention_level': self.state['attention_level'],
             'attention_score': self.state['attention_score'],
             'adaptations': self.adaptations,
             'time_since_interaction': now - self.state['last_interaction'],
-            'recent_skips': len(self.state['skips']),
+            'recent_skips': self.state['skips'].count(),
             'tab_switches': self.state['tab_switches']
         }
 
@@ -281,11 +353,11 @@ class AttentionDetector:
         Vérifier et mettre à jour l'attention (appelé périodiquement)
         Cette méthode DOIT être appelée toutes les X secondes pour détecter l'inactivité
         """
-        print(f"\n[ATTENTION] === CHECK PÉRIODIQUE ===")
+        self._debug(f"\n[ATTENTION] === CHECK PÉRIODIQUE ===")
         self._calculate_attention()
         return self.get_state()
     
     def reset(self):
         """Réinitialiser le système"""
-        print("[ATTENTION] === RESET DU SYSTÈME ===")
-        self.__init__()
\ No newline at end of file
+        self._debug("[ATTENTION] === RESET DU SYSTÈME ===")
+        self.__init__(self.history_limit, self.clock, *self._overrides, verbose=self.verbose)
\ No newline at end of file
@@ -0,0 +1,231 @@
+# batch_analyze.py
+"""
+Analyse hors ligne d'une vidéo enregistrée
+
+La vidéo est découpée en segments analysés en parallèle (un processus par
+segment). Chaque segment commence quelques frames plus tôt (préchauffage) pour
+que le lissage de pose et le suivi du visage convergent avant les frames
+réellement enregistrées dans la chronologie.
+
+Usage:
+    python batch_analyze.py session.mp4 --output timeline.csv
+    python batch_analyze.py session.mp4 --format ndjson --processes 4 --stride 3
+"""
+import argparse
+import contextlib
+import csv
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+import cv2
+
+from analyzers.video_analyzer import VideoAnalyzer
+
+TIMELINE_FIELDS = ('frame', 'time', 'face_detected', 'engagement_score',
+                   'yaw', 'pitch', 'roll', 'emotion', 'confidence')
+
+
+def probe_video(path: str) -> Dict:
+    """Nombre de frames, FPS et taille de la vidéo"""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Impossible d'ouvrir la vidéo: {path}")
+    try:
+        return {
+            'frames': int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+            'fps': capture.get(cv2.CAP_PROP_FPS) or 30.0,
+            'width': int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        capture.release()
+
+
+def plan_segments(total_frames: int, segments: int, warmup: int) -> List[Tuple[int, int, int]]:
+    """
+    Découper [0, total_frames) en segments contigus
+    Returns: liste de (début du préchauffage, début, fin exclue)
+    """
+    if total_frames <= 0:
+        # Nombre de frames inconnu : un seul segment lu jusqu'au bout
+        return [(0, 0, -1)]
+
+    segments = max(1, min(segments, total_frames))
+    size = -(-total_frames // segments)  # Division arrondie au supérieur
+    plan = []
+    for start in range(0, total_frames, size):
+        plan.append((max(0, start - warmup), start, min(total_frames, start + size)))
+    return plan
+
+
+def _timeline_row(index: int, fps: float, state: Dict) -> Dict:
+    pose = state['head_pose']
+    expression = state['facial_expression']
+    return {
+        'frame': index,
+        'time': round(index / fps, 3),
+        'face_detected': state['face_detected'],
+        'engagement_score': state['engagement_score'],
+        'yaw': pose['yaw'],
+        'pitch': pose['pitch'],
+        'roll': pose['roll'],
+        'emotion': expression['emotion'],
+        'confidence': expression['confidence'],
+    }
+
+
+def analyze_segment(path: str, segment: Tuple[int, int, int], fps: float,
+                    video_config: Dict, stride: int = 1) -> Dict:
+    """Analyser un segment (exécuté dans un processus worker)"""
+    # Un cœur par worker, et stdout réservé à la chronologie
+    cv2.setNumThreads(1)
+    warmup_start, start, end = segment
+
+    with contextlib.redirect_stdout(sys.stderr):
+        analyzer = VideoAnalyzer(**video_config)
+
+    capture = cv2.VideoCapture(path)
+    if warmup_start:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, warmup_start)
+
+    rows = []
+    analyzed = 0
+    started_at = time.perf_counter()
+    try:
+        index = warmup_start
+        while end < 0 or index < end:
+            # grab() sans retrieve() : les frames sautées ne sont pas décodées
+            if not capture.grab():
+                break
+            if index % stride == 0:
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                with contextlib.redirect_stdout(sys.stderr):
+                    state = analyzer.analyze_frame(gray)
+                analyzed += 1
+                if index >= start:
+                    rows.append(_timeline_row(index, fps, state))
+            index += 1
+    finally:
+        capture.release()
+
+    return {
+        'segment': segment,
+        'rows': rows,
+        'analyzed': analyzed,
+        'seconds': time.perf_counter() - started_at,
+        'detection': analyzer.get_detection_stats(),
+    }
+
+
+def write_timeline(rows: List[Dict], output, fmt: str):
+    """Écrire la chronologie en CSV ou NDJSON"""
+    if fmt == 'csv':
+        writer = csv.DictWriter(output, fieldnames=TIMELINE_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            output.write(json.dumps(row) + '\n')
+
+
+def run_batch(path: str, processes: int = None, segments: int = None, warmup: int = 30,
+              stride: int = 1, video_config: Dict = None) -> Dict:
+    """Analyser toute la vidéo ; retourne la chronologie triée et le résumé"""
+    info = probe_video(path)
+    processes = processes or max(1, (os.cpu_count() or 2) - 1)
+    plan = plan_segments(info['frames'], segments or processes, warmup)
+
+    started_at = time.perf_counter()
+    context = mp.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(processes, len(plan)), mp_context=context) as pool:
+        futures = [
+            pool.submit(analyze_segment, path, segment, info['fps'], video_config or {}, stride)
+            for segment in plan
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started_at
+
+    rows = [row for result in results for row in result['rows']]
+    analyzed = sum(result['analyzed'] for result in results)
+    worker_seconds = sum(result['seconds'] for result in results)
+    summary = {
+        'video': info,
+        'segments': len(plan),
+        'processes': min(processes, len(plan)),
+        'timeline_frames': len(rows),
+        'analyzed_frames': analyzed,
+        'warmup_frames': analyzed - len(rows),
+        'wall_seconds': round(elapsed, 3),
+        'fps': round(analyzed / elapsed, 1) if elapsed else 0.0,
+        'fps_per_process': round(analyzed / worker_seconds, 1) if worker_seconds else 0.0,
+        'face_ratio': round(sum(r['face_detected'] for r in rows) / len(rows), 3) if rows else 0.0,
+        'engagement_avg': round(sum(r['engagement_score'] for r in rows) / len(rows), 1) if rows else 0.0,
+    }
+    return {'rows': rows, 'summary': summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video', help='fichier vidéo lisible par OpenCV')
+    parser.add_argument('--output', '-o', help='fichier de sortie (défaut : stdout)')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], default=None,
+                        help='format de la chronologie (défaut : selon l\'extension, sinon csv)')
+    parser.add_argument('--processes', type=int, default=None, help='processus workers (défaut : cœurs - 1)')
+    parser.add_argument('--segments', type=int, default=None, help='nombre de segments (défaut : processus)')
+    parser.add_argument('--warmup', type=int, default=30, help='frames de préchauffage par segment')
+    parser.add_argument('--stride', type=int, default=1, help='analyser une frame sur N')
+    parser.add_argument('--mode', choices=VideoAnalyzer.DETECTION_MODES, default='tracked')
+    parser.add_argument('--analysis-width', type=int, default=320)
+    parser.add_argument('--expression-interval', type=int, default=3)
+    parser.add_argument('--motion-threshold', type=float, default=0.0,
+                        help='filtre de mouvement (0 = chaque frame est analysée)')
+    parser.add_argument('--summary-json', help='écrire aussi le résumé dans ce fichier JSON')
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        fmt = 'ndjson' if args.output and args.output.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+    video_config = {
+        'detection_mode': args.mode,
+        'analysis_width': args.analysis_width,
+        'expression_interval': args.expression_interval,
+        'motion_threshold': args.motion_threshold,
+    }
+
+    try:
+        result = run_batch(args.video, processes=args.processes, segments=args.segments,
+                           warmup=args.warmup, stride=max(1, args.stride), video_config=video_config)
+    except Exception as e:
+        print(f"❌ Erreur analyse batch: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            write_timeline(result['rows'], f, fmt)
+    else:
+        write_timeline(result['rows'], sys.stdout, fmt)
+
+    summary = result['summary']
+    if args.summary_json:
+        with open(args.summary_json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+    print(f"📊 {summary['analyzed_frames']} frames analysées "
+          f"({summary['warmup_frames']} de préchauffage) en {summary['wall_seconds']}s "
+          f"sur {summary['processes']} processus", file=sys.stderr)
+    print(f"⚡ {summary['fps']} frames/s ({summary['fps_per_process']} par processus), "
+          f"visage {summary['face_ratio'] * 100:.0f}%, engagement moyen {summary['engagement_avg']}",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
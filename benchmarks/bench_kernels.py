@@ -0,0 +1,110 @@
+# benchmarks/bench_kernels.py
+"""
+Noyaux de calcul : boucles numba vs repli NumPy (et version Python d'origine)
+
+Pour chaque noyau, vérifie que les deux implémentations donnent le même
+résultat puis mesure le coût en microsecondes par appel, sur des tailles
+réalistes (fenêtres de fusion de 60 / 15 frames, chunk audio de 4096).
+
+Usage: python benchmarks/bench_kernels.py --repeat 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analyzers import kernels  # noqa: E402
+
+
+def python_std(data):
+    """Écart-type tel que calculé historiquement dans EmotionFusion"""
+    avg = sum(data) / len(data)
+    return (sum([(x - avg) ** 2 for x in data]) / len(data)) ** 0.5
+
+
+def python_intensity(yaws, pitches):
+    return sum(abs(yaws[i] - yaws[i - 1]) + abs(pitches[i] - pitches[i - 1]) for i in range(1, len(yaws)))
+
+
+def make_cases(sample_rate: int, chunk: int):
+    rng = np.random.default_rng(0)
+    yaws = rng.normal(0, 2, 60)
+    pitches = rng.normal(0, 2, 60)
+
+    t = np.arange(chunk + 400) / sample_rate
+    signal = (0.3 * np.sin(2 * np.pi * 180 * t) + rng.normal(0, 0.02, t.size)).astype(np.float32)
+    frame_length, hop = int(sample_rate * 0.025), int(sample_rate * 0.010)
+    frames = 1 + (signal.size - frame_length) // hop
+
+    # Fonction de différence YIN d'un ton de 180 Hz (tau_max ~ fmin 60 Hz)
+    tau_max = int(np.ceil(sample_rate / 60))
+    window = 1024
+    x = signal[:window + tau_max + 1].astype(np.float64)
+    diff = np.array([np.sum((x[:window] - x[tau:tau + window]) ** 2) for tau in range(tau_max + 1)])
+    tau_min = int(sample_rate / 500)
+
+    return {
+        'window_std (60)': (
+            lambda k: k.window_std(yaws), lambda: python_std(list(yaws))),
+        'movement_intensity (15)': (
+            lambda k: k.movement_intensity(yaws[-15:], pitches[-15:]),
+            lambda: python_intensity(list(yaws[-15:]), list(pitches[-15:]))),
+        f'frame_rms ({frames} trames)': (
+            lambda k: k.frame_rms(signal, frame_length, hop, np.empty(frames, dtype=np.float32)), None),
+        f'frame_zcr ({frames} trames)': (
+            lambda k: k.frame_zcr(signal, frame_length, hop, np.empty(frames, dtype=np.float32)), None),
+        f'yin_pick (tau_max {tau_max})': (
+            lambda k: k.yin_pick(diff, tau_min, tau_max, 0.15, np.empty(tau_max + 1)), None),
+    }
+
+
+def as_array(value):
+    return np.atleast_1d(np.asarray(value, dtype=np.float64))
+
+
+def measure(fn, repeat: int) -> float:
+    fn()  # Préchauffage (compilation numba / lecture du cache)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sample-rate', type=int, default=16000)
+    parser.add_argument('--chunk', type=int, default=4096)
+    parser.add_argument('--repeat', type=int, default=5000)
+    args = parser.parse_args()
+
+    backends = ['numpy']
+    if kernels.NUMBA_AVAILABLE:
+        backends.append('numba')
+    else:
+        print("⚠️ numba non installé : seul le repli NumPy est mesuré")
+
+    cases = make_cases(args.sample_rate, args.chunk)
+    print(f"Coût par appel (µs), {args.repeat} répétitions")
+    print(f"  {'noyau':30s} {'python':>9s} " + " ".join(f"{name:>9s}" for name in backends))
+    for label, (call, python_call) in cases.items():
+        reference, costs = None, []
+        for name in backends:
+            kernels.set_backend(name)
+            result = as_array(call(kernels))
+            if reference is None:
+                reference = result
+            elif not np.allclose(result, reference, rtol=1e-4, atol=1e-5):
+                print(f"❌ {label}: résultats {name} différents du repli NumPy")
+            costs.append(measure(lambda: call(kernels), args.repeat))
+        python_cost = f"{measure(python_call, args.repeat):9.2f}" if python_call else f"{'-':>9s}"
+        print(f"  {label:30s} {python_cost} " + " ".join(f"{cost:9.2f}" for cost in costs))
+
+    kernels.set_backend('auto')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_video_backends.py
+"""
+Comparaison de débit : analyse vidéo dans le processus vs pool de processus
+
+Usage: python benchmarks/bench_video_backends.py --clients 8 --frames 40
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_registry import AnalysisSession  # noqa: E402
+from video_backends import create_video_backend  # noqa: E402
+
+
+def make_frames(count: int, width: int, height: int, seed: int = 0):
+    """Frames grises synthétiques (bruit lissé, coût de cascade réaliste)"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(count):
+        noise = rng.integers(0, 256, (height, width), dtype=np.uint8)
+        frames.append(cv2.GaussianBlur(noise, (9, 9), 0))
+    return frames
+
+
+def run(backend_name: str, clients: int, frames, video_config, processes=None) -> float:
+    options = {'processes': processes} if backend_name == 'process' else {}
+    backend = create_video_backend(backend_name, video_config, **options)
+
+    sessions = [
+        AnalysisSession(f"client-{i}", backend.create_analyzer(), None, None)
+        for i in range(clients)
+    ]
+
+    # Préchauffage (démarrage des processus, premières allocations)
+    for session in sessions:
+        backend.analyze(session, frames[0])
+
+    def client_loop(session):
+        for frame in frames:
+            backend.analyze(session, frame)
+
+    threads = [threading.Thread(target=client_loop, args=(session,)) for session in sessions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    backend.close()
+    return clients * len(frames) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=8, help='sessions simultanées')
+    parser.add_argument('--frames', type=int, default=40, help='frames par session')
+    parser.add_argument('--width', type=int, default=320)
+    parser.add_argument('--height', type=int, default=240)
+    parser.add_argument('--processes', type=int, default=None, help='workers du backend process')
+    parser.add_argument('--mode', default='full', choices=['full', 'tracked'])
+    args = parser.parse_args()
+
+    frames = make_frames(args.frames, args.width, args.height)
+    video_config = {'detection_mode': args.mode}
+
+    print(f"{args.clients} clients x {args.frames} frames ({args.width}x{args.height}, mode {args.mode})")
+    results = {}
+    for name in ('thread', 'process'):
+        results[name] = run(name, args.clients, frames, video_config, args.processes)
+        print(f"  {name:8s}: {results[name]:8.1f} frames/s")
+    print(f"  gain process/thread: x{results['process'] / results['thread']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
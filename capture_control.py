@@ -0,0 +1,128 @@
+# capture_control.py
+"""
+Réglage adaptatif de la capture vidéo côté client
+
+Le serveur mesure, pour chaque session, le temps de traitement des frames et la
+proportion de frames remplacées dans la boîte aux lettres (frames arrivées avant
+que la précédente ne soit analysée). Il choisit un palier (FPS, largeur, qualité
+JPEG) et le pousse au client via l'événement 'capture_config'.
+
+Anti-oscillation : paliers discrets, moyennes glissantes, seuils haut/bas
+distincts et délais minimum entre deux changements (plus long pour remonter).
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+# Du plus économe au plus riche ; le palier 3 correspond au réglage historique
+# du client (une frame toutes les 150 ms, 300 px de large, qualité 0.6)
+CAPTURE_LEVELS = (
+    {'fps': 2, 'width': 160, 'quality': 0.5},
+    {'fps': 4, 'width': 192, 'quality': 0.5},
+    {'fps': 5, 'width': 240, 'quality': 0.55},
+    {'fps': 7, 'width': 300, 'quality': 0.6},
+    {'fps': 10, 'width': 320, 'quality': 0.65},
+    {'fps': 12, 'width': 360, 'quality': 0.7},
+)
+DEFAULT_CAPTURE_LEVEL = 3
+
+
+class CaptureController:
+    def __init__(self, levels=CAPTURE_LEVELS, initial_level: int = DEFAULT_CAPTURE_LEVEL,
+                 smoothing: float = 0.2, high_load: float = 0.85, low_load: float = 0.5,
+                 max_drop_rate: float = 0.2, down_cooldown: float = 2.0,
+                 up_cooldown: float = 6.0, min_samples: int = 5):
+        """
+        levels: paliers (fps, width, quality) du plus léger au plus lourd
+        smoothing: poids des nouvelles mesures dans les moyennes glissantes
+        high_load / low_load: charge au-dessus de laquelle on descend d'un palier,
+            en dessous de laquelle on remonte (charge = temps de traitement x FPS,
+            rapporté à la part du pool de workers disponible pour la session)
+        max_drop_rate: proportion de frames remplacées qui force la descente
+        down_cooldown / up_cooldown: secondes minimum entre deux changements
+        min_samples: frames analysées au palier courant avant de décider
+        """
+        self.levels = tuple(dict(level) for level in levels)
+        self.level = min(max(0, initial_level), len(self.levels) - 1)
+        self.smoothing = smoothing
+        self.high_load = high_load
+        self.low_load = low_load
+        self.max_drop_rate = max_drop_rate
+        self.down_cooldown = down_cooldown
+        self.up_cooldown = up_cooldown
+        self.min_samples = max(1, min_samples)
+
+        self._lock = threading.Lock()
+        self.processing_avg = None  # secondes par frame (moyenne glissante)
+        self.drop_rate = 0.0        # proportion de frames remplacées (moyenne glissante)
+        self.load = 0.0
+        self.samples = 0
+        self.changes = 0
+        self.last_change = time.monotonic()
+
+    def record_submit(self, replaced: bool):
+        """Frame reçue : replaced=True si elle a écrasé une frame non traitée"""
+        with self._lock:
+            self.drop_rate += self.smoothing * (float(replaced) - self.drop_rate)
+
+    def record_processed(self, seconds: float):
+        """Frame analysée en `seconds` (décodage compris)"""
+        with self._lock:
+            if self.processing_avg is None:
+                self.processing_avg = seconds
+            else:
+                self.processing_avg += self.smoothing * (seconds - self.processing_avg)
+            self.samples += 1
+
+    def update(self, worker_share: float = 1.0) -> Optional[Dict]:
+        """
+        Réévaluer le palier
+        worker_share: part du pool disponible pour cette session (workers / sessions, max 1)
+        Returns: la nouvelle configuration si le palier a changé, sinon None
+        """
+        with self._lock:
+            if self.processing_avg is None or self.samples < self.min_samples:
+                return None
+
+            fps = self.levels[self.level]['fps']
+            share = min(1.0, max(worker_share, 1e-3))
+            self.load = self.processing_avg * fps / share
+
+            elapsed = time.monotonic() - self.last_change
+            overloaded = self.load > self.high_load or self.drop_rate > self.max_drop_rate
+            idle = self.load < self.low_load and self.drop_rate < self.max_drop_rate / 4
+
+            if overloaded and self.level > 0 and elapsed >= self.down_cooldown:
+                step = -1
+            elif idle and self.level < len(self.levels) - 1 and elapsed >= self.up_cooldown:
+                step = 1
+            else:
+                return None
+
+            self.level += step
+            self.changes += 1
+            self.samples = 0
+            self.drop_rate = 0.0
+            self.last_change = time.monotonic()
+            return self._config()
+
+    def get_config(self) -> Dict:
+        """Configuration courante à envoyer au client"""
+        with self._lock:
+            return self._config()
+
+    def _config(self) -> Dict:
+        config = dict(self.levels[self.level])
+        config['level'] = self.level
+        config['interval_ms'] = int(round(1000 / config['fps']))
+        return config
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'level': self.level,
+                'load': round(self.load, 3),
+                'drop_rate': round(self.drop_rate, 3),
+                'processing_avg_ms': round((self.processing_avg or 0.0) * 1000, 2),
+                'changes': self.changes,
+            }
@@ -8,6 +8,10 @@ import traceback
 import json
 from datetime import datetime
 import time
+import threading
+import atexit
+import copy
+import signal
 
 print("📦 Imports de base OK")
 
@@ -16,11 +20,18 @@ from attention_system import AttentionDetector
 print("✅ AttentionDetector importé")
 
 from flask_socketio import SocketIO, emit
+from socket_protocol import negotiate_version, decode_video_payload, decode_audio_payload
 print("✅ Flask-SocketIO importé")
 
 print("⏳ Chargement de MultimodalSystem (MediaPipe)... cela peut prendre 30s-1min au premier démarrage")
 from multimodal_system import MultimodalSystem
 print("✅ MultimodalSystem importé")
+from session_capture import CaptureRecorder
+from attention_publisher import AttentionPublisher
+from analytics_log import AnalyticsLog
+from analytics_db import AnalyticsDatabase
+from ranking_index import RankingIndex
+from analyzers import kernels
 
 import base64
 import numpy as np
@@ -30,9 +41,28 @@ import time
 app = Flask(__name__)
 
 # Configuration
+# Mode debug du serveur (rechargeur : le module est aussi exécuté par un processus parent)
+SERVER_DEBUG = True
 UPLOAD_FOLDER = 'music_files'
 ALLOWED_EXTENSIONS = {'mp3', 'wav', 'ogg', 'm4a', 'flac'}
 ANALYTICS_FILE = 'user_analytics.json'
+# Journal des événements analytics postérieurs au dernier instantané (ANALYTICS_FILE)
+ANALYTICS_LOG_FILE = 'user_analytics.log.jsonl'
+ANALYTICS_COMPACT_EVENTS = 500     # Instantané après N événements...
+ANALYTICS_COMPACT_INTERVAL = 60.0  # ...ou toutes les N secondes s'il y a du nouveau
+# Écriture différée du journal : au plus une écriture disque par intervalle (ou N événements)
+ANALYTICS_FLUSH_INTERVAL = 1.0
+ANALYTICS_FLUSH_EVENTS = 100
+# Stockage des analytics : 'jsonl' (journal + instantanés) ou 'sqlite' (ANALYTICS_DB_FILE, WAL).
+# Au premier démarrage en 'sqlite', la base vide est remplie depuis ANALYTICS_FILE.
+ANALYTICS_BACKEND = 'jsonl'
+ANALYTICS_DB_FILE = 'user_analytics.db'
+# Taille par défaut / maximale des classements (paramètre ?k= des routes analytics)
+ANALYTICS_TOP_K = 5
+ANALYTICS_MAX_TOP_K = 100
+# SQLite : lignes de l'index par rating parcourues par recommandation demandée avant de
+# se replier sur une requête restreinte aux chansons de la playlist
+ANALYTICS_RANK_SCAN = 4
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
@@ -41,6 +71,7 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50 MB max
 
 playlist = []
+playlist_songs = {}  # filename -> chanson de la playlist (appartenance en O(1))
 current_index = 0
 is_playing = False
 state_version = 0
@@ -51,36 +82,111 @@ repeat_mode = False
 
 # Variables pour l'auto-skip basé sur l'attention
 last_auto_skip_time = 0
+auto_skip_lock = threading.Lock()
 AUTO_SKIP_COOLDOWN = 10  # Ne pas skipper plus d'une fois toutes les 10 secondes
 MIN_ATTENTION_THRESHOLD = 65  # Seuil d'engagement en dessous duquel on change
 
+# Configuration de l'analyse vidéo
+# 'tracked' : recherche du visage autour de la dernière position, re-détection complète
+# toutes les VIDEO_REDETECT_INTERVAL frames ou dès que la piste est perdue
+VIDEO_DETECTION_MODE = 'tracked'
+VIDEO_REDETECT_INTERVAL = 15
+# Largeur de travail des cascades : les frames sont décodées directement en gris
+# à résolution réduite puis ramenées à cette largeur (None = pleine résolution)
+VIDEO_ANALYSIS_WIDTH = 320
+# Cadence par étage : la pose est recalculée à chaque frame, les cascades yeux/sourire
+# toutes les VIDEO_EXPRESSION_INTERVAL frames ; sans visage, la détection est espacée
+# (1, 2, 4... frames) jusqu'à VIDEO_MAX_DETECT_BACKOFF frames
+VIDEO_EXPRESSION_INTERVAL = 3
+VIDEO_MAX_DETECT_BACKOFF = 8
+# Filtre de mouvement : sous ce seuil (écart moyen en niveaux de gris sur une vignette
+# 64x48), la frame est jugée statique et l'état précédent est réutilisé ; analyse
+# complète forcée toutes les VIDEO_MOTION_REFRESH frames statiques (0 = filtre désactivé)
+VIDEO_MOTION_THRESHOLD = 1.5
+VIDEO_MOTION_REFRESH = 30
+# Nombre de workers qui vident les boîtes aux lettres vidéo (une frame en attente par client)
+# En backend 'process', prévoir au moins autant de workers que de processus
+VIDEO_WORKERS = 2
+# 'thread' : analyse dans le processus du serveur
+# 'process' : analyse dans VIDEO_PROCESSES processus (frames en mémoire partagée)
+VIDEO_BACKEND = 'thread'
+VIDEO_PROCESSES = None  # None = nombre de cœurs - 1
+# Le serveur ajuste FPS / largeur / qualité JPEG de chaque client selon la charge
+# d'analyse (événement 'capture_config'), au lieu d'un rythme fixe côté navigateur
+ADAPTIVE_CAPTURE = True
+
+# Analyse audio en flux continu : trames de 25 ms (pas de 10 ms) avec report des
+# échantillons entre chunks, au lieu d'une seule mesure par chunk de 4096 échantillons
+AUDIO_STREAMING = True
+# Estimateur de pitch : 'zcr' (passages par zéro) ou 'yin' (autocorrélation FFT,
+# robuste au bruit ; cf. benchmarks/bench_pitch.py pour précision et coût)
+AUDIO_PITCH_BACKEND = 'yin'
+# Noyaux de calcul audio / fusion : 'auto' (numba si installé), 'numba' ou 'numpy'
+# (cf. benchmarks/bench_kernels.py)
+KERNEL_BACKEND = 'auto'
+
+# Enregistrement opt-in des frames et chunks audio reçus (rejeu : session_capture.py)
+# ex. 'captures/session.mmcap' ; None = pas d'enregistrement
+SESSION_CAPTURE_PATH = os.environ.get('SESSION_CAPTURE_PATH')
+# Fusion vidéo + audio déclenchée par chaque nouveau résultat : les deux résultats
+# doivent avoir été reçus à moins de FUSION_TOLERANCE s d'écart, et aucun ne doit
+# dater de plus de FUSION_MAX_AGE s (sinon la fusion est abandonnée)
+FUSION_TOLERANCE = 0.5
+FUSION_MAX_AGE = 2.0
+# Attention : réévaluée par un minuteur serveur et poussée par Socket.IO
+# ('attention_state') quand le niveau change ou que le score varie de plus de ATTENTION_PUSH_DELTA
+ATTENTION_CHECK_INTERVAL = 2.0
+ATTENTION_PUSH_DELTA = 5
+# Événements conservés par signal (skips, pauses, actions adaptatives...) pour le débogage
+ATTENTION_HISTORY_LIMIT = 200
+# Sessions d'analyse : une par client WebSocket (analyseurs propres, attention partagée)
+MAX_ANALYSIS_SESSIONS = 20  # Au-delà, la session la moins récemment active est évincée
+SESSION_IDLE_TTL = 300      # Secondes sans frame ni audio avant éviction
+
 # NOUVEAU: Système d'attention
-attention_detector = AttentionDetector()
+# Sans traces de débogage : le minuteur d'AttentionPublisher le réévalue en continu
+attention_detector = AttentionDetector(history_limit=ATTENTION_HISTORY_LIMIT, verbose=False)
 
 # Système d'analyse comportementale (existant)
-user_analytics = {
-    'songs': {},
-    'listening_patterns': {
-        'total_playtime': 0,
-        'total_sessions': 0,
-        'avg_session_duration': 0,
-        'preferred_time_of_day': [],
-        'skip_rate': 0,
-        'completion_rate': 0
-    },
-    'preferences': {
-        'favorite_songs': [],
-        'disliked_songs': [],
-        'most_played': [],
-        'recently_skipped': []
-    },
-    'adaptive_settings': {
-        'ui_complexity': 'standard',
-        'recommendation_aggressiveness': 'medium',
-        'auto_skip_enabled': False,
-        'smart_shuffle_enabled': False
+def default_analytics():
+    """Structure vide des analytics"""
+    return {
+        'songs': {},
+        'listening_patterns': {
+            'total_playtime': 0,
+            'total_sessions': 0,
+            'avg_session_duration': 0,
+            'preferred_time_of_day': [],
+            'skip_rate': 0,
+            'completion_rate': 0
+        },
+        'preferences': {
+            'favorite_songs': [],
+            'disliked_songs': [],
+            'most_played': [],
+            'recently_skipped': []
+        },
+        'adaptive_settings': {
+            'ui_complexity': 'standard',
+            'recommendation_aggressiveness': 'medium',
+            'auto_skip_enabled': False,
+            'smart_shuffle_enabled': False
+        },
+        # Totaux globaux tenus à jour par chaque événement (vérifiés au chargement)
+        'totals': empty_analytics_totals()
     }
-}
+
+def empty_analytics_totals():
+    return {'plays': 0, 'skips': 0, 'completions': 0, 'listening_time': 0}
+
+# Modifié sur place uniquement (partagé avec le journal analytics)
+user_analytics = default_analytics()
+
+# Classements (stockage JSONL ; SQLite a ses index), mis à jour pour la seule chanson
+# modifiée par chaque événement : rating des chansons de la playlist (candidates aux
+# recommandations) et nombre de lectures de toutes les chansons
+rating_index = RankingIndex()
+play_count_index = RankingIndex()
 
 # Session en cours
 current_session = {
@@ -90,32 +196,110 @@ current_session = {
     'total_listening_time': 0
 }
 
+# Noyaux compilés au démarrage (ou relus depuis le cache numba) plutôt qu'au premier chunk
+print(f"🧮 Noyaux de calcul: {kernels.set_backend(KERNEL_BACKEND)}")
+
 # Initialiser système multimodal
 socketio = SocketIO(app, cors_allowed_origins="*")
-multimodal_system = MultimodalSystem(attention_detector)
+attention_publisher = AttentionPublisher(
+    attention_detector,
+    emit=lambda state, sid: socketio.emit('attention_state', state, to=sid),
+    interval=ATTENTION_CHECK_INTERVAL,
+    score_delta=ATTENTION_PUSH_DELTA,
+)
+multimodal_system = MultimodalSystem(
+    # Caméra / micro : l'état fusionné modifie l'attention partagée et est poussé aux clients
+    attention_detector=attention_publisher,
+    video_config={
+        'detection_mode': VIDEO_DETECTION_MODE,
+        'redetect_interval': VIDEO_REDETECT_INTERVAL,
+        'analysis_width': VIDEO_ANALYSIS_WIDTH,
+        'expression_interval': VIDEO_EXPRESSION_INTERVAL,
+        'max_detect_backoff': VIDEO_MAX_DETECT_BACKOFF,
+        'motion_threshold': VIDEO_MOTION_THRESHOLD,
+        'motion_refresh_interval': VIDEO_MOTION_REFRESH,
+    },
+    audio_config={'streaming': AUDIO_STREAMING, 'pitch_backend': AUDIO_PITCH_BACKEND},
+    video_workers=VIDEO_WORKERS,
+    video_backend=VIDEO_BACKEND,
+    video_backend_options={'processes': VIDEO_PROCESSES} if VIDEO_BACKEND == 'process' else None,
+    max_sessions=MAX_ANALYSIS_SESSIONS,
+    session_idle_ttl=SESSION_IDLE_TTL,
+    adaptive_capture=ADAPTIVE_CAPTURE,
+    on_capture_config=lambda sid, config: socketio.emit('capture_config', config, to=sid),
+    fusion_tolerance=FUSION_TOLERANCE,
+    fusion_max_age=FUSION_MAX_AGE,
+    on_video_result=lambda sid, result: handle_video_result(sid, result),
+)
+# Workers vidéo et mémoire partagée libérés à l'arrêt (atexit, aussi après SIGTERM)
+atexit.register(multimodal_system.close)
+
+# Enregistreur de session (opt-in), créé au démarrage par le seul processus qui sert les requêtes
+session_recorder = None
+
+def start_session_recorder():
+    """Ouvrir le fichier de capture (SESSION_CAPTURE_PATH) et le fermer à l'arrêt"""
+    global session_recorder
+    if not SESSION_CAPTURE_PATH or session_recorder:
+        return
+    session_recorder = CaptureRecorder(SESSION_CAPTURE_PATH)
+    atexit.register(session_recorder.close)
 
 def load_analytics():
-    """Charger les analytics depuis le fichier"""
-    global user_analytics
-    if os.path.exists(ANALYTICS_FILE):
+    """Charger le dernier instantané, rejouer le journal et démarrer le compacteur"""
+    if analytics_db:
         try:
-            with open(ANALYTICS_FILE, 'r', encoding='utf-8') as f:
-                user_analytics = json.load(f)
-            print("Analytics chargées")
+            if analytics_db.is_empty() and os.path.exists(ANALYTICS_FILE):
+                count = analytics_db.migrate_json(ANALYTICS_FILE)
+                print(f"Analytics migrées vers SQLite ({count} chansons)")
+            user_analytics.update(analytics_db.load_sections())
+            if check_analytics_totals():
+                analytics_db.save_sections(user_analytics)
+            print("Analytics chargées (SQLite)")
         except Exception as e:
             print(f"Erreur chargement analytics: {e}")
+        return
+    
+    try:
+        analytics_log.load()
+        if check_analytics_totals():
+            analytics_log.compact(force=True)
+        rebuild_song_rankings()
+        print(f"Analytics chargées ({analytics_log.stats['replayed']} événements rejoués)")
+    except Exception as e:
+        print(f"Erreur chargement analytics: {e}")
+    analytics_log.start()
 
-def save_analytics():
-    """Sauvegarder les analytics dans le fichier"""
+def record_analytics_event(event):
+    """Appliquer une mutation des analytics et la persister"""
     try:
-        with open(ANALYTICS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(user_analytics, f, indent=2, ensure_ascii=False)
+        if analytics_db:
+            # Statistiques et sections validées dans la même transaction
+            with analytics_db.transaction():
+                apply_analytics_event(event)
+                analytics_db.save_sections(user_analytics)
+        else:
+            analytics_log.record(event)
     except Exception as e:
         print(f"Erreur sauvegarde analytics: {e}")
 
+def analytics_snapshot(update=None):
+    """
+    Copie de user_analytics prise sous le verrou du stockage actif (jamais pendant un événement)
+    update: fonction (analytics) appliquée sous ce verrou juste avant la copie
+    """
+    if analytics_db:
+        with analytics_db.transaction():
+            if update:
+                update(user_analytics)
+            return copy.deepcopy(user_analytics)
+    return analytics_log.snapshot(update)
+
 def init_song_stats(song_id):
     """Initialiser les statistiques d'une chanson"""
-    if song_id not in user_analytics['songs']:
+    if analytics_db:
+        analytics_db.init_song(song_id)
+    elif song_id not in user_analytics['songs']:
         user_analytics['songs'][song_id] = {
             'play_count': 0,
             'skip_count': 0,
@@ -126,9 +310,72 @@ def init_song_stats(song_id):
             'rating': 0  # Auto-calculé basé sur le comportement
         }
 
+def get_song_stats(song_id):
+    """Statistiques d'une chanson ({} si inconnue), quel que soit le stockage"""
+    if analytics_db:
+        return analytics_db.get_song(song_id) or {}
+    return user_analytics['songs'].get(song_id, {})
+
+def get_analytics_totals():
+    """Totaux globaux (lectures, skips, complétions, temps d'écoute) en O(1)"""
+    # Absents d'un ancien instantané pendant le rejeu du journal : reconstruits ensuite
+    return user_analytics.setdefault('totals', empty_analytics_totals())
+
+def compute_analytics_totals():
+    """Recalculer les totaux depuis les statistiques par chanson (parcours complet)"""
+    if analytics_db:
+        return analytics_db.totals()
+    songs = user_analytics['songs'].values()
+    return {
+        'plays': sum(s.get('play_count', 0) for s in songs),
+        'skips': sum(s.get('skip_count', 0) for s in songs),
+        'completions': sum(s.get('completion_count', 0) for s in songs),
+        'listening_time': sum(s.get('total_listening_time', 0) for s in songs),
+    }
+
+def update_song_rankings(song_id):
+    """Recalculer le rating d'une chanson et sa place dans les classements"""
+    stats = user_analytics['songs'][song_id]
+    stats['rating'] = calculate_song_rating(song_id)
+    if song_id in playlist_songs:
+        rating_index.update(song_id, stats['rating'])
+    play_count_index.update(song_id, stats['play_count'])
+
+def rebuild_song_rankings():
+    """Reconstruire les classements depuis toutes les statistiques (chargement, reset)"""
+    songs = user_analytics['songs']
+    for song_id, stats in songs.items():
+        stats['rating'] = calculate_song_rating(song_id)
+    rebuild_playlist_ranking()
+    play_count_index.rebuild((song_id, stats.get('play_count', 0)) for song_id, stats in songs.items())
+
+def rebuild_playlist_ranking():
+    """Classement par rating des chansons de la playlist (sans statistiques : 0, ordre de la playlist)"""
+    songs = user_analytics['songs']
+    rating_index.rebuild((song_id, songs.get(song_id, {}).get('rating', 0)) for song_id in playlist_songs)
+
+def get_top_k():
+    """Paramètre ?k= des routes de classement, borné à [1, ANALYTICS_MAX_TOP_K]"""
+    k = request.args.get('k', ANALYTICS_TOP_K, type=int)
+    return max(1, min(k, ANALYTICS_MAX_TOP_K))
+
+def check_analytics_totals():
+    """Vérifier les totaux incrémentaux au chargement et les reconstruire s'ils divergent"""
+    expected = compute_analytics_totals()
+    stored = user_analytics.get('totals') or {}
+    drift = {
+        key: {'stored': stored.get(key), 'expected': value}
+        for key, value in expected.items()
+        if key not in stored or abs(stored[key] - value) > 1e-6
+    }
+    if drift:
+        print(f"⚠️ Totaux analytics reconstruits: {drift}")
+        user_analytics['totals'] = expected
+    return drift
+
 def calculate_song_rating(song_id):
     """Calculer le rating d'une chanson basé sur le comportement"""
-    stats = user_analytics['songs'].get(song_id, {})
+    stats = get_song_stats(song_id)
     
     play_count = stats.get('play_count', 0)
     skip_count = stats.get('skip_count', 0)
@@ -172,27 +419,152 @@ def update_adaptive_settings():
     elif completion_rate > 80:
         user_analytics['adaptive_settings']['recommendation_aggressiveness'] = 'low'
 
-def get_recommended_songs():
-    """Obtenir des recommandations basées sur le comportement"""
-    # Trier les chansons par rating
-    rated_songs = []
-    for song in playlist:
-        song_id = song['filename']
+def apply_analytics_event(event):
+    """Appliquer un événement analytics (requête en cours ou rejeu du journal au démarrage)"""
+    event_type = event['type']
+    song_id = event.get('song_id')
+    
+    if event_type == 'start_session':
+        user_analytics['listening_patterns']['total_sessions'] += 1
+        if analytics_db:
+            analytics_db.start_session(event.get('at') or datetime.now().isoformat())
+    
+    elif event_type == 'song_start':
+        get_analytics_totals()['plays'] += 1
+        if analytics_db:
+            analytics_db.song_start(song_id, event['at'])
+            analytics_db.set_rating(song_id, calculate_song_rating(song_id))
+            return
         init_song_stats(song_id)
-        rating = calculate_song_rating(song_id)
-        user_analytics['songs'][song_id]['rating'] = rating
+        user_analytics['songs'][song_id]['play_count'] += 1
+        user_analytics['songs'][song_id]['last_played'] = event['at']
+        update_song_rankings(song_id)
+    
+    elif event_type == 'song_end':
+        if not get_song_stats(song_id):
+            return
+        duration = event.get('duration', 0)
+        listened_duration = event.get('listened_duration', 0)
+        totals = get_analytics_totals()
+        totals['listening_time'] += listened_duration
+        if event.get('completed'):
+            totals['completions'] += 1
+        if analytics_db:
+            analytics_db.song_end(song_id, duration, listened_duration, event.get('completed'))
+            analytics_db.set_rating(song_id, calculate_song_rating(song_id))
+            return
+        stats = user_analytics['songs'][song_id]
+        stats['total_listening_time'] += listened_duration
         
-        rated_songs.append({
-            'song': song,
-            'rating': rating,
-            'stats': user_analytics['songs'][song_id]
-        })
+        if event.get('completed'):
+            stats['completion_count'] += 1
+        
+        # Calculer le pourcentage d'écoute
+        if duration > 0:
+            completion_percentage = (listened_duration / duration) * 100
+            stats['average_completion'] = completion_percentage
+        
+        # Mettre à jour le rating
+        update_song_rankings(song_id)
     
-    # Trier par rating décroissant
-    rated_songs.sort(key=lambda x: x['rating'], reverse=True)
+    elif event_type == 'song_skip':
+        get_analytics_totals()['skips'] += 1
+        if analytics_db:
+            analytics_db.song_skip(song_id, event.get('at') or datetime.now().isoformat())
+            analytics_db.set_rating(song_id, calculate_song_rating(song_id))
+        else:
+            init_song_stats(song_id)
+            user_analytics['songs'][song_id]['skip_count'] += 1
+            update_song_rankings(song_id)
+        
+        # Ajouter aux skips récents
+        if song_id not in user_analytics['preferences']['recently_skipped']:
+            user_analytics['preferences']['recently_skipped'].append(song_id)
+        
+        # Garder seulement les 10 derniers
+        user_analytics['preferences']['recently_skipped'] = \
+            user_analytics['preferences']['recently_skipped'][-10:]
+        
+        # Calculer le skip rate global
+        totals = get_analytics_totals()
+        
+        if totals['plays'] > 0:
+            user_analytics['listening_patterns']['skip_rate'] = \
+                round((totals['skips'] / totals['plays']) * 100, 2)
+        
+        # Mettre à jour les paramètres adaptatifs
+        update_adaptive_settings()
     
-    # Retourner le top 5
-    return rated_songs[:5]
+    elif event_type == 'reset':
+        if analytics_db:
+            analytics_db.reset()
+        user_analytics.clear()
+        user_analytics.update(default_analytics())
+        rebuild_song_rankings()
+
+# Persistance : seul le stockage choisi par ANALYTICS_BACKEND est construit
+if ANALYTICS_BACKEND == 'sqlite':
+    analytics_db = AnalyticsDatabase(ANALYTICS_DB_FILE)
+    analytics_log = None
+else:
+    analytics_db = None
+    # Journal JSONL en ajout seul + instantanés atomiques périodiques
+    analytics_log = AnalyticsLog(
+        ANALYTICS_FILE,
+        ANALYTICS_LOG_FILE,
+        user_analytics,
+        apply=apply_analytics_event,
+        compact_events=ANALYTICS_COMPACT_EVENTS,
+        compact_interval=ANALYTICS_COMPACT_INTERVAL,
+        flush_interval=ANALYTICS_FLUSH_INTERVAL,
+        flush_events=ANALYTICS_FLUSH_EVENTS,
+    )
+analytics_store = analytics_db or analytics_log
+atexit.register(analytics_store.close)
+
+def handle_sigterm(signum, frame):
+    """Arrêt demandé par le système : écrire les analytics en attente avant de quitter"""
+    print("🛑 SIGTERM reçu, écriture des analytics...")
+    analytics_store.close()
+    raise SystemExit(0)
+
+def get_recommended_songs(k=ANALYTICS_TOP_K):
+    """Top k des chansons de la playlist par rating, lu dans un index (sans tri complet)"""
+    if analytics_db:
+        ranked = []
+        scanned = 0
+        limit = k * ANALYTICS_RANK_SCAN
+        for stats in analytics_db.iter_by_rating():
+            scanned += 1
+            song_id = stats.pop('song_id')
+            if song_id in playlist_songs:
+                ranked.append((song_id, stats))
+            if len(ranked) == k or scanned == limit:
+                break
+        if len(ranked) < k and scanned == limit:
+            # Trop de chansons notées hors playlist : requête restreinte à la playlist
+            ranked = [(stats.pop('song_id'), stats) for stats in analytics_db.top_rated(k, list(playlist_songs))]
+    else:
+        # L'index ne contient que les chansons de la playlist : O(k log n)
+        ranked = [(song_id, user_analytics['songs'].get(song_id)) for song_id, _ in rating_index.top(k)]
+    
+    rated_songs = [
+        {'song': playlist_songs[song_id], 'rating': stats['rating'] if stats else 0,
+         'stats': stats or {'play_count': 0, 'average_completion': 0}}
+        for song_id, stats in ranked if song_id in playlist_songs
+    ]
+    
+    # Compléter avec les chansons de la playlist encore sans statistiques (rating 0)
+    if len(rated_songs) < k:
+        chosen = {song_id for song_id, _ in ranked}
+        for song in playlist:
+            if len(rated_songs) == k:
+                break
+            if song['filename'] not in chosen:
+                chosen.add(song['filename'])
+                rated_songs.append({'song': song, 'rating': 0,
+                                    'stats': get_song_stats(song['filename']) or {'play_count': 0, 'average_completion': 0}})
+    return rated_songs
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -222,7 +594,7 @@ def perform_next_song(trigger_source='manual'):
     increment_state_version()
     
     # Tracker l'interaction
-    attention_detector.track_interaction(trigger_source)
+    attention_publisher.track(trigger_source)
     
     return True
 
@@ -263,6 +635,7 @@ def load_existing_music_files():
     global playlist, current_index
     
     playlist = []
+    playlist_songs.clear()
     
     if not os.path.exists(app.config['UPLOAD_FOLDER']):
         return
@@ -280,6 +653,8 @@ def load_existing_music_files():
             'filename': filename
         }
         playlist.append(song_data)
+        playlist_songs[filename] = song_data
+    rebuild_playlist_ranking()
     
     if playlist:
         current_index = 0
@@ -316,13 +691,11 @@ def get_current():
 @app.route('/api/attention/state')
 def get_attention_state():
     """
-    Obtenir l'état actuel du système d'attention
-    Cette route est appelée fréquemment et RECALCULE l'attention
-    pour détecter l'inactivité
+    Obtenir l'état actuel du système d'attention (lecture seule)
+    Le recalcul est fait par le minuteur d'AttentionPublisher ; cette route
+    sert le dernier état en cache (repli si Socket.IO est indisponible)
     """
-    # Appeler check pour recalculer selon le temps écoulé
-    state = attention_detector.check_and_update_attention()
-    return jsonify(state)
+    return jsonify(attention_publisher.get_snapshot())
 
 @app.route('/api/attention/track', methods=['POST'])
 def track_attention():
@@ -331,7 +704,7 @@ def track_attention():
     interaction_type = data.get('type')
     interaction_data = data.get('data', {})
     
-    state = attention_detector.track_interaction(interaction_type, interaction_data)
+    state = attention_publisher.track(interaction_type, interaction_data)
     
     return jsonify({
         'success': True,
@@ -341,7 +714,7 @@ def track_attention():
 @app.route('/api/attention/reset', methods=['POST'])
 def reset_attention():
     """Réinitialiser le système d'attention"""
-    attention_detector.reset()
+    attention_publisher.reset()
     return jsonify({'success': True})
 
 # ===== ROUTES ANALYTICS EXISTANTES =====
@@ -349,11 +722,10 @@ def reset_attention():
 @app.route('/api/analytics/start-session', methods=['POST'])
 def start_session():
     """Démarrer une session d'écoute"""
-    user_analytics['listening_patterns']['total_sessions'] += 1
-    save_analytics()
+    record_analytics_event({'type': 'start_session', 'at': datetime.now().isoformat()})
     
     # Tracker pour le système d'attention
-    attention_detector.track_interaction('session_start')
+    attention_publisher.track('session_start')
     
     return jsonify({'success': True})
 
@@ -364,14 +736,11 @@ def song_start():
     song_id = data.get('song_id')
     
     if song_id:
-        init_song_stats(song_id)
-        
-        user_analytics['songs'][song_id]['play_count'] += 1
-        user_analytics['songs'][song_id]['last_played'] = datetime.now().isoformat()
-        save_analytics()
+        record_analytics_event({'type': 'song_start', 'song_id': song_id,
+                                'at': datetime.now().isoformat()})
         
         # Tracker pour le système d'attention
-        attention_detector.track_interaction('play', {'song': song_id})
+        attention_publisher.track('play', {'song': song_id})
     
     return jsonify({'success': True})
 
@@ -384,22 +753,9 @@ def song_end():
     listened_duration = data.get('listened_duration', 0)
     completed = data.get('completed', False)
     
-    if song_id and song_id in user_analytics['songs']:
-        stats = user_analytics['songs'][song_id]
-        stats['total_listening_time'] += listened_duration
-        
-        if completed:
-            stats['completion_count'] += 1
-        
-        # Calculer le pourcentage d'écoute
-        if duration > 0:
-            completion_percentage = (listened_duration / duration) * 100
-            stats['average_completion'] = completion_percentage
-        
-        # Mettre à jour le rating
-        stats['rating'] = calculate_song_rating(song_id)
-        
-        save_analytics()
+    if song_id and get_song_stats(song_id):
+        record_analytics_event({'type': 'song_end', 'song_id': song_id, 'duration': duration,
+                                'listened_duration': listened_duration, 'completed': completed})
     
     return jsonify({'success': True})
 
@@ -410,64 +766,46 @@ def song_skip():
     song_id = data.get('song_id')
     
     if song_id:
-        init_song_stats(song_id)
-        user_analytics['songs'][song_id]['skip_count'] += 1
-        
-        # Ajouter aux skips récents
-        if song_id not in user_analytics['preferences']['recently_skipped']:
-            user_analytics['preferences']['recently_skipped'].append(song_id)
-        
-        # Garder seulement les 10 derniers
-        user_analytics['preferences']['recently_skipped'] = \
-            user_analytics['preferences']['recently_skipped'][-10:]
-        
-        # Calculer le skip rate global
-        total_plays = sum(s.get('play_count', 0) for s in user_analytics['songs'].values())
-        total_skips = sum(s.get('skip_count', 0) for s in user_analytics['songs'].values())
-        
-        if total_plays > 0:
-            user_analytics['listening_patterns']['skip_rate'] = \
-                round((total_skips / total_plays) * 100, 2)
-        
-        # Mettre à jour les paramètres adaptatifs
-        update_adaptive_settings()
-        
-        save_analytics()
+        record_analytics_event({'type': 'song_skip', 'song_id': song_id, 'at': datetime.now().isoformat()})
         
         # Tracker pour le système d'attention
-        attention_detector.track_interaction('skip', {'song': song_id})
+        attention_publisher.track('skip', {'song': song_id})
     
     return jsonify({'success': True})
 
 @app.route('/api/analytics/get-stats')
 def get_analytics_stats():
     """Obtenir les statistiques complètes"""
-    # Mettre à jour les chansons les plus jouées
-    most_played = sorted(
-        [(song_id, stats) for song_id, stats in user_analytics['songs'].items()],
-        key=lambda x: x[1].get('play_count', 0),
-        reverse=True
-    )[:5]
-    
-    user_analytics['preferences']['most_played'] = [
-        {'song_id': song_id, 'play_count': stats['play_count']}
-        for song_id, stats in most_played
-    ]
-    
-    # Calculer le completion rate global
-    total_plays = sum(s.get('play_count', 0) for s in user_analytics['songs'].values())
-    total_completions = sum(s.get('completion_count', 0) for s in user_analytics['songs'].values())
+    # Mettre à jour les chansons les plus jouées (top k de l'index, ?k=)
+    k = get_top_k()
+    if analytics_db:
+        top = [(stats['song_id'], stats['play_count']) for stats in analytics_db.top_played(k)]
+    else:
+        top = play_count_index.top(k)
     
-    if total_plays > 0:
-        user_analytics['listening_patterns']['completion_rate'] = \
-            round((total_completions / total_plays) * 100, 2)
+    def update(analytics):
+        analytics['preferences']['most_played'] = [
+            {'song_id': song_id, 'play_count': play_count}
+            for song_id, play_count in top
+        ]
+        
+        # Calculer le completion rate global
+        totals = get_analytics_totals()
+        
+        if totals['plays'] > 0:
+            analytics['listening_patterns']['completion_rate'] = \
+                round((totals['completions'] / totals['plays']) * 100, 2)
     
-    return jsonify(user_analytics)
+    # Sérialiser une copie : les événements modifient user_analytics depuis d'autres threads
+    analytics = analytics_snapshot(update)
+    if analytics_db:
+        analytics['songs'] = analytics_db.all_songs()
+    return jsonify(analytics)
 
 @app.route('/api/analytics/get-recommendations')
 def get_recommendations():
     """Obtenir des recommandations personnalisées"""
-    recommendations = get_recommended_songs()
+    recommendations = get_recommended_songs(get_top_k())
     
     return jsonify({
         'recommendations': [
@@ -487,33 +825,27 @@ def get_recommendations():
 @app.route('/api/analytics/reset', methods=['POST'])
 def reset_analytics():
     """Réinitialiser les analytics"""
-    global user_analytics
-    user_analytics = {
-        'songs': {},
-        'listening_patterns': {
-            'total_playtime': 0,
-            'total_sessions': 0,
-            'avg_session_duration': 0,
-            'preferred_time_of_day': [],
-            'skip_rate': 0,
-            'completion_rate': 0
-        },
-        'preferences': {
-            'favorite_songs': [],
-            'disliked_songs': [],
-            'most_played': [],
-            'recently_skipped': []
-        },
-        'adaptive_settings': {
-            'ui_complexity': 'standard',
-            'recommendation_aggressiveness': 'medium',
-            'auto_skip_enabled': False,
-            'smart_shuffle_enabled': False
-        }
-    }
-    save_analytics()
+    record_analytics_event({'type': 'reset'})
     return jsonify({'success': True})
 
+@app.route('/api/analytics/flush', methods=['POST'])
+def flush_analytics():
+    """Forcer l'écriture des événements en attente (?snapshot=1 : instantané complet)"""
+    if analytics_db:
+        # Chaque événement est déjà validé dans sa transaction
+        return jsonify({'success': True, 'flushed': 0})
+    flushed = analytics_log.flush()
+    if request.args.get('snapshot'):
+        analytics_log.compact(force=True)
+    return jsonify({'success': True, 'flushed': flushed, 'stats': analytics_log.get_stats()})
+
+@app.route('/api/analytics/storage')
+def get_analytics_storage():
+    """Statistiques du stockage analytics (journal JSONL ou base SQLite)"""
+    if analytics_db:
+        return jsonify(analytics_db.get_stats())
+    return jsonify({'backend': 'jsonl', **analytics_log.get_stats()})
+
 @app.route('/api/play-pause', methods=['POST'])
 def play_pause():
     global is_playing
@@ -523,9 +855,9 @@ def play_pause():
         
         # Tracker pour le système d'attention
         if is_playing:
-            attention_detector.track_interaction('play')
+            attention_publisher.track('play')
         else:
-            attention_detector.track_interaction('pause')
+            attention_publisher.track('pause')
     
     return jsonify({
         'is_playing': is_playing,
@@ -544,7 +876,7 @@ def play_index():
         increment_state_version()
         
         # Tracker pour le système d'attention
-        attention_detector.track_interaction('playlist', {'index': index})
+        attention_publisher.track('playlist', {'index': index})
         
         return jsonify({
             'song': playlist[current_index],
@@ -574,7 +906,7 @@ def previous_song():
         increment_state_version()
         
         # Tracker pour le système d'attention
-        attention_detector.track_interaction('seek')
+        attention_publisher.track('seek')
         
         return jsonify({
             'song': playlist[current_index],
@@ -609,6 +941,9 @@ def upload_files():
                 'filename': filename
             }
             playlist.append(song_data)
+            if filename not in playlist_songs:
+                playlist_songs[filename] = song_data
+                rating_index.update(filename, get_song_stats(filename).get('rating', 0))
             uploaded.append(song_data)
     
     if was_empty and playlist:
@@ -643,6 +978,8 @@ def clear_playlist():
                 print(f"Erreur lors de la suppression de {filepath}: {e}")
     
     playlist = []
+    playlist_songs.clear()
+    rating_index.rebuild([])
     current_index = 0
     is_playing = False
     increment_state_version()
@@ -702,40 +1039,61 @@ def stop_multimodal():
     multimodal_system.stop()
     return jsonify({'success': True})
 
-@socketio.on('video_frame')
-def handle_video_frame(data):
-    """Réception frame vidéo via WebSocket et analyse d'attention"""
-    global last_auto_skip_time
+# Version du protocole négociée par client (sid -> version)
+client_protocols = {}
+
+def open_client_session(sid):
+    """Session d'analyse d'un client connecté (rouverte si évincée pour inactivité)"""
+    if sid in client_protocols:
+        multimodal_system.get_session(sid)
+
+@socketio.on('connect')
+def handle_connect(auth=None):
+    """Négocier la version du protocole (base64 historique ou binaire)"""
+    version = negotiate_version(auth)
+    client_protocols[request.sid] = version
+    emit('protocol', {'version': version})
+    open_client_session(request.sid)
     
-    try:
-        # 1. Décoder l'image (Base64 -> OpenCV)
-        if 'frame' not in data:
-            return
+    # Réglage de capture initial (ajusté ensuite selon la charge d'analyse)
+    capture_config = multimodal_system.get_capture_config(request.sid)
+    if capture_config:
+        emit('capture_config', capture_config)
+    
+    # État d'attention courant, puis poussé seulement quand il change
+    attention_publisher.start()
+    attention_publisher.send_snapshot(request.sid)
 
-        img_data = base64.b64decode(data['frame'].split(',')[1])
-        nparr = np.frombuffer(img_data, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+@socketio.on('disconnect')
+def handle_disconnect(reason=None):
+    client_protocols.pop(request.sid, None)
+    multimodal_system.remove_client(request.sid)
 
-        # 2. Utiliser l'analyseur du système multimodal
-        # On accède directement au video_analyzer de l'instance
-        video_result = multimodal_system.video_analyzer.analyze_frame(frame)
-        
-        # 3. Récupérer le score d'engagement
-        engagement = video_result.get('engagement_score', 100)
-        face_detected = video_result.get('face_detected', False)
-        
-        # 4. LOGIQUE D'ADAPTATION MUSICALE (AUTO-SKIP)
+@app.route('/api/multimodal/stats')
+def get_multimodal_stats():
+    """Statistiques de performance de l'analyse multimodale"""
+    return jsonify({**multimodal_system.get_stats(), 'attention_push': attention_publisher.get_stats()})
+
+def handle_video_result(client_id, video_result):
+    """Résultat d'analyse vidéo (appelé depuis les workers du pipeline)"""
+    global last_auto_skip_time
+    
+    # 1. Récupérer le score d'engagement
+    engagement = video_result.get('engagement_score', 100)
+    face_detected = video_result.get('face_detected', False)
+    
+    # 2. LOGIQUE D'ADAPTATION MUSICALE (AUTO-SKIP)
+    # Si le score est très bas ET qu'un visage est détecté (pour ne pas skipper juste parce qu'on est parti)
+    # Ou si l'utilisateur semble s'ennuyer fermement
+    should_skip = False
+    
+    if face_detected and engagement < MIN_ATTENTION_THRESHOLD:
+        should_skip = True
+        print(f"⚠️ Attention basse détectée ({engagement}/100)")
+    
+    # Vérifier le cooldown pour ne pas skipper en boucle (plusieurs workers en parallèle)
+    with auto_skip_lock:
         current_time = time.time()
-        
-        # Si le score est très bas ET qu'un visage est détecté (pour ne pas skipper juste parce qu'on est parti)
-        # Ou si l'utilisateur semble s'ennuyer fermement
-        should_skip = False
-        
-        if face_detected and engagement < MIN_ATTENTION_THRESHOLD:
-            should_skip = True
-            print(f"⚠️ Attention basse détectée ({engagement}/100)")
-            
-        # Vérifier le cooldown pour ne pas skipper en boucle
         if should_skip and (current_time - last_auto_skip_time > AUTO_SKIP_COOLDOWN):
             print(f"🔄 CHANGEMENT AUTOMATIQUE DE MUSIQUE (Score: {engagement})")
             last_auto_skip_time = current_time
@@ -743,13 +1101,27 @@ def handle_video_frame(data):
             # Changer la musique
             if perform_next_song('auto_skip_attention'):
                 # Informer le client (Frontend) qu'on a changé de musique
-                emit('force_refresh', {
+                socketio.emit('force_refresh', {
                      'reason': 'low_attention',
                      'message': '🎵 Musique changée car votre attention a baissé !'
-                })
+                }, to=client_id)
+    
+    # 3. Renvoyer les résultats d'analyse au client pour affichage
+    socketio.emit('video_result', {'result': video_result}, to=client_id)
+
+@socketio.on('video_frame')
+def handle_video_frame(data):
+    """Réception frame vidéo via WebSocket : dépôt dans la boîte aux lettres du client"""
+    try:
+        # Le décodage et l'analyse sont faits par le pool de workers
+        img_data = decode_video_payload(data)
+        if img_data is None:
+            return
 
-        # 5. Renvoyer les résultats d'analyse au client pour affichage (optionnel, comme dans test_analyzers)
-        emit('video_result', {'result': video_result})
+        if session_recorder:
+            session_recorder.record_video(request.sid, img_data)
+        open_client_session(request.sid)
+        multimodal_system.add_video_frame(img_data, client_id=request.sid)
 
     except Exception as e:
         print(f"❌ Erreur processing video: {e}")
@@ -758,15 +1130,20 @@ def handle_video_frame(data):
 def handle_audio_chunk(data):
     """Réception chunk audio via WebSocket"""
     try:
-        # Traitement audio basique si nécessaire
-        if 'audio' in data:
-            audio_bytes = base64.b64decode(data['audio'])
-            audio_array = np.frombuffer(audio_bytes, dtype=np.float32)
+        # Traitement audio basique si nécessaire (PCM int16 binaire ou float32 base64)
+        audio_array = decode_audio_payload(data)
+        if audio_array is not None:
+            if session_recorder:
+                session_recorder.record_audio(request.sid, audio_array, data.get('sample_rate', 0))
             
             # Analyse
-            audio_result = multimodal_system.audio_analyzer.analyze_audio(audio_array)
+            open_client_session(request.sid)
+            audio_result = multimodal_system.analyze_audio_chunk(
+                audio_array, client_id=request.sid, sample_rate=data.get('sample_rate')
+            )
             
-            emit('audio_result', {'result': audio_result})
+            if audio_result is not None:
+                emit('audio_result', {'result': audio_result})
             
     except Exception as e:
         print(f"❌ Erreur processing audio: {e}")
@@ -776,8 +1153,13 @@ if __name__ == "__main__":
     print("🚀 Démarrage du serveur...")
     print("📦 Chargement des analytics...")
     load_analytics()
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    # En debug, le rechargeur exécute aussi ce bloc dans un processus parent qui ne sert
+    # aucune requête : lui ouvrir la capture tronquerait celle du processus enfant
+    if not SERVER_DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_session_recorder()
     print("🎵 Chargement des fichiers musique...")
     load_existing_music_files()
     print("✅ Serveur prêt sur http://localhost:5000")
     print("⏳ Attente de connexions...")
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+    socketio.run(app, debug=SERVER_DEBUG, host='0.0.0.0', port=5000)
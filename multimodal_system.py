@@ -1,33 +1,118 @@
 # multimodal_system.py
 import threading
 import queue
-from analyzers.video_analyzer import VideoAnalyzer
+import time
+import numpy as np
+from analysis_pipeline import LatestFramePipeline
+from capture_control import CaptureController
+from analyzers.video_analyzer import decode_frame, get_cascade_cache_stats
+from video_backends import create_video_backend
+from session_registry import AnalysisSession, SessionRegistry
 from analyzers.audio_analyzer import AudioAnalyzer
 from analyzers.emotion_fusion import EmotionFusion
 
 class MultimodalSystem:
-    def __init__(self, attention_detector):
+    def __init__(self, attention_detector=None, video_config=None, audio_config=None, video_workers=2,
+                 on_video_result=None,
+                 video_backend='thread', video_backend_options=None,
+                 max_sessions=20, session_idle_ttl=300.0,
+                 adaptive_capture=True, on_capture_config=None,
+                 fusion_tolerance=0.5, fusion_max_age=2.0):
+        """
+        attention_detector: détecteur d'attention de l'application, partagé par toutes les
+            sessions, qui reçoit chaque état fusionné (AttentionDetector, ou AttentionPublisher
+            qui pousse aussi le nouvel état aux clients) ; None = fusion sans effet sur l'attention
+        video_config: options transmises à VideoAnalyzer (mode de détection, etc.)
+        audio_config: options transmises à AudioAnalyzer (mode streaming, trames)
+        video_workers: taille du pool de workers d'analyse vidéo
+        on_video_result: callback(client_id, result) appelé par les workers
+        video_backend: 'thread' (analyse dans ce processus) ou 'process' (pool de processus)
+        max_sessions / session_idle_ttl: bornes du registre des sessions (une par client)
+        adaptive_capture: ajuster FPS / résolution / qualité de capture selon la charge
+        on_capture_config: callback(client_id, config) appelé quand le palier change
+        fusion_tolerance: écart maximal (s) entre les horodatages vidéo et audio fusionnés
+        fusion_max_age: âge maximal (s) d'un résultat ; au-delà la fusion est abandonnée
+        """
+        self.video_backend = create_video_backend(
+            video_backend, video_config, **(video_backend_options or {})
+        )
+        
         self.attention_detector = attention_detector
         
-        self.video_analyzer = VideoAnalyzer()
-        self.audio_analyzer = AudioAnalyzer()
-        self.fusion_engine = EmotionFusion()
+        # Une session (analyseurs, fusion) par client connecté
+        self.audio_config = dict(audio_config or {})
+        
+        self.sessions = SessionRegistry(
+            self._create_session,
+            max_sessions=max_sessions,
+            idle_ttl=session_idle_ttl,
+            on_evict=self._release_session,
+        )
         
-        self.video_queue = queue.Queue(maxsize=10)
+        # Vidéo : une boîte aux lettres par client, la frame la plus récente gagne
+        self.on_video_result = on_video_result
+        self.video_pipeline = LatestFramePipeline(
+            self._analyze_video_frame, workers=video_workers, name='video'
+        )
         self.audio_queue = queue.Queue(maxsize=10)
         
+        self.adaptive_capture = adaptive_capture
+        self.on_capture_config = on_capture_config
+        
+        # Fusion déclenchée par les nouveaux résultats (plus d'attente fixe d'une seconde)
+        self.fusion_tolerance = fusion_tolerance
+        self.fusion_max_age = fusion_max_age
+        self._fusion_cond = threading.Condition()
+        self._fusion_pending = {}  # session_id -> session, dans l'ordre d'arrivée
+        self.fusion_stats = {'fused': 0, 'stale': 0, 'misaligned': 0, 'latency_avg_ms': 0.0}
+        
         self.running = False
         self.threads = []
     
+    def _create_session(self, client_id):
+        """Construire l'état d'analyse d'un nouveau client"""
+        return AnalysisSession(
+            client_id,
+            video_analyzer=self.video_backend.create_analyzer(),
+            audio_analyzer=AudioAnalyzer(**self.audio_config),
+            fusion_engine=EmotionFusion(),
+            capture=CaptureController() if self.adaptive_capture else None,
+        )
+    
+    def _release_session(self, session):
+        """Session fermée ou évincée : libérer ce qui vit hors du registre"""
+        self.video_pipeline.discard(session.session_id)
+        self.video_backend.forget(session.session_id)
+    
+    def get_session(self, client_id, create=True):
+        """
+        Session d'analyse d'un client (créée au besoin)
+        Seule la connexion du client crée sa session : les chemins d'analyse et de fusion
+        ne font que la chercher, pour qu'un résultat en vol après remove_client() ne la
+        ressuscite pas
+        """
+        return self.sessions.get(client_id, create=create)
+    
+    def get_capture_config(self, client_id):
+        """Réglage de capture courant du client (None si capture non adaptative)"""
+        if not self.adaptive_capture:
+            return None
+        session = self.sessions.get(client_id, create=False)
+        capture = session.capture if session else CaptureController()
+        return capture.get_config()
+    
     def start(self):
         """Démarrer les threads d'analyse"""
         self.running = True
         
-        video_thread = threading.Thread(target=self._process_video)
-        audio_thread = threading.Thread(target=self._process_audio)
-        fusion_thread = threading.Thread(target=self._process_fusion)
+        # Le pool vidéo démarre aussi tout seul à la première frame reçue
+        self.video_pipeline.start()
         
-        self.threads = [video_thread, audio_thread, fusion_thread]
+        # Démons : sinon l'interpréteur les attend avant atexit et close() ne serait jamais appelé
+        audio_thread = threading.Thread(target=self._process_audio, name='audio-analysis', daemon=True)
+        fusion_thread = threading.Thread(target=self._process_fusion, name='fusion', daemon=True)
+        
+        self.threads = [audio_thread, fusion_thread]
         
         for thread in self.threads:
             thread.start()
@@ -36,63 +121,224 @@ class MultimodalSystem:
     
     def stop(self):
         """Arrêter proprement"""
+        # Le pool vidéo reste actif : il est partagé par tous les clients connectés
         self.running = False
+        with self._fusion_cond:
+            self._fusion_cond.notify_all()
         for thread in self.threads:
             thread.join()
     
-    def add_video_frame(self, frame):
-        """Ajouter frame vidéo (appelé par WebSocket)"""
-        if not self.video_queue.full():
-            self.video_queue.put(frame)
+    def close(self):
+        """Arrêt du serveur : threads d'analyse, pool vidéo puis backend (processus, mémoire partagée)"""
+        self.stop()
+        # Plus aucune analyse en cours avant de libérer les slots du backend
+        self.video_pipeline.stop()
+        self.video_backend.close()
+    
+    def add_video_frame(self, frame, client_id=None):
+        """
+        Ajouter frame vidéo (appelé par WebSocket)
+        frame: octets JPEG (décodés par le worker) ou image déjà décodée
+        Returns: True si une frame non traitée du même client a été remplacée
+        (False aussi si le client n'a pas de session : frame ignorée)
+        """
+        session = self.sessions.get(client_id, create=False)
+        if session is None:
+            return False
+        # Horodatage de réception, porté avec la frame jusqu'à la fusion
+        replaced = self.video_pipeline.submit(client_id, (frame, time.time()))
+        if session.capture:
+            session.capture.record_submit(replaced)
+        return replaced
     
-    def add_audio_chunk(self, audio_data):
+    def remove_client(self, client_id):
+        """Supprimer la session d'un client déconnecté"""
+        if not self.sessions.remove(client_id):
+            # Pas encore de session : seule une frame peut être en attente
+            self.video_pipeline.discard(client_id)
+    
+    def add_audio_chunk(self, audio_data, client_id=None, sample_rate=None):
         """Ajouter chunk audio (appelé par WebSocket)"""
         if not self.audio_queue.full():
-            self.audio_queue.put(audio_data)
+            self.audio_queue.put((client_id, audio_data, sample_rate, time.time()))
     
-    def _process_video(self):
-        """Thread analyse vidéo"""
-        while self.running:
-            try:
-                frame = self.video_queue.get(timeout=0.1)
-                self.video_state = self.video_analyzer.analyze_frame(frame)
-            except queue.Empty:
-                continue
+    def analyze_audio_chunk(self, audio_data, client_id=None, sample_rate=None, captured_at=None):
+        """
+        Analyser un chunk audio avec l'analyseur de la session du client
+        captured_at: horodatage de réception du chunk (maintenant par défaut)
+        Returns: le résultat, ou None si le client n'a pas (ou plus) de session
+        """
+        captured_at = captured_at or time.time()
+        session = self.sessions.get(client_id, create=False)
+        if session is None:
+            return None
+        # Handlers Socket.IO et thread audio peuvent traiter deux chunks du même client
+        with session.audio_lock:
+            result = dict(session.audio_analyzer.analyze_audio(audio_data, sample_rate))
+            session.audio_state = result
+            session.audio_at = captured_at
+        self._notify_fusion(session)
+        return result
+    
+    def _analyze_video_frame(self, client_id, item):
+        """Worker vidéo : décoder, analyser puis publier le résultat"""
+        frame, captured_at = item
+        result = self.analyze_video_frame(frame, client_id, captured_at=captured_at)
+        if result is not None and self.on_video_result:
+            self.on_video_result(client_id, result)
+    
+    def analyze_video_frame(self, frame, client_id=None, source_size=None, captured_at=None):
+        """
+        Analyser immédiatement une frame avec l'état de la session du client
+        frame: octets JPEG ou image déjà décodée (source_size = taille d'origine)
+        captured_at: horodatage de réception de la frame (maintenant par défaut)
+        Returns: le résultat, ou None si la frame n'a pas pu être décodée ou si le
+        client n'a pas (ou plus) de session
+        """
+        captured_at = captured_at or time.time()
+        started_at = time.perf_counter()
+        if not isinstance(frame, np.ndarray):
+            # Les frames remplacées ne sont jamais décodées
+            frame, source_size = decode_frame(frame, self.video_backend.analysis_width)
+            if frame is None:
+                return None
+        
+        session = self.sessions.get(client_id, create=False)
+        if session is None:
+            return None  # Client déconnecté pendant que la frame attendait
+        result = self.video_backend.analyze(session, frame, source_size)
+        
+        session.video_state = result
+        session.video_at = captured_at
+        if session.capture:
+            session.capture.record_processed(time.perf_counter() - started_at)
+            self._update_capture(session)
+        self._notify_fusion(session)
+        return result
+    
+    def _update_capture(self, session):
+        """Réévaluer le palier de capture et notifier le client s'il change"""
+        # Une session n'occupe jamais plus d'un worker à la fois
+        active = max(1, len(self.sessions))
+        config = session.capture.update(worker_share=self.video_pipeline.num_workers / active)
+        if config and self.on_capture_config:
+            self.on_capture_config(session.session_id, config)
     
     def _process_audio(self):
         """Thread analyse audio"""
         while self.running:
             try:
-                audio_chunk = self.audio_queue.get(timeout=0.1)
-                self.audio_state = self.audio_analyzer.analyze_audio(audio_chunk)
+                client_id, audio_chunk, sample_rate, captured_at = self.audio_queue.get(timeout=0.1)
+                self.analyze_audio_chunk(audio_chunk, client_id, sample_rate, captured_at)
             except queue.Empty:
                 continue
     
+    def _notify_fusion(self, session):
+        """Nouveau résultat vidéo ou audio : réveiller le thread de fusion"""
+        if not self.running:
+            return
+        with self._fusion_cond:
+            self._fusion_pending[session.session_id] = session
+            self._fusion_cond.notify()
+    
     def _process_fusion(self):
-        """Thread fusion + mise à jour attention"""
+        """Thread fusion + mise à jour attention, réveillé par chaque nouveau résultat"""
+        next_eviction = time.monotonic() + 1.0
         while self.running:
             try:
-                if hasattr(self, 'video_state') and hasattr(self, 'audio_state'):
-                    unified = self.fusion_engine.fuse_signals(
-                        self.video_state,
-                        self.audio_state
-                    )
-                    
-                    # Mettre à jour attention_detector existant
-                    self._update_attention_system(unified)
+                with self._fusion_cond:
+                    if not self._fusion_pending and self.running:
+                        self._fusion_cond.wait(max(0.0, next_eviction - time.monotonic()))
+                    # Plusieurs résultats d'une même session arrivés entre-temps : une seule fusion
+                    pending = list(self._fusion_pending.values())
+                    self._fusion_pending.clear()
+                
+                for session in pending:
+                    self._fuse_aligned(session)
                 
-                threading.Event().wait(1.0)  # 1 FPS fusion
+                # Expirer les sessions inactives même sans nouvelle connexion
+                if time.monotonic() >= next_eviction:
+                    self.sessions.evict_idle()
+                    next_eviction = time.monotonic() + 1.0
             except Exception as e:
                 print(f"❌ Erreur fusion: {e}")
     
+    def _fuse_aligned(self, session, now=None):
+        """
+        Fusionner si les derniers résultats vidéo et audio sont récents et
+        pris à moins de fusion_tolerance l'un de l'autre
+        """
+        if session.video_state is None or session.audio_state is None:
+            return None
+        pair = (session.video_at, session.audio_at)
+        if pair == session.fused_pair:
+            return None  # Rien de nouveau depuis la dernière fusion
+        
+        now = now or time.time()
+        stats = self.fusion_stats
+        if now - min(pair) > self.fusion_max_age:
+            stats['stale'] += 1
+            return None
+        if abs(pair[0] - pair[1]) > self.fusion_tolerance:
+            stats['misaligned'] += 1
+            return None
+        
+        unified = self._fuse_session(session)
+        session.fused_pair = pair
+        unified['captured_at'] = max(pair)
+        unified['skew_ms'] = round(abs(pair[0] - pair[1]) * 1000, 1)
+        
+        # Latence entre la réception du résultat le plus récent et la fusion
+        latency_ms = (now - max(pair)) * 1000
+        stats['fused'] += 1
+        stats['latency_avg_ms'] += (latency_ms - stats['latency_avg_ms']) / min(stats['fused'], 100)
+        return unified
+    
+    def fuse_session(self, client_id):
+        """Fusionner les derniers états vidéo/audio d'un client (None si incomplets)"""
+        session = self.sessions.get(client_id, create=False)
+        return self._fuse_session(session) if session else None
+    
+    def _fuse_session(self, session):
+        if session.video_state is None or session.audio_state is None:
+            return None
+        
+        unified = session.fusion_engine.fuse_signals(
+            session.video_state,
+            session.audio_state
+        )
+        
+        # Mettre à jour l'attention de l'application
+        self._update_attention_system(unified)
+        return unified
+    
+    def get_stats(self):
+        """Statistiques de performance des analyseurs"""
+        sessions = self.sessions.sessions()
+        capture = [s.capture.get_stats() for s in sessions if s.capture]
+        vad = {s.session_id: s.audio_analyzer.get_vad_stats() for s in sessions}
+        return {
+            'video_backend': self.video_backend.get_stats(),
+            'video_pipeline': self.video_pipeline.get_stats(),
+            'sessions': {**self.sessions.get_stats(), **get_cascade_cache_stats()},
+            'capture': {
+                'adaptive': self.adaptive_capture,
+                'levels': [c['level'] for c in capture],
+                'changes': sum(c['changes'] for c in capture),
+            },
+            'fusion': {
+                **self.fusion_stats,
+                'latency_avg_ms': round(self.fusion_stats['latency_avg_ms'], 2),
+                'tolerance_s': self.fusion_tolerance,
+                'max_age_s': self.fusion_max_age,
+            },
+            'audio': {
+                'vad': vad,
+                'time_saved_ms': round(sum(v['time_saved_ms'] for v in vad.values()), 1),
+            }
+        }
+    
     def _update_attention_system(self, unified_state):
-        """Injecter dans attention_system existant"""
-        # Mapper vers track_interaction
-        if unified_state['pattern'] == 'absent':
-            self.attention_detector.track_interaction('multimodal_absent')
-        
-        # Ajuster score directement (optionnel)
-        multimodal_score = unified_state['attention_score']
-        self.attention_detector.state['attention_score'] = int(
-            (self.attention_detector.state['attention_score'] + multimodal_score) / 2
-        )
\ No newline at end of file
+        """Injecter dans le détecteur d'attention partagé"""
+        if self.attention_detector is not None:
+            self.attention_detector.apply_multimodal(unified_state)
@@ -0,0 +1,86 @@
+# ranking_index.py
+"""
+Classement décroissant tenu à jour clé par clé (tas binaire à suppression paresseuse)
+
+Chaque mise à jour pousse une nouvelle entrée (O(log n)) et rend la précédente
+obsolète (numéro de version). top(k) dépile les entrées valides jusqu'à en
+avoir k, puis les remet : O(k log n), plus les entrées obsolètes rencontrées,
+qui sont supprimées définitivement. Le tas est reconstruit quand les entrées
+obsolètes dépassent le nombre de clés.
+
+Les égalités sont départagées par l'ordre de première insertion (comme un tri
+stable sur un dictionnaire). Un verrou protège le tas : top() le modifie
+temporairement et peut être appelé en même temps par plusieurs requêtes.
+"""
+import heapq
+import threading
+from typing import Hashable, Iterable, List, Tuple
+
+
+class RankingIndex:
+    def __init__(self):
+        self._scores = {}
+        self._versions = {}
+        self._order = {}   # Rang de première insertion
+        self._heap = []    # (-score, rang, version, clé)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._scores)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._scores
+
+    def update(self, key: Hashable, score: float):
+        """Insérer ou modifier le score d'une clé"""
+        with self._lock:
+            if key in self._scores and self._scores[key] == score:
+                return
+            version = self._versions.get(key, 0) + 1
+            self._versions[key] = version
+            self._scores[key] = score
+            order = self._order.setdefault(key, len(self._order))
+            heapq.heappush(self._heap, (-score, order, version, key))
+            if len(self._heap) > 2 * len(self._scores) + 64:
+                self._compact()
+
+    def rebuild(self, items: Iterable[Tuple[Hashable, float]]):
+        """Remplacer tout le contenu (O(n))"""
+        items = list(items)
+        with self._lock:
+            self._scores = {}
+            self._versions = {}
+            self._order = {}
+            for key, score in items:
+                self._scores[key] = score
+                self._versions[key] = 1
+                self._order.setdefault(key, len(self._order))
+            self._compact()
+
+    def top(self, k: int) -> List[Tuple[Hashable, float]]:
+        """
+        k meilleures clés (score décroissant) sans trier l'ensemble
+        Pas de filtre : un index ne contient que les candidats (un index par ensemble)
+        """
+        with self._lock:
+            heap = self._heap
+            result = []
+            popped = []
+            while heap and len(result) < k:
+                entry = heapq.heappop(heap)
+                _, _, version, key = entry
+                if self._versions[key] != version:
+                    continue  # Entrée obsolète : supprimée pour de bon
+                popped.append(entry)
+                result.append((key, self._scores[key]))
+            for entry in popped:
+                heapq.heappush(heap, entry)
+            return result
+
+    def _compact(self):
+        # Appelé sous self._lock
+        self._heap = [(-score, self._order[key], self._versions[key], key)
+                      for key, score in self._scores.items()]
+        heapq.heapify(self._heap)
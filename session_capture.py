@@ -0,0 +1,392 @@
+# session_capture.py
+"""
+Enregistrement et rejeu de sessions multimodales
+
+Format de fichier (.mmcap), écrit en ajout seul :
+    en-tête   : MAGIC (8 octets) + version (uint16) + réservé
+    records   : en-tête fixe (type, flux, horodatage, taille, fréquence) + données
+                (octets JPEG bruts pour la vidéo, PCM int16 little-endian pour l'audio)
+    fermeture : table des offsets des records + pied de page pointant vers la table
+
+Si le fichier n'a pas été fermé proprement (serveur arrêté), la table est
+reconstruite en parcourant les records. Le lecteur mappe le fichier en mémoire :
+les frames ne sont jamais copiées avant le décodage.
+
+Usage:
+    python session_capture.py info capture.mmcap
+    python session_capture.py replay capture.mmcap --output timeline.ndjson
+    python session_capture.py replay capture.mmcap --realtime
+"""
+import argparse
+import contextlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Dict, Iterator, NamedTuple
+
+import numpy as np
+
+MAGIC = b'MMCAP\x00\x00\x01'
+FORMAT_VERSION = 1
+INDEX_MAGIC = b'MMCAPIDX'
+
+KIND_VIDEO_JPEG = 1
+KIND_AUDIO_PCM16 = 2
+
+_FILE_HEADER = struct.Struct('<8sH6x')
+# type, flux (client), horodatage (s depuis le début), taille des données, fréquence audio
+_RECORD_HEADER = struct.Struct('<BxHdII')
+# offset de la table, nombre de records, magic
+_FOOTER = struct.Struct('<QI4x8s')
+
+# Même échelle que le protocole binaire (int16 / 32768) : enregistrement et rejeu identiques
+_INT16_SCALE = 32768
+
+
+class CaptureRecord(NamedTuple):
+    kind: int
+    stream: int
+    timestamp: float
+    payload: memoryview
+    sample_rate: int
+
+
+class CaptureRecorder:
+    """Enregistreur opt-in branché sur les handlers video_frame / audio_chunk"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._file = open(path, 'wb')
+        self._file.write(_FILE_HEADER.pack(MAGIC, FORMAT_VERSION))
+        self._offsets = []
+        self._streams = {}  # client_id -> numéro de flux
+        self._start = time.perf_counter()
+        self.bytes_written = _FILE_HEADER.size
+        print(f"⏺️ Enregistrement de la session dans {path}")
+
+    def _stream_for(self, client_id) -> int:
+        stream = self._streams.get(client_id)
+        if stream is None:
+            stream = self._streams[client_id] = len(self._streams)
+        return stream
+
+    def _append(self, kind: int, client_id, payload, sample_rate: int = 0):
+        with self._lock:
+            if self._file is None:
+                return
+            header = _RECORD_HEADER.pack(kind, self._stream_for(client_id),
+                                         time.perf_counter() - self._start,
+                                         len(payload), sample_rate)
+            self._offsets.append(self._file.tell())
+            self._file.write(header)
+            self._file.write(payload)
+            self.bytes_written += len(header) + len(payload)
+
+    def record_video(self, client_id, jpeg_bytes):
+        """Frame JPEG telle que reçue du client"""
+        self._append(KIND_VIDEO_JPEG, client_id, memoryview(jpeg_bytes).cast('B'))
+
+    def record_audio(self, client_id, samples: np.ndarray, sample_rate: int = 0):
+        """Chunk audio float32 [-1, 1], stocké en PCM int16"""
+        pcm = np.clip(np.rint(np.asarray(samples, dtype=np.float32) * _INT16_SCALE), -32768, 32767)
+        self._append(KIND_AUDIO_PCM16, client_id, pcm.astype('<i2').tobytes(), int(sample_rate or 0))
+
+    def close(self):
+        """Écrire la table des offsets et fermer le fichier"""
+        with self._lock:
+            if self._file is None:
+                return
+            table_offset = self._file.tell()
+            self._file.write(np.asarray(self._offsets, dtype='<u8').tobytes())
+            self._file.write(_FOOTER.pack(table_offset, len(self._offsets), INDEX_MAGIC))
+            self._file.close()
+            self._file = None
+        print(f"⏹️ Enregistrement terminé : {len(self._offsets)} records dans {self.path}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                'path': self.path,
+                'records': len(self._offsets),
+                'streams': len(self._streams),
+                'bytes': self.bytes_written,
+            }
+
+
+class CaptureReader:
+    """Lecture d'une capture par mappage mémoire (accès aléatoire via la table d'offsets)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version = _FILE_HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Fichier de capture invalide: {path}")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Version de capture non supportée: {version}")
+
+        self.offsets = self._read_index()
+
+    def _read_index(self) -> np.ndarray:
+        size = len(self._map)
+        if size >= _FILE_HEADER.size + _FOOTER.size:
+            table_offset, count, magic = _FOOTER.unpack_from(self._map, size - _FOOTER.size)
+            if magic == INDEX_MAGIC and table_offset + count * 8 == size - _FOOTER.size:
+                return np.frombuffer(self._map, dtype='<u8', count=count, offset=table_offset)
+
+        # Capture interrompue : reconstruire la table en parcourant les records
+        offsets = []
+        offset = _FILE_HEADER.size
+        while offset + _RECORD_HEADER.size <= size:
+            length = _RECORD_HEADER.unpack_from(self._map, offset)[3]
+            end = offset + _RECORD_HEADER.size + length
+            if end > size:
+                break  # Dernier record tronqué
+            offsets.append(offset)
+            offset = end
+        return np.asarray(offsets, dtype='<u8')
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> CaptureRecord:
+        offset = int(self.offsets[index])
+        kind, stream, timestamp, length, sample_rate = _RECORD_HEADER.unpack_from(self._map, offset)
+        start = offset + _RECORD_HEADER.size
+        payload = memoryview(self._map)[start:start + length]
+        return CaptureRecord(kind, stream, timestamp, payload, sample_rate)
+
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def audio_samples(self, record: CaptureRecord) -> np.ndarray:
+        """PCM int16 -> float32 [-1, 1] (même conversion que le protocole binaire)"""
+        pcm = np.frombuffer(record.payload, dtype='<i2')
+        return np.multiply(pcm, np.float32(1.0 / _INT16_SCALE), dtype=np.float32)
+
+    def info(self) -> Dict:
+        kinds = {KIND_VIDEO_JPEG: 0, KIND_AUDIO_PCM16: 0}
+        streams = set()
+        duration = 0.0
+        for record in self:
+            kinds[record.kind] = kinds.get(record.kind, 0) + 1
+            streams.add(record.stream)
+            duration = max(duration, record.timestamp)
+            record.payload.release()
+        return {
+            'path': self.path,
+            'records': len(self),
+            'video_frames': kinds[KIND_VIDEO_JPEG],
+            'audio_chunks': kinds[KIND_AUDIO_PCM16],
+            'streams': len(streams),
+            'duration': round(duration, 3),
+            'bytes': len(self._map),
+        }
+
+    def close(self):
+        self.offsets = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # Des vues sur les données sont encore utilisées
+        self._file.close()
+
+
+class _StageTimer:
+    """Temps cumulés par étage (décodage, vidéo, audio, fusion)"""
+
+    def __init__(self):
+        self.totals = {}
+
+    def add(self, stage: str, seconds: float):
+        count, total, worst = self.totals.get(stage, (0, 0.0, 0.0))
+        self.totals[stage] = (count + 1, total + seconds, max(worst, seconds))
+
+    def summary(self) -> Dict:
+        return {
+            stage: {
+                'count': count,
+                'avg_ms': round(total / count * 1000, 3),
+                'max_ms': round(worst * 1000, 3),
+                'total_s': round(total, 3),
+            }
+            for stage, (count, total, worst) in self.totals.items()
+        }
+
+
+def replay_capture(path: str, system=None, realtime: bool = False, fusion_interval: float = 1.0,
+                   on_event=None) -> Dict:
+    """
+    Rejouer une capture dans MultimodalSystem
+    realtime: respecter les horodatages (les frames passent par le pipeline
+        "dernière frame gagnante" comme en direct) ; sinon enchaîner sans attente,
+        chaque frame étant analysée de façon synchrone
+    fusion_interval: fusion des signaux toutes les N secondes de capture
+    on_event: callback(event) pour chaque résultat (sinon gardés dans 'timeline')
+    """
+    from analyzers.video_analyzer import decode_frame
+
+    if system is None:
+        from multimodal_system import MultimodalSystem
+        system = MultimodalSystem(adaptive_capture=False)
+
+    timeline = []
+    emit_lock = threading.Lock()
+
+    def emit_event(event):
+        with emit_lock:
+            if on_event:
+                on_event(event)
+            else:
+                timeline.append(event)
+
+    def video_event(client_id, t, result):
+        return {'t': round(t, 3), 'stream': client_id, 'kind': 'video',
+                'face_detected': result['face_detected'],
+                'engagement_score': result['engagement_score'],
+                'head_pose': dict(result['head_pose']),
+                'emotion': result['facial_expression']['emotion']}
+
+    timer = _StageTimer()
+    reader = CaptureReader(path)
+    frame_times = {}
+    streams = set()
+    next_fusion = fusion_interval
+
+    if realtime:
+        previous_callback = system.on_video_result
+
+        def on_video_result(client_id, result):
+            emit_event(video_event(client_id, frame_times.get(client_id, 0.0), result))
+        system.on_video_result = on_video_result
+
+    started_at = time.perf_counter()
+    try:
+        for record in reader:
+            client_id = f"replay-{record.stream}"
+            if client_id not in streams:
+                # Équivalent de la connexion du client : seule elle crée la session
+                system.get_session(client_id)
+                streams.add(client_id)
+
+            if realtime:
+                delay = record.timestamp - (time.perf_counter() - started_at)
+                if delay > 0:
+                    time.sleep(delay)
+
+            # Fusion cadencée sur l'horloge de la capture
+            while record.timestamp >= next_fusion:
+                for stream_id in sorted(streams):
+                    t0 = time.perf_counter()
+                    unified = system.fuse_session(stream_id)
+                    if unified is not None:
+                        timer.add('fusion', time.perf_counter() - t0)
+                        emit_event({'t': round(next_fusion, 3), 'stream': stream_id, 'kind': 'fusion',
+                                    'attention_score': unified['attention_score'],
+                                    'emotion': unified['emotion'], 'pattern': unified['pattern']})
+                next_fusion += fusion_interval
+
+            if record.kind == KIND_VIDEO_JPEG and realtime:
+                frame_times[client_id] = record.timestamp
+                system.add_video_frame(bytes(record.payload), client_id=client_id)
+
+            elif record.kind == KIND_VIDEO_JPEG:
+                t0 = time.perf_counter()
+                gray, source_size = decode_frame(record.payload, system.video_backend.analysis_width)
+                t1 = time.perf_counter()
+                timer.add('decode', t1 - t0)
+                if gray is not None:
+                    result = system.analyze_video_frame(gray, client_id, source_size)
+                    timer.add('video', time.perf_counter() - t1)
+                    emit_event(video_event(client_id, record.timestamp, result))
+
+            elif record.kind == KIND_AUDIO_PCM16:
+                samples = reader.audio_samples(record)
+                t0 = time.perf_counter()
+                result = system.analyze_audio_chunk(samples, client_id, record.sample_rate or None)
+                timer.add('audio', time.perf_counter() - t0)
+                emit_event({'t': round(record.timestamp, 3), 'stream': client_id, 'kind': 'audio',
+                            'speech_detected': result.get('speech_detected'),
+                            'energy_level': result.get('energy_level'),
+                            'emotion': result.get('emotion_hint')})
+            record.payload.release()
+
+        if realtime:
+            # Laisser les workers finir les frames encore en attente
+            while system.video_pipeline.pending() or system.video_pipeline.get_stats()['busy']:
+                time.sleep(0.01)
+    finally:
+        if realtime:
+            system.on_video_result = previous_callback
+        reader.close()
+
+    elapsed = time.perf_counter() - started_at
+    stages = timer.summary()
+    if realtime:
+        # En temps réel, décodage + analyse sont mesurés par le pipeline
+        pipeline = system.video_pipeline.get_stats()
+        stages['video'] = {'count': pipeline['processed'], 'avg_ms': pipeline['processing_avg_ms'],
+                           'max_ms': pipeline['processing_max_ms'], 'dropped': pipeline['dropped']}
+
+    return {
+        'timeline': timeline,
+        'summary': {
+            'mode': 'realtime' if realtime else 'unthrottled',
+            'wall_seconds': round(elapsed, 3),
+            'streams': len(streams),
+            'stages': stages,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    info_parser = commands.add_parser('info', help='résumé d\'une capture')
+    info_parser.add_argument('capture')
+
+    replay_parser = commands.add_parser('replay', help='rejouer une capture dans MultimodalSystem')
+    replay_parser.add_argument('capture')
+    replay_parser.add_argument('--realtime', action='store_true', help='respecter les horodatages')
+    replay_parser.add_argument('--fusion-interval', type=float, default=1.0)
+    replay_parser.add_argument('--output', '-o', help='chronologie NDJSON (défaut : stdout)')
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        reader = CaptureReader(args.capture)
+        print(json.dumps(reader.info(), indent=2))
+        reader.close()
+        return
+
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+
+    def write_event(event):
+        output.write(json.dumps(event) + '\n')
+
+    try:
+        # Les messages des analyseurs ne doivent pas se mêler à la chronologie
+        with contextlib.redirect_stdout(sys.stderr):
+            result = replay_capture(args.capture, realtime=args.realtime,
+                                    fusion_interval=args.fusion_interval, on_event=write_event)
+    finally:
+        if args.output:
+            output.close()
+
+    print(json.dumps(result['summary'], indent=2), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
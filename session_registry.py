@@ -0,0 +1,137 @@
+# session_registry.py
+"""
+Registre des sessions d'analyse, indexé par sid Socket.IO
+
+Chaque session possède ses propres analyseurs (lissage, historique de fusion) ;
+les états fusionnés alimentent le détecteur d'attention de l'application.
+
+Le registre borne la mémoire : nombre maximal de sessions (la moins récemment
+active est évincée) et expiration des sessions inactives.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+
+class AnalysisSession:
+    """État d'analyse propre à un client connecté"""
+
+    def __init__(self, session_id, video_analyzer, audio_analyzer, fusion_engine, capture=None):
+        self.session_id = session_id
+        self.video_analyzer = video_analyzer  # None si l'analyse vidéo tourne hors processus
+        self.audio_analyzer = audio_analyzer
+        self.fusion_engine = fusion_engine
+        self.capture = capture  # CaptureController (None = capture non adaptative)
+        # L'analyse audio garde un état en flux (tampon circulaire, pitch, VAD) : un chunk à la fois
+        self.audio_lock = threading.Lock()
+
+        # Derniers résultats et leur horodatage de réception, lus par le thread de fusion
+        self.video_state = None
+        self.audio_state = None
+        self.video_at = 0.0
+        self.audio_at = 0.0
+        self.fused_pair = None  # (video_at, audio_at) de la dernière fusion
+
+        self.created_at = time.time()
+        self.last_seen = self.created_at
+
+
+class SessionRegistry:
+    def __init__(self, factory: Callable, max_sessions: int = 20, idle_ttl: float = 300.0,
+                 on_evict: Optional[Callable] = None):
+        """
+        factory: fonction session_id -> AnalysisSession
+        max_sessions: nombre maximal de sessions simultanées (LRU au-delà)
+        idle_ttl: secondes d'inactivité avant éviction
+        on_evict: callback(session) appelé à chaque suppression
+        """
+        self.factory = factory
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl = idle_ttl
+        self.on_evict = on_evict
+
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # du moins récent au plus récent
+        self.stats = {'created': 0, 'evicted_idle': 0, 'evicted_lru': 0, 'removed': 0}
+
+    def get(self, session_id, create: bool = True) -> Optional[AnalysisSession]:
+        """Retourner la session (créée au besoin) et la marquer comme active"""
+        evicted = []
+        with self._lock:
+            now = time.time()
+            evicted.extend(self._pop_idle(now))
+
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            elif create:
+                while len(self._sessions) >= self.max_sessions:
+                    _, oldest = self._sessions.popitem(last=False)
+                    self.stats['evicted_lru'] += 1
+                    evicted.append(oldest)
+                session = self.factory(session_id)
+                self._sessions[session_id] = session
+                self.stats['created'] += 1
+
+            if session is not None:
+                session.last_seen = now
+
+        self._notify(evicted)
+        return session
+
+    def remove(self, session_id) -> bool:
+        """Supprimer une session (déconnexion du client)"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self.stats['removed'] += 1
+        if session is None:
+            return False
+        self._notify([session])
+        return True
+
+    def evict_idle(self) -> List:
+        """Évincer les sessions inactives depuis plus de idle_ttl"""
+        with self._lock:
+            evicted = self._pop_idle(time.time())
+        self._notify(evicted)
+        return [session.session_id for session in evicted]
+
+    def sessions(self) -> List[AnalysisSession]:
+        """Copie de la liste des sessions actives"""
+        with self._lock:
+            return list(self._sessions.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def _pop_idle(self, now: float) -> List[AnalysisSession]:
+        # L'ordre LRU permet de s'arrêter à la première session encore active
+        evicted = []
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_seen <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.stats['evicted_idle'] += 1
+            evicted.append(session)
+        return evicted
+
+    def _notify(self, sessions: List[AnalysisSession]):
+        if not self.on_evict:
+            return
+        for session in sessions:
+            try:
+                self.on_evict(session)
+            except Exception as e:
+                print(f"❌ Erreur éviction session {session.session_id}: {e}")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['active'] = len(self._sessions)
+        stats['max_sessions'] = self.max_sessions
+        stats['idle_ttl'] = self.idle_ttl
+        return stats
@@ -0,0 +1,62 @@
+# socket_protocol.py
+"""
+Protocole d'envoi des frames vidéo et chunks audio via Socket.IO
+
+Version 1 (historique) : data URL JPEG et float32 encodés en base64
+Version 2 (binaire)    : octets JPEG bruts et PCM int16 en pièces jointes binaires
+"""
+import base64
+from typing import Optional
+import numpy as np
+
+PROTOCOL_BASE64 = 1
+PROTOCOL_BINARY = 2
+SUPPORTED_VERSIONS = (PROTOCOL_BASE64, PROTOCOL_BINARY)
+
+_BINARY_TYPES = (bytes, bytearray, memoryview)
+_INT16_SCALE = np.float32(1.0 / 32768.0)
+
+
+def negotiate_version(auth) -> int:
+    """Choisir la version commune à partir des infos envoyées à la connexion"""
+    requested = PROTOCOL_BASE64
+    if isinstance(auth, dict):
+        try:
+            requested = int(auth.get('protocol', PROTOCOL_BASE64))
+        except (TypeError, ValueError):
+            requested = PROTOCOL_BASE64
+
+    # Les anciens clients n'envoient rien : on reste en base64
+    supported = [v for v in SUPPORTED_VERSIONS if v <= requested]
+    return max(supported) if supported else PROTOCOL_BASE64
+
+
+def decode_video_payload(data) -> Optional[object]:
+    """Extraire les octets JPEG d'un événement video_frame (v1 ou v2)"""
+    if not isinstance(data, dict) or 'frame' not in data:
+        return None
+
+    frame = data['frame']
+    if isinstance(frame, _BINARY_TYPES):
+        return frame
+    if isinstance(frame, str):
+        # Data URL "data:image/jpeg;base64,..."
+        return base64.b64decode(frame.split(',', 1)[-1])
+    return None
+
+
+def decode_audio_payload(data) -> Optional[np.ndarray]:
+    """Extraire les échantillons float32 d'un événement audio_chunk (v1 ou v2)"""
+    if not isinstance(data, dict) or 'audio' not in data:
+        return None
+
+    audio = data['audio']
+    if isinstance(audio, _BINARY_TYPES):
+        if data.get('format', 'pcm_s16le') == 'f32le':
+            return np.frombuffer(audio, dtype='<f4')
+        # PCM int16 : vue sans copie puis conversion unique vers float32 [-1, 1]
+        pcm = np.frombuffer(audio, dtype='<i2')
+        return np.multiply(pcm, _INT16_SCALE, dtype=np.float32)
+    if isinstance(audio, str):
+        return np.frombuffer(base64.b64decode(audio), dtype=np.float32)
+    return None
@@ -44,40 +44,63 @@ class AttentionAdapter {
     }
 
     startMonitoring() {
-        // Vérifier l'attention toutes les 2 secondes (PLUS RAPIDE)
+        // Le serveur réévalue l'attention et pousse 'attention_state' quand elle change
+        // (socket partagé avec script.js) ; sinon repli sur une lecture périodique
+        if (typeof socket !== 'undefined') {
+            socket.on('attention_state', (data) => this.receiveState(data));
+            socket.on('disconnect', () => this.startPolling());
+            socket.on('connect', () => this.stopPolling());
+            if (!socket.connected) {
+                this.startPolling();
+            }
+            console.log('⏰ Monitoring d\'attention démarré (poussé par le serveur)');
+        } else {
+            this.startPolling();
+        }
+    }
+
+    startPolling() {
+        if (this.checkInterval) return;
         this.checkInterval = setInterval(() => {
             this.checkAttention();
         }, 2000);
+        console.log('⏰ Monitoring d\'attention en lecture périodique (toutes les 2s)');
+    }
 
-        console.log('⏰ Monitoring d\'attention démarré (vérification toutes les 2s)');
+    stopPolling() {
+        if (this.checkInterval) {
+            clearInterval(this.checkInterval);
+            this.checkInterval = null;
+        }
     }
 
     async checkAttention() {
         try {
             const response = await fetch('/api/attention/state');
-            const data = await response.json();
+            this.receiveState(await response.json());
+        } catch (error) {
+            console.error('❌ Erreur check attention:', error);
+        }
+    }
 
-            const oldScore = this.state.attention_score;
-            const newScore = data.attention_score;
+    receiveState(data) {
+        const oldScore = this.state.attention_score;
+        const newScore = data.attention_score;
 
-            if (oldScore !== newScore) {
-                console.log(`📊 Score changé: ${oldScore} → ${newScore}`);
-            }
+        if (oldScore !== newScore) {
+            console.log(`📊 Score changé: ${oldScore} → ${newScore}`);
+        }
 
-            this.state = data;
+        this.state = data;
 
-            // Appliquer les adaptations
-            this.applyAdaptations();
+        // Appliquer les adaptations
+        this.applyAdaptations();
 
-            // Mettre à jour l'indicateur visuel
-            this.updateIndicator();
-
-            // Mettre à jour le widget d'infos
-            this.updateInfoWidget();
+        // Mettre à jour l'indicateur visuel
+        this.updateIndicator();
 
-        } catch (error) {
-            console.error('❌ Erreur check attention:', error);
-        }
+        // Mettre à jour le widget d'infos
+        this.updateInfoWidget();
     }
 
     async trackInteraction(type, data = {}) {
@@ -398,9 +421,7 @@ class AttentionAdapter {
     }
 
     destroy() {
-        if (this.checkInterval) {
-            clearInterval(this.checkInterval);
-        }
+        this.stopPolling();
     }
 }
 
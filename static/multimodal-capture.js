@@ -6,11 +6,23 @@ class MultimodalCapture {
         this.videoElement = null;
         this.audioContext = null;
         this.isCapturing = false;
+        this.protocol = 1; // 1 = base64, 2 = binaire (négocié à la connexion)
+        // Réglage de capture, ajusté par le serveur selon sa charge d'analyse
+        this.captureConfig = { fps: 10, width: 640, quality: 0.8, interval_ms: 100 };
     }
 
     async init() {
-        // Connexion WebSocket
-        this.socket = io.connect(location.origin);
+        // Connexion WebSocket (demande du protocole binaire)
+        this.socket = io.connect(location.origin, { auth: { protocol: 2 } });
+        this.socket.on('protocol', (data) => {
+            this.protocol = (data && data.version) || 1;
+        });
+        this.socket.on('disconnect', () => {
+            this.protocol = 1;
+        });
+        this.socket.on('capture_config', (config) => {
+            if (config && config.interval_ms) this.captureConfig = config;
+        });
 
         // Créer élément vidéo caché
         this.videoElement = document.createElement('video');
@@ -55,24 +67,39 @@ class MultimodalCapture {
         if (!this.isCapturing) return;
 
         const canvas = document.createElement('canvas');
-        canvas.width = 640;
-        canvas.height = 480;
         const ctx = canvas.getContext('2d');
 
         const sendFrame = () => {
             if (!this.isCapturing) return;
 
-            // Dessiner frame sur canvas
-            ctx.drawImage(this.videoElement, 0, 0, 640, 480);
-
-            // Convertir en base64
-            const frameData = canvas.toDataURL('image/jpeg', 0.8);
+            // Taille du canvas selon le réglage courant (ratio 4:3 de la caméra)
+            const { width, quality } = this.captureConfig;
+            if (canvas.width !== width) {
+                canvas.width = width;
+                canvas.height = Math.round(width * 3 / 4);
+            }
 
-            // Envoyer via WebSocket
-            this.socket.emit('video_frame', { frame: frameData });
+            // Dessiner frame sur canvas
+            ctx.drawImage(this.videoElement, 0, 0, canvas.width, canvas.height);
+
+            if (this.protocol >= 2) {
+                // Envoyer les octets JPEG bruts
+                canvas.toBlob((blob) => {
+                    if (!blob) return;
+                    blob.arrayBuffer().then((buffer) => {
+                        this.socket.emit('video_frame', { frame: buffer });
+                    });
+                }, 'image/jpeg', quality);
+            } else {
+                // Convertir en base64
+                const frameData = canvas.toDataURL('image/jpeg', quality);
+
+                // Envoyer via WebSocket
+                this.socket.emit('video_frame', { frame: frameData });
+            }
 
-            // 10 FPS
-            setTimeout(sendFrame, 100);
+            // Rythme fixé par le serveur
+            setTimeout(sendFrame, this.captureConfig.interval_ms);
         };
 
         sendFrame();
@@ -88,6 +115,17 @@ class MultimodalCapture {
 
             const audioData = e.inputBuffer.getChannelData(0);
 
+            if (this.protocol >= 2) {
+                // PCM int16 en pièce jointe binaire
+                const pcm = new Int16Array(audioData.length);
+                for (let i = 0; i < audioData.length; i++) {
+                    const s = Math.max(-1, Math.min(1, audioData[i]));
+                    pcm[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
+                }
+                this.socket.emit('audio_chunk', { audio: pcm.buffer, format: 'pcm_s16le' });
+                return;
+            }
+
             // Conversion sécurisée en base64 pour éviter le Stack Overflow
             const buffer = new Float32Array(audioData);
             const bytes = new Uint8Array(buffer.buffer);
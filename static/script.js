@@ -287,14 +287,45 @@ async function clearPlaylist() {
 
 let analysisInterval = null;
 let webcamStream = null;
+let frameInterval = null; // Timer d'envoi des frames (rythme fixé par 'capture_config')
 
 // Initialiser Socket.IO pour recevoir les résultats d'analyse
-const socket = io();
+// protocol 2 = frames JPEG et audio PCM int16 envoyés en binaire
+const SOCKET_PROTOCOL = 2;
+const socket = io({ auth: { protocol: SOCKET_PROTOCOL } });
+
+// Version confirmée par le serveur (1 = base64 tant que rien n'est négocié)
+let socketProtocol = 1;
 
 socket.on('connect', () => {
     console.log('✅ Connecté au serveur WebSocket');
 });
 
+socket.on('protocol', (data) => {
+    socketProtocol = (data && data.version) || 1;
+    console.log(`🔌 Protocole WebSocket v${socketProtocol}`);
+});
+
+socket.on('disconnect', () => {
+    socketProtocol = 1;
+});
+
+// Réglage de capture piloté par le serveur (ralentit quand l'analyse prend du retard)
+let captureConfig = { fps: 7, width: 300, quality: 0.6, interval_ms: 150 };
+
+socket.on('capture_config', (config) => {
+    if (!config || !config.interval_ms) return;
+    const intervalChanged = config.interval_ms !== captureConfig.interval_ms;
+    captureConfig = config;
+    console.log(`🎚️ Capture: ${config.fps} FPS, ${config.width}px, qualité ${config.quality}`);
+
+    // Relancer le timer de capture au nouveau rythme si la caméra tourne
+    if (intervalChanged && frameInterval) {
+        clearInterval(frameInterval);
+        frameInterval = setInterval(sendVideoFrame, captureConfig.interval_ms);
+    }
+});
+
 // Écouter les résultats d'analyse vidéo pour mettre à jour l'UI
 socket.on('video_result', (data) => {
     if (data && data.result) {
@@ -396,15 +427,27 @@ function sendVideoFrame() {
     const video = document.getElementById('webcamFeed');
     if (!video || !webcamStream || video.paused || video.ended) return;
 
-    // Créer un canvas temporaire pour capturer la frame
+    // Créer un canvas temporaire pour capturer la frame (largeur fixée par le serveur)
     const canvas = document.createElement('canvas');
-    canvas.width = 300; // Résolution réduite pour performance
-    canvas.height = 200;
+    const aspect = (video.videoWidth && video.videoHeight) ? video.videoHeight / video.videoWidth : 2 / 3;
+    canvas.width = captureConfig.width;
+    canvas.height = Math.round(captureConfig.width * aspect);
     const ctx = canvas.getContext('2d');
     ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
 
-    // Envoyer en base64
-    const dataURL = canvas.toDataURL('image/jpeg', 0.6);
+    if (socketProtocol >= 2) {
+        // Envoyer les octets JPEG bruts (pièce jointe binaire)
+        canvas.toBlob((blob) => {
+            if (!blob) return;
+            blob.arrayBuffer().then((buffer) => {
+                socket.emit('video_frame', { frame: buffer });
+            });
+        }, 'image/jpeg', captureConfig.quality);
+        return;
+    }
+
+    // Envoyer en base64 (serveur ancien protocole)
+    const dataURL = canvas.toDataURL('image/jpeg', captureConfig.quality);
     socket.emit('video_frame', { frame: dataURL });
 }
 
@@ -430,6 +473,16 @@ function startAudioCapture(stream) {
         const inputBuffer = audioProcessingEvent.inputBuffer;
         const inputData = inputBuffer.getChannelData(0);
 
+        if (socketProtocol >= 2) {
+            // PCM int16 en binaire : moitié moins d'octets, pas de base64
+            socket.emit('audio_chunk', {
+                audio: floatToInt16(inputData).buffer,
+                format: 'pcm_s16le',
+                sample_rate: audioContext.sampleRate
+            });
+            return;
+        }
+
         // Convertir Float32Array en ArrayBuffer pour l'envoi
         // On envoie directement le buffer binaire encodé en base64
         const buffer = inputData.buffer;
@@ -459,6 +512,16 @@ function stopAudioCapture() {
     }
 }
 
+// Convertir des échantillons float [-1, 1] en PCM int16
+function floatToInt16(samples) {
+    const pcm = new Int16Array(samples.length);
+    for (let i = 0; i < samples.length; i++) {
+        const s = Math.max(-1, Math.min(1, samples[i]));
+        pcm[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
+    }
+    return pcm;
+}
+
 // Convertir ArrayBuffer en Base64
 function arrayBufferToBase64(buffer) {
     let binary = '';
@@ -505,7 +568,6 @@ function initSidebarLogic() {
     const cameraToggle = document.getElementById('cameraToggle');
     const videoElement = document.getElementById('webcamFeed');
     const placeholder = document.getElementById('cameraPlaceholder');
-    let frameInterval = null;
 
     if (!cameraToggle || !videoElement || !placeholder) {
         console.warn('⚠️ Éléments sidebar non trouvés');
@@ -541,7 +603,7 @@ function initSidebarLogic() {
 
                 // --- CAPTURE VIDÉO ---
                 if (frameInterval) clearInterval(frameInterval);
-                frameInterval = setInterval(sendVideoFrame, 150); // ~10 FPS max pour le backend
+                frameInterval = setInterval(sendVideoFrame, captureConfig.interval_ms); // Rythme ajusté par le serveur
 
                 // --- CAPTURE AUDIO ---
                 startAudioCapture(webcamStream);
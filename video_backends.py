@@ -0,0 +1,367 @@
+# video_backends.py
+"""
+Backends d'exécution de l'analyse vidéo
+
+- 'thread'  : VideoAnalyzer dans le processus du serveur (comportement historique)
+- 'process' : VideoAnalyzer dans des processus workers ; les frames décodées passent
+              par des slots de mémoire partagée (pas de pickle des images) et chaque
+              client reste attaché au même worker pour garder son état de lissage
+"""
+import multiprocessing as mp
+import queue
+import threading
+import time
+import weakref
+import zlib
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from analyzers.video_analyzer import VideoAnalyzer
+
+VIDEO_BACKENDS = ('thread', 'process')
+
+
+def merge_detection_stats(stats_list) -> Dict:
+    """Additionner les compteurs de détection de plusieurs analyseurs"""
+    detection = {'tracked': 0, 'full': 0, 'track_lost': 0, 'frames': 0,
+                 'detect_skipped': 0, 'expression_reused': 0,
+                 'motion_skipped': 0, 'expression_static': 0}
+    for stats in stats_list:
+        for key in detection:
+            detection[key] += stats.get(key, 0)
+    total = detection['tracked'] + detection['full']
+    detection['tracked_ratio'] = round(detection['tracked'] / total, 3) if total else 0.0
+    frames = detection['frames']
+    detection['motion_skip_rate'] = round(detection['motion_skipped'] / frames, 3) if frames else 0.0
+    return detection
+
+
+class InProcessVideoBackend:
+    """Analyse dans le processus courant, avec le VideoAnalyzer de chaque session"""
+
+    def __init__(self, video_config: Optional[Dict] = None):
+        self.video_config = dict(video_config or {})
+        self.analysis_width = self.video_config.get('analysis_width')
+        self._analyzers = weakref.WeakSet()
+
+    def create_analyzer(self) -> VideoAnalyzer:
+        """Analyseur local d'une nouvelle session"""
+        analyzer = VideoAnalyzer(**self.video_config)
+        self._analyzers.add(analyzer)
+        return analyzer
+
+    def analyze(self, session, frame: np.ndarray, source_size: Optional[Tuple[int, int]] = None) -> Dict:
+        # Le pipeline ne traite jamais deux frames d'une même session en parallèle
+        result = session.video_analyzer.analyze_frame(frame, source_size)
+        return {**result,
+                'head_pose': dict(result['head_pose']),
+                'facial_expression': dict(result['facial_expression']),
+                'fresh': dict(result['fresh'])}
+
+    def forget(self, session_id):
+        pass
+
+    def close(self):
+        pass
+
+    def get_stats(self) -> Dict:
+        analyzers = list(self._analyzers)
+        return {
+            'backend': 'thread',
+            'detection': merge_detection_stats(a.get_detection_stats() for a in analyzers),
+        }
+
+
+def _process_worker(shm_name: str, slot_bytes: int, video_config: Dict, requests, responses):
+    """Boucle d'un processus worker : analyse les frames posées dans ses slots"""
+    # Un cœur par worker : éviter que chaque processus lance son propre pool OpenCV
+    cv2.setNumThreads(1)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    analyzers = {}
+
+    try:
+        while True:
+            message = requests.get()
+            if message is None:
+                break
+
+            kind = message[0]
+            if kind == 'forget':
+                analyzers.pop(message[1], None)
+                continue
+
+            _, request_id, client_id, slot, shape, dtype, source_size = message
+            try:
+                analyzer = analyzers.get(client_id)
+                if analyzer is None:
+                    analyzer = analyzers[client_id] = VideoAnalyzer(**video_config)
+
+                frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf,
+                                   offset=slot * slot_bytes)
+                result = analyzer.analyze_frame(frame, source_size)
+                del frame  # Ne pas garder de vue sur la mémoire partagée
+                responses.put((request_id, slot, result, analyzer.get_detection_stats(), None))
+            except Exception as e:
+                responses.put((request_id, slot, None, None, str(e)))
+    finally:
+        shm.close()
+
+
+def _send_stop(requests) -> bool:
+    """Envoyer le signal d'arrêt (None) ; False si la file ne peut plus rien envoyer"""
+    try:
+        requests.put(None)
+        return True
+    except RuntimeError:
+        # Appelé depuis atexit : le thread d'envoi d'une file jamais utilisée ne peut plus démarrer
+        return False
+
+
+class ProcessVideoBackend:
+    """Analyse dans un pool de processus, frames transmises par mémoire partagée"""
+
+    def __init__(self, video_config: Optional[Dict] = None, processes: Optional[int] = None,
+                 slots_per_process: int = 4, max_frame_pixels: int = 1920 * 1080,
+                 timeout: float = 5.0):
+        """
+        processes: nombre de processus workers (défaut : nombre de cœurs - 1)
+        slots_per_process: frames pouvant être en vol par worker
+        max_frame_pixels: taille d'un slot (frames en niveaux de gris, 1 octet/pixel)
+        """
+        self.video_config = dict(video_config or {})
+        self.analysis_width = self.video_config.get('analysis_width')
+        self.num_processes = processes or max(1, (mp.cpu_count() or 2) - 1)
+        self.slots_per_process = max(1, slots_per_process)
+        self.slot_bytes = max_frame_pixels
+        self.timeout = timeout
+
+        self._ctx = mp.get_context('spawn')
+        self._lock = threading.Lock()
+        self._started = False
+        self._workers = []
+        self._pending = {}       # request_id -> (Future, worker, client_id)
+        self._next_request = 0
+        self._client_stats = {}  # client_id -> dernières stats de détection
+        self._retired_shm = []   # Mémoire partagée des workers morts (libérée à close())
+        self.stats = {'frames': 0, 'errors': 0, 'timeouts': 0, 'restarts': 0, 'slot_wait_total': 0.0}
+
+    def start(self):
+        """Lancer les processus (appelé automatiquement à la première frame)"""
+        with self._lock:
+            if self._started:
+                return
+
+            self._responses = self._ctx.Queue()
+            self._workers = [self._spawn_worker(index) for index in range(self.num_processes)]
+
+            self._collector = threading.Thread(target=self._collect_results,
+                                               name='video-backend-collector', daemon=True)
+            self._collector.start()
+            self._started = True
+            print(f"🧩 Backend vidéo multi-processus démarré ({self.num_processes} workers)")
+
+    def _spawn_worker(self, index: int) -> Dict:
+        """Lancer un processus worker avec sa mémoire partagée et tous ses slots libres"""
+        shm = shared_memory.SharedMemory(
+            create=True, size=self.slot_bytes * self.slots_per_process
+        )
+        requests = self._ctx.Queue()
+        free_slots = queue.Queue()
+        for slot in range(self.slots_per_process):
+            free_slots.put(slot)
+
+        process = self._ctx.Process(
+            target=_process_worker,
+            args=(shm.name, self.slot_bytes, self.video_config, requests, self._responses),
+            name=f"video-analyzer-{index}",
+            daemon=True,
+        )
+        process.start()
+        return {
+            'index': index,
+            'process': process,
+            'shm': shm,
+            'requests': requests,
+            'free_slots': free_slots,
+        }
+
+    def _check_workers(self):
+        """Relancer les workers morts et faire échouer leurs requêtes en vol"""
+        failed = []
+        with self._lock:
+            if not self._started:
+                return
+            for index, worker in enumerate(self._workers):
+                if worker['process'].is_alive():
+                    continue
+                for request_id, (future, owner, _) in list(self._pending.items()):
+                    if owner is worker:
+                        del self._pending[request_id]
+                        failed.append(future)
+                # Un thread peut encore écrire dans un slot de l'ancien worker :
+                # nouvelle mémoire partagée, l'ancienne est libérée à close()
+                try:
+                    worker['shm'].unlink()
+                except FileNotFoundError:
+                    pass
+                self._retired_shm.append(worker['shm'])
+                self._workers[index] = self._spawn_worker(index)
+                self.stats['restarts'] += 1
+                print(f"⚠️ Worker vidéo {index} arrêté (code {worker['process'].exitcode}), relancé")
+
+        for future in failed:
+            future.set_exception(RuntimeError("Worker vidéo arrêté pendant l'analyse"))
+
+    def create_analyzer(self):
+        """Pas d'analyseur local : il vit dans le processus worker de la session"""
+        return None
+
+    def _worker_for(self, client_id) -> Dict:
+        """Affectation stable client -> worker"""
+        index = zlib.crc32(str(client_id).encode('utf-8')) % self.num_processes
+        return self._workers[index]
+
+    def analyze(self, session, frame: np.ndarray, source_size: Optional[Tuple[int, int]] = None) -> Dict:
+        if not self._started:
+            self.start()
+
+        client_id = session.session_id
+        if source_size is None:
+            source_size = (frame.shape[1], frame.shape[0])
+        if frame.nbytes > self.slot_bytes:
+            # Trop grand pour un slot : réduire (la boîte est ramenée à source_size)
+            ratio = (self.slot_bytes / frame.nbytes) ** 0.5
+            size = (max(1, int(frame.shape[1] * ratio)), max(1, int(frame.shape[0] * ratio)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        frame = np.ascontiguousarray(frame)
+
+        worker = self._worker_for(client_id)
+        wait_start = time.perf_counter()
+        try:
+            slot = worker['free_slots'].get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise TimeoutError("Aucun slot vidéo libre") from None
+        slot_wait = time.perf_counter() - wait_start
+
+        # Une seule copie : la frame décodée va directement dans le slot partagé
+        target = np.ndarray(frame.shape, dtype=frame.dtype, buffer=worker['shm'].buf,
+                            offset=slot * self.slot_bytes)
+        target[...] = frame
+        del target
+
+        future = Future()
+        with self._lock:
+            if self._workers[worker['index']] is not worker:
+                # Worker remplacé entre-temps : la requête ne serait jamais traitée
+                raise RuntimeError("Worker vidéo arrêté pendant l'analyse")
+            request_id = self._next_request
+            self._next_request += 1
+            self._pending[request_id] = (future, worker, client_id)
+            self.stats['slot_wait_total'] += slot_wait
+
+        worker['requests'].put(('analyze', request_id, client_id, slot,
+                                frame.shape, frame.dtype.str, tuple(source_size)))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self.stats['timeouts'] += 1
+            raise
+
+    def _collect_results(self):
+        """Thread qui reçoit les résultats des workers, libère les slots et surveille les workers"""
+        checked_at = time.monotonic()
+        while True:
+            # Surveillance au plus une fois par seconde, même sous un flux continu de résultats
+            if time.monotonic() - checked_at >= 1.0:
+                self._check_workers()
+                checked_at = time.monotonic()
+            try:
+                message = self._responses.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+
+            request_id, slot, result, detection, error = message
+            with self._lock:
+                future, worker, client_id = self._pending.pop(request_id, (None, None, None))
+                if future is None:
+                    continue
+                self.stats['frames'] += 1
+                if error:
+                    self.stats['errors'] += 1
+                elif detection is not None:
+                    self._client_stats[client_id] = detection
+            worker['free_slots'].put(slot)
+
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(result)
+
+    def forget(self, client_id):
+        """Libérer l'analyseur d'un client dans son worker"""
+        with self._lock:
+            self._client_stats.pop(client_id, None)
+        if self._started:
+            self._worker_for(client_id)['requests'].put(('forget', client_id))
+
+    def close(self):
+        """Arrêter les workers et libérer la mémoire partagée"""
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+            workers, self._workers = self._workers, []
+
+        stopping = [worker for worker in workers if _send_stop(worker['requests'])]
+        for worker in workers:
+            if worker in stopping:
+                worker['process'].join(timeout=2)
+            if worker['process'].is_alive():
+                worker['process'].terminate()
+                worker['process'].join(timeout=2)
+        if _send_stop(self._responses):
+            self._collector.join(timeout=2)
+        for worker in workers:
+            worker['shm'].close()
+            worker['shm'].unlink()
+        retired, self._retired_shm = self._retired_shm, []
+        for shm in retired:
+            shm.close()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            per_client = list(self._client_stats.values())
+
+        frames = stats['frames']
+        return {
+            'backend': 'process',
+            'processes': self.num_processes,
+            'slots_per_process': self.slots_per_process,
+            'frames': frames,
+            'errors': stats['errors'],
+            'timeouts': stats['timeouts'],
+            'restarts': stats['restarts'],
+            'slot_wait_avg_ms': round(stats['slot_wait_total'] / frames * 1000, 2) if frames else 0.0,
+            'detection': merge_detection_stats(per_client),
+        }
+
+
+def create_video_backend(name: str = 'thread', video_config: Optional[Dict] = None, **options):
+    """Construire le backend vidéo demandé ('thread' ou 'process')"""
+    if name == 'thread':
+        return InProcessVideoBackend(video_config)
+    if name == 'process':
+        return ProcessVideoBackend(video_config, **options)
+    raise ValueError(f"Backend vidéo inconnu: {name}")